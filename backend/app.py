@@ -19,6 +19,7 @@ from container import container
 from routes.documents import create_documents_blueprint
 from routes.query import create_query_blueprint  
 from routes.system import create_system_blueprint
+from routes.snapshots import create_snapshots_blueprint
 
 logger = logging.getLogger(__name__)
 
@@ -44,11 +45,13 @@ def create_app() -> Flask:
         document_service = container.get_document_service()
         query_service = container.get_query_service()
         system_service = container.get_system_service()
+        snapshot_service = container.get_snapshot_service()
         
         # 注册蓝图
         app.register_blueprint(create_documents_blueprint(document_service))
         app.register_blueprint(create_query_blueprint(query_service))
         app.register_blueprint(create_system_blueprint(system_service, document_service))
+        app.register_blueprint(create_snapshots_blueprint(snapshot_service))
         
         logger.info("Flask application created successfully")
         
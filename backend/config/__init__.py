@@ -20,14 +20,45 @@ __all__ = [
     "LLM_NUM_CTX",
     "LLM_NUM_PREDICT",
     "EMBEDDING_MODEL",
+    "EMBEDDING_CACHE_ENABLED",
+    "EMBEDDING_CACHE_DIR",
+    "EMBEDDING_CACHE_DTYPE",
     "CHUNK_SIZE",
     "CHUNK_OVERLAP",
+    "CHUNKING_STRATEGY",
+    "CDC_MIN_CHUNK_SIZE",
+    "CDC_MAX_CHUNK_SIZE",
+    "CHUNK_TOKEN_SIZE",
+    "CHUNK_TOKEN_OVERLAP",
+    "CHUNK_TOKENIZER",
+    "VECTOR_BACKEND",
+    "HNSW_M",
+    "HNSW_EF_CONSTRUCTION",
+    "HNSW_EF_SEARCH",
+    "VECTOR_QUANTIZATION",
+    "VECTOR_RESCORE_FACTOR",
+    "DOCUMENT_STORE_DIR",
+    "INCREMENTAL_INDEXING_ENABLED",
+    "PARSE_WORKERS",
+    "PARSE_PDF_PAGES_PER_TASK",
+    "INGEST_BATCH_SIZE",
+    "INGEST_QUEUE_SIZE",
+    "INGEST_MEMORY_LIMIT_MB",
+    "DEDUP_ENABLED",
+    "DEDUP_THRESHOLD",
+    "DEDUP_SHINGLE_SIZE",
+    "DEDUP_NUM_PERM",
+    "JOB_HISTORY_SIZE",
+    "BULK_UPLOAD_MAX_FILES",
+    "SNAPSHOT_DIR",
+    "SNAPSHOT_RESTORE_PATH",
     "QUERY_EXPANSION_ENABLED",
     "QUERY_EXPANSION_N_SUBQUERIES",
     "QUERY_EXPANSION_MODEL",
     "QUERY_EXPANSION_TEMPERATURE",
     "QUERY_EXPANSION_INCLUDE_ORIGINAL",
     "HYBRID_TOP_K_PER_QUERY",
+    "CHUNK_STORE_MMAP",
     "RRF_K",
     "RRF_TOP_K",
     "RERANKING_ENABLED",
@@ -42,6 +73,16 @@ __all__ = [
     "MMR_LAMBDA",
     "MMR_FINAL_K",
     "SEARCH_K",
+    "STARTUP_WARMUP_MODE",
+    "MODEL_MEMORY_BUDGET_MB",
+    "MODEL_IDLE_UNLOAD_SECONDS",
+    "CPU_BUDGET_ENABLED",
+    "CPU_RESERVED_CORES",
+    "RETRIEVAL_MAX_CONCURRENCY",
+    "INFERENCE_POOL_ENABLED",
+    "INFERENCE_POOL_WORKERS",
+    "INFERENCE_POOL_TIMEOUT",
+    "INFERENCE_POOL_HEALTH_INTERVAL",
     "TIMING_ENABLED",
     "TIMING_SHOW_IN_TERMINAL",
     "TIMING_MIN_DURATION_MS",
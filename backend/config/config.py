@@ -38,6 +38,11 @@ LLM_NUM_PREDICT = int(os.getenv("LLM_NUM_PREDICT", "2048"))  # 最大生成 toke
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-base-zh-v1.5")
 
+# 持久化嵌入缓存：按 (模型名, chunk 文本哈希) 缓存向量，重建时只为新增/变化的 chunk 计算嵌入
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 | float32
+
 # ============================================
 # Chunking 设置
 # ============================================
@@ -45,6 +50,67 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-base-zh-v1.5")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "600"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 
+# 切分策略：recursive（固定字符数）| token（按模型 token 数）| content_defined（内容定义边界，编辑文档后只有编辑处附近的 chunk 变化，其余命中嵌入缓存）
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "recursive")
+# content_defined 的 chunk 长度范围（字符），平均长度约为 CHUNK_SIZE
+CDC_MIN_CHUNK_SIZE = int(os.getenv("CDC_MIN_CHUNK_SIZE", str(CHUNK_SIZE // 4)))
+CDC_MAX_CHUNK_SIZE = int(os.getenv("CDC_MAX_CHUNK_SIZE", str(CHUNK_SIZE * 2)))
+# token 策略（按模型 token 数切分）：嵌入模型与 Cross-Encoder 均在 512 token 处截断，重排时还要拼接查询，chunk 需留出余量
+CHUNK_TOKEN_SIZE = int(os.getenv("CHUNK_TOKEN_SIZE", "384"))
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "64"))
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", EMBEDDING_MODEL)  # 计算 token 数所用模型的 tokenizer
+
+# ============================================
+# 索引设置
+# ============================================
+
+# 向量存储后端：chroma | numpy | hnsw（numpy 为精确暴力检索：向量保存为 mmap 的 float32 矩阵，一次矩阵乘法计算全部距离，
+# 数十万 chunk 以内延迟低于近似索引且召回率为 100%）。切换后端需重建知识库或导入快照
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# hnsw 后端（近似检索，需要 hnswlib；与 numpy 后端存储格式相同，两者之间切换无需重建）：
+# M 与 EF_CONSTRUCTION 决定图的质量（修改后打开集合时重建索引），EF_SEARCH 越大召回率越高、延迟越高
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# numpy 后端的向量量化：none | float16 | int8 | binary。量化时只有编码常驻内存（768 维每百万 chunk：
+# float32 约 2.9 GB、float16 约 1.4 GB、int8 约 0.7 GB、binary 约 92 MB），粗排扫描编码，
+# 取 k × VECTOR_RESCORE_FACTOR 个候选从 mmap 的 float32 矩阵读取后精确重排。编码在打开集合时生成，修改后无需重建
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "10"))
+
+# 文档存储：上传的原始文件按内容哈希保存在磁盘上（相同内容只存一份），重启后保留
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "./document_store")
+
+# 上传/删除单个文档时只更新该文档的 chunks，无需重建整个知识库
+INCREMENTAL_INDEXING_ENABLED = os.getenv("INCREMENTAL_INDEXING_ENABLED", "true").lower() in ("true", "1", "yes")
+
+# 并行解析：文档解析在进程池中执行，页数较多的 PDF 按页范围拆分为多个任务
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))  # 0 = 按 CPU 预算的可用核数，1 = 在当前进程解析
+PARSE_PDF_PAGES_PER_TASK = int(os.getenv("PARSE_PDF_PAGES_PER_TASK", "32"))
+
+# 流式入库：解析 → 切分 → 嵌入 → 写入 通过有界队列重叠执行
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))  # 每批嵌入/写入的 chunk 数
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))  # 各阶段队列容量（批）
+INGEST_MEMORY_LIMIT_MB = float(os.getenv("INGEST_MEMORY_LIMIT_MB", "256"))  # 在途数据内存上限，0 = 只靠队列容量限制
+
+# 近重复合并（MinHash LSH）：同一次入库中与已入库 chunk 近重复的 chunk（重复的页眉页脚、文档副本）不再嵌入和索引，
+# 而是作为别名记录在代表 chunk 上；删除代表 chunk 所在文件时由别名接替
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() in ("true", "1", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # Jaccard 相似度阈值（对 LSH 候选精确计算）
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))  # 字符 shingle 长度
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))  # MinHash 排列数（16 的倍数，分 16 个 LSH band）
+
+# 后台任务：重建知识库等任务在后台执行，保留最近 N 个已结束任务的进度与结果
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "20"))
+
+# 批量上传：单次请求（多文件或 zip/tar 压缩包）最多接收的文件数，超出部分标记为 skipped
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "1000"))
+
+# 知识库快照：chunk 文本、向量、BM25 索引与源文档清单打包为单个文件，导入时无需重新嵌入
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+# 启动时知识库为空则从该快照恢复（新副本秒级提供服务），留空则不恢复
+SNAPSHOT_RESTORE_PATH = os.getenv("SNAPSHOT_RESTORE_PATH", "")
+
 # ============================================
 # 检索流水线设置 - Query Expansion
 # ============================================
@@ -61,6 +127,10 @@ QUERY_EXPANSION_INCLUDE_ORIGINAL = os.getenv("QUERY_EXPANSION_INCLUDE_ORIGINAL",
 
 HYBRID_TOP_K_PER_QUERY = int(os.getenv("HYBRID_TOP_K_PER_QUERY", "15"))
 
+# 检索用的列式 chunk 存储（BM25 与向量检索共用，文本连续存放）：
+# 开启时文本缓冲写入临时文件并以只读 mmap 映射，内存紧张时可由操作系统换出
+CHUNK_STORE_MMAP = os.getenv("CHUNK_STORE_MMAP", "false").lower() in ("true", "1", "yes")
+
 # ============================================
 # 检索流水线设置 - RRF Fusion
 # ============================================
@@ -100,6 +170,39 @@ MMR_FINAL_K = int(os.getenv("MMR_FINAL_K", "5"))
 
 SEARCH_K = int(os.getenv("SEARCH_K", "8"))
 
+# ============================================
+# 启动预热设置
+# ============================================
+
+# background: 立即提供服务，后台加载并预热模型（/api/ready 报告就绪状态）
+# blocking:   启动时同步加载并预热，完成后再提供服务
+# off:        不预热，模型在首次请求时加载
+STARTUP_WARMUP_MODE = os.getenv("STARTUP_WARMUP_MODE", "background").lower()
+
+# ============================================
+# 模型内存管理
+# ============================================
+
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 = 不限制
+MODEL_IDLE_UNLOAD_SECONDS = float(os.getenv("MODEL_IDLE_UNLOAD_SECONDS", "0"))  # 0 = 从不卸载
+
+# ============================================
+# CPU 预算设置
+# ============================================
+
+CPU_BUDGET_ENABLED = os.getenv("CPU_BUDGET_ENABLED", "true").lower() in ("true", "1", "yes")
+CPU_RESERVED_CORES = int(os.getenv("CPU_RESERVED_CORES", "-1"))  # -1 = 自动（本机 Ollama 时预留 LLM_NUM_THREAD）
+RETRIEVAL_MAX_CONCURRENCY = int(os.getenv("RETRIEVAL_MAX_CONCURRENCY", "2"))  # 预期并发检索请求数
+
+# ============================================
+# 推理进程池设置（进程外执行 embedding / reranking）
+# ============================================
+
+INFERENCE_POOL_ENABLED = os.getenv("INFERENCE_POOL_ENABLED", "false").lower() in ("true", "1", "yes")
+INFERENCE_POOL_WORKERS = int(os.getenv("INFERENCE_POOL_WORKERS", "2"))
+INFERENCE_POOL_TIMEOUT = float(os.getenv("INFERENCE_POOL_TIMEOUT", "60"))  # 单次请求超时(秒)
+INFERENCE_POOL_HEALTH_INTERVAL = float(os.getenv("INFERENCE_POOL_HEALTH_INTERVAL", "10"))  # 健康检查间隔(秒)
+
 # ============================================
 # 时间监控设置
 # ============================================
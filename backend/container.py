@@ -7,10 +7,16 @@ from typing import Dict, Any
 
 from managers.model_manager import EmbeddingManager, LLMManager
 from managers.vector_store_manager import ChromaVectorStoreManager
+from managers.warmup import WarmupManager, WARMUP_MODES
+from managers.job_manager import JobManager
+from managers.document_store import DocumentStore
+from managers.cpu_budget import cpu_budget
 from services.retrieval import RetrievalOrchestrator
 from services.document_service import DocumentService
 from services.query_service import QueryService
 from services.system_service import SystemService
+from services.snapshot_service import SnapshotService
+from config import STARTUP_WARMUP_MODE, DOCUMENT_STORE_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -29,23 +35,42 @@ class DIContainer:
             return
         
         try:
-            logger.info("Initializing dependencies...")
+            if STARTUP_WARMUP_MODE not in WARMUP_MODES:
+                raise ValueError(f"Unknown STARTUP_WARMUP_MODE: {STARTUP_WARMUP_MODE} (expected one of {', '.join(WARMUP_MODES)})")
+            logger.info(f"Initializing dependencies (warmup mode: {STARTUP_WARMUP_MODE})...")
+            background_warmup = STARTUP_WARMUP_MODE == "background"
+            
+            # 0. 在加载任何模型前设置 CPU 线程预算
+            cpu_budget.apply()
             
             # 1. 创建模型管理器
             self._instances['embedding_manager'] = EmbeddingManager()
             self._instances['llm_manager'] = LLMManager()
             
-            # 2. 创建向量存储管理器
+            # 2. 创建向量存储管理器（后台预热模式下延迟加载持久化数据）
             self._instances['vector_store_manager'] = ChromaVectorStoreManager(
-                embedding_interface=self._instances['embedding_manager']
+                embedding_interface=self._instances['embedding_manager'],
+                load_persistent=not background_warmup
             )
             
             # 3. 创建检索编排器
             self._instances['retrieval_orchestrator'] = RetrievalOrchestrator()
             
-            # 4. 创建服务
+            # 4. 创建文档存储、后台任务管理器与服务
+            self._instances['document_store'] = DocumentStore(DOCUMENT_STORE_DIR)
+            self._instances['job_manager'] = JobManager()
             self._instances['document_service'] = DocumentService(
-                vector_store_manager=self._instances['vector_store_manager']
+                vector_store_manager=self._instances['vector_store_manager'],
+                job_manager=self._instances['job_manager'],
+                retrieval_orchestrator=self._instances['retrieval_orchestrator'],
+                document_store=self._instances['document_store']
+            )
+            
+            self._instances['snapshot_service'] = SnapshotService(
+                vector_store_manager=self._instances['vector_store_manager'],
+                job_manager=self._instances['job_manager'],
+                retrieval_orchestrator=self._instances['retrieval_orchestrator'],
+                document_store=self._instances['document_store']
             )
             
             self._instances['query_service'] = QueryService(
@@ -54,11 +79,30 @@ class DIContainer:
                 retrieval_orchestrator=self._instances['retrieval_orchestrator']
             )
             
+            # 5. 创建预热管理器
+            self._instances['warmup_manager'] = WarmupManager(
+                embedding_manager=self._instances['embedding_manager'],
+                llm_manager=self._instances['llm_manager'],
+                vector_store_manager=self._instances['vector_store_manager']
+            )
+            
             self._instances['system_service'] = SystemService(
                 vector_store_manager=self._instances['vector_store_manager'],
-                llm_manager=self._instances['llm_manager']
+                llm_manager=self._instances['llm_manager'],
+                warmup_manager=self._instances['warmup_manager']
             )
             
+            # 6. 启动预热
+            if background_warmup:
+                self._instances['warmup_manager'].start_background()
+            elif STARTUP_WARMUP_MODE == "blocking":
+                self._instances['warmup_manager'].run()
+            else:  # off
+                self._instances['warmup_manager'].skip()
+            
+            # 7. 新副本：知识库为空时从 SNAPSHOT_RESTORE_PATH 恢复（后台任务，不阻塞启动）
+            self._instances['snapshot_service'].restore_on_startup()
+            
             self._initialized = True
             logger.info("All dependencies initialized successfully")
             
@@ -84,6 +128,12 @@ class DIContainer:
             self.initialize()
         return self._instances['system_service']
     
+    def get_snapshot_service(self) -> SnapshotService:
+        """获取快照服务"""
+        if not self._initialized:
+            self.initialize()
+        return self._instances['snapshot_service']
+    
     def get_vector_store_manager(self) -> ChromaVectorStoreManager:
         """获取向量存储管理器"""
         if not self._initialized:
@@ -102,6 +152,24 @@ class DIContainer:
             self.initialize()
         return self._instances['llm_manager']
     
+    def get_warmup_manager(self) -> WarmupManager:
+        """获取预热管理器"""
+        if not self._initialized:
+            self.initialize()
+        return self._instances['warmup_manager']
+    
+    def get_document_store(self) -> DocumentStore:
+        """获取文档存储"""
+        if not self._initialized:
+            self.initialize()
+        return self._instances['document_store']
+    
+    def get_job_manager(self) -> JobManager:
+        """获取后台任务管理器"""
+        if not self._initialized:
+            self.initialize()
+        return self._instances['job_manager']
+    
     def get_retrieval_orchestrator(self) -> RetrievalOrchestrator:
         """获取检索编排器"""
         if not self._initialized:
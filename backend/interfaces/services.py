@@ -3,7 +3,7 @@ Service Interfaces
 定义服务层的抽象接口
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 
 class DocumentServiceInterface(ABC):
@@ -28,9 +28,41 @@ class DocumentServiceInterface(ABC):
         """
         pass
     
+    @abstractmethod
+    def bulk_upload(self, files: List[Any]) -> Dict[str, Any]:
+        """批量上传文档并提交后台索引任务
+        
+        Args:
+            files: 上传的文件对象列表（可包含 zip / tar 压缩包）
+        """
+        pass
+    
     @abstractmethod
     def rebuild_knowledge_base(self) -> Dict[str, Any]:
-        """重建知识库"""
+        """提交后台重建知识库任务"""
+        pass
+    
+    @abstractmethod
+    def get_rebuild_job(self, job_id: str) -> Dict[str, Any]:
+        """获取重建任务状态
+        
+        Args:
+            job_id: 任务 ID
+        """
+        pass
+    
+    @abstractmethod
+    def list_jobs(self) -> Dict[str, Any]:
+        """列出后台任务（含最近结束的任务）"""
+        pass
+    
+    @abstractmethod
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """请求取消后台任务
+        
+        Args:
+            job_id: 任务 ID
+        """
         pass
     
     @abstractmethod
@@ -62,6 +94,52 @@ class QueryServiceInterface(ABC):
         pass
 
 
+class SnapshotServiceInterface(ABC):
+    """知识库快照服务接口"""
+    
+    @abstractmethod
+    def list_snapshots(self) -> Dict[str, Any]:
+        """列出可用快照"""
+        pass
+    
+    @abstractmethod
+    def export_snapshot(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """提交后台导出任务
+        
+        Args:
+            name: 快照名（可选）
+        """
+        pass
+    
+    @abstractmethod
+    def upload_snapshot(self, name: str, stream: Any) -> Dict[str, Any]:
+        """保存上传的快照文件
+        
+        Args:
+            name: 快照名
+            stream: 二进制可读流
+        """
+        pass
+    
+    @abstractmethod
+    def import_snapshot(self, name: str) -> Dict[str, Any]:
+        """提交后台导入任务
+        
+        Args:
+            name: 快照名
+        """
+        pass
+    
+    @abstractmethod
+    def delete_snapshot(self, name: str) -> Dict[str, Any]:
+        """删除快照
+        
+        Args:
+            name: 快照名
+        """
+        pass
+
+
 class SystemServiceInterface(ABC):
     """系统服务接口"""
     
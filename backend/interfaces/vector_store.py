@@ -3,7 +3,7 @@ Vector Store Interface
 定义向量存储的抽象接口
 """
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 
 
 class VectorStoreInterface(ABC):
@@ -20,14 +20,67 @@ class VectorStoreInterface(ABC):
         pass
     
     @abstractmethod
-    def rebuild_store_from_memory(self, in_memory_documents: Dict[str, bytes]) -> bool:
-        """从内存文档重建向量存储
+    def rebuild_store_from_sources(self, sources: Dict[str, Any], progress: Optional[Any] = None) -> bool:
+        """从文档来源重建向量存储
         
         Args:
-            in_memory_documents: 内存中的文档字典 {filename: file_content_bytes}
+            sources: {filename: 文件内容 bytes 或磁盘路径}
+            progress: 任务进度（JobProgress，可选），用于上报进度与响应取消
         """
         pass
     
+    @abstractmethod
+    def upsert_document(self, filename: str, source: Any, documents: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """增量索引单个文档（替换该文档已有的 chunks）
+        
+        Args:
+            filename: 文件名
+            source: 文件内容 bytes 或磁盘路径
+            documents: 已解析出的页面（可选，避免重复解析）
+        """
+        pass
+    
+    @abstractmethod
+    def upsert_documents(
+        self,
+        sources: Dict[str, Any],
+        progress: Optional[Any] = None,
+        on_parsed: Optional[Callable[[Any], None]] = None
+    ) -> Dict[str, Any]:
+        """批量增量索引多个文档（并行解析、流水线写入当前集合）
+        
+        Args:
+            sources: {filename: 文件内容 bytes 或磁盘路径}
+            progress: 任务进度（可选，支持取消）
+            on_parsed: 每个文件解析完成后的回调（可选）
+        """
+        pass
+    
+    @abstractmethod
+    def export_snapshot(self, writer: Any, progress: Optional[Any] = None) -> Dict[str, Any]:
+        """将当前知识库的 chunks、元数据与向量写入快照
+        
+        Args:
+            writer: 快照写入器
+            progress: 任务进度（可选）
+        """
+        pass
+    
+    @abstractmethod
+    def import_snapshot(self, snapshot: Any, progress: Optional[Any] = None) -> Dict[str, Any]:
+        """从快照恢复知识库（不重新嵌入，完成后原子切换）
+        
+        Args:
+            snapshot: 已校验的快照
+            progress: 任务进度（可选）
+        """
+        pass
+    
+    @abstractmethod
+    def delete_document(self, filename: str) -> bool:
+        """从向量存储中删除单个文档的 chunks"""
+        pass
+    
     @abstractmethod
     def get_vectorized_documents(self) -> Dict[str, Any]:
         """获取已向量化的文档列表"""
@@ -42,6 +95,21 @@ class VectorStoreInterface(ABC):
     def clear_store(self) -> bool:
         """清空向量存储"""
         pass
+    
+    @abstractmethod
+    def get_generation(self) -> int:
+        """获取知识库版本号（每次写入递增）"""
+        pass
+    
+    @abstractmethod
+    def get_last_build_stats(self) -> Dict[str, Any]:
+        """获取最近一次全量重建的统计信息（耗时、嵌入缓存命中数）"""
+        pass
+    
+    @abstractmethod
+    def get_embedding_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取嵌入缓存统计"""
+        pass
 
 
 class EmbeddingInterface(ABC):
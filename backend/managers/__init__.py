@@ -11,6 +11,9 @@ Managers Package
 from .model_manager import EmbeddingManager, LLMManager, QueryExpansionLLMManager, RerankingModelManager
 from .vector_store_manager import ChromaVectorStoreManager
 from .cache_manager import CacheManager
+from .model_registry import ModelRegistry, model_registry
+from .inference_pool import InferencePool, get_inference_pool
+from .warmup import WarmupManager
 from .timing import timed, timing_scope, pipeline_start, pipeline_end, set_timing_enabled
 
 __all__ = [
@@ -20,6 +23,11 @@ __all__ = [
     "RerankingModelManager",
     "ChromaVectorStoreManager",
     "CacheManager",
+    "ModelRegistry",
+    "model_registry",
+    "InferencePool",
+    "get_inference_pool",
+    "WarmupManager",
     "timed",
     "timing_scope",
     "pipeline_start",
@@ -0,0 +1,185 @@
+"""
+Chunk Store
+检索用的列式 chunk 存储 - BM25 与向量检索共用的只读 chunk 表
+
+- 文本：全部 chunk 的 UTF-8 文本依次拼接为一个连续缓冲区，int64[N + 1] 偏移数组记录每个 chunk 的字节起止
+- 元数据：按字段分列，每列为 int32 编码数组加取值表（同一文件的 source / filename 等只存一份）
+- chunk ID：与行号一一对应，按 ID 查行为 O(1)
+
+从知识库快照加载时，文本缓冲与偏移直接引用快照的只读 mmap，不复制；
+从 Chroma 集合构建时可选（CHUNK_STORE_MMAP）将文本缓冲写入临时文件后 mmap，内存紧张时可由操作系统换出。
+检索结果只保存行号与分数，文本按行读取，Document 只在需要时构造。
+"""
+import logging
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import CHUNK_STORE_MMAP
+
+logger = logging.getLogger(__name__)
+
+_MISSING = -1
+_COLLECTION_PAGE_SIZE = 1000  # 从集合分页读取的 chunk 数
+
+
+class ChunkStore:
+    """
+    列式 chunk 存储（构建后只读，可在线程间共享）
+    
+    Usage:
+        store = ChunkStore.from_collection(collection)
+        row = store.row(chunk_id)
+        text = store.text(row)
+        document = store.document(row)     # 只在最终上下文与响应中构造
+    """
+    
+    def __init__(self, ids: List[str], texts: np.ndarray, offsets: np.ndarray, metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """
+        Args:
+            ids: chunk ID（按行顺序）
+            texts: uint8 文本缓冲（可为 mmap）
+            offsets: int64[N + 1]，每行文本在缓冲中的字节起止
+            metadatas: 每行的元数据（按字段编码为列后丢弃）
+        """
+        if len(offsets) != len(ids) + 1:
+            raise ValueError(f"Expected {len(ids) + 1} text offsets, got {len(offsets)}")
+        self.ids = ids
+        self._rows: Dict[str, int] = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self._texts = texts
+        self._offsets = offsets
+        self._codes, self._values = self._encode_columns(metadatas, len(ids))
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+    
+    def row(self, chunk_id: str) -> Optional[int]:
+        """chunk ID 所在行；不在存储中时为 None"""
+        return self._rows.get(chunk_id)
+    
+    def text(self, row: int) -> str:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+    
+    def iter_texts(self) -> Iterator[str]:
+        for row in range(len(self.ids)):
+            yield self.text(row)
+    
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """按列还原一行的元数据（新 dict）"""
+        metadata = {}
+        for key, codes in self._codes.items():
+            code = codes[row]
+            if code != _MISSING:
+                metadata[key] = self._values[key][code]
+        return metadata
+    
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+    
+    @property
+    def nbytes(self) -> int:
+        """文本缓冲、偏移与元数据编码数组占用的字节数（不含取值表）"""
+        return int(self._texts.nbytes + self._offsets.nbytes + sum(codes.nbytes for codes in self._codes.values()))
+    
+    # =========================================================================
+    # 构建
+    # =========================================================================
+    
+    @classmethod
+    def from_documents(cls, documents: List[Document], ids: Optional[List[str]] = None, mmap: bool = CHUNK_STORE_MMAP) -> "ChunkStore":
+        """
+        从 Document 列表构建
+        
+        Args:
+            ids: chunk ID；默认取元数据中的 chunk_id，没有时为行号
+        """
+        if ids is None:
+            ids = [document.metadata.get("chunk_id") or str(row) for row, document in enumerate(documents)]
+        texts, offsets = cls._pack((document.page_content for document in documents), mmap)
+        return cls(ids, texts, offsets, (document.metadata for document in documents))
+    
+    @classmethod
+    def from_collection(cls, collection: Any, ids: Optional[List[str]] = None, mmap: bool = CHUNK_STORE_MMAP) -> "ChunkStore":
+        """
+        从 Chroma 集合分页读取构建（不一次性 get 全部文本与元数据）
+        
+        Args:
+            ids: 集合中的 chunk ID（调用方已读取时传入，避免重复查询）
+        """
+        if ids is None:
+            ids = collection.get(include=[])["ids"]
+        ids = list(ids)
+        metadatas: List[Optional[Dict[str, Any]]] = []
+        
+        def texts() -> Iterator[str]:
+            for start in range(0, len(ids), _COLLECTION_PAGE_SIZE):
+                page_ids = ids[start:start + _COLLECTION_PAGE_SIZE]
+                page = collection.get(ids=page_ids, include=["documents", "metadatas"])
+                rows = dict(zip(page["ids"], zip(page["documents"], page["metadatas"])))
+                for chunk_id in page_ids:
+                    text, metadata = rows.get(chunk_id, ("", None))  # 读取期间被删除的 chunk 保留为空行
+                    metadatas.append(metadata)
+                    yield text or ""
+        
+        buffer, offsets = cls._pack(texts(), mmap)
+        store = cls(ids, buffer, offsets, metadatas)
+        logger.info(f"Chunk store built: {len(store)} chunks, {store.nbytes / (1024 * 1024):.1f} MB{' (mmap)' if mmap else ''}")
+        return store
+    
+    @classmethod
+    def from_snapshot(cls, snapshot: Any) -> "ChunkStore":
+        """引用知识库快照的文本缓冲与偏移（只读 mmap，不复制）"""
+        return cls(snapshot.ids, snapshot.text_buffer, snapshot.text_offsets, snapshot.metadatas)
+    
+    @staticmethod
+    def _pack(texts: Iterable[str], mmap: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """将文本依次编码拼接为连续缓冲；mmap 时写入匿名临时文件并只读映射"""
+        offsets = [0]
+        if not mmap:
+            buffer = bytearray()
+            for text in texts:
+                buffer += text.encode("utf-8")
+                offsets.append(len(buffer))
+            return np.frombuffer(buffer, dtype=np.uint8), np.asarray(offsets, dtype=np.int64)
+        
+        with tempfile.TemporaryFile(prefix="chunk-store-") as f:
+            for text in texts:
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+            f.flush()
+            size = offsets[-1]
+            # 映射独立于文件对象，关闭（删除）临时文件后仍然有效
+            buffer = np.memmap(f, dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+        return buffer, np.asarray(offsets, dtype=np.int64)
+    
+    @staticmethod
+    def _encode_columns(metadatas: Iterable[Optional[Dict[str, Any]]], count: int) -> Tuple[Dict[str, np.ndarray], Dict[str, List[Any]]]:
+        """元数据按字段字典编码：{字段: int32[N] 编码（-1 为缺失）}，{字段: 取值表}"""
+        codes: Dict[str, np.ndarray] = {}
+        values: Dict[str, List[Any]] = {}
+        index: Dict[str, Dict[Any, int]] = {}
+        for row, metadata in enumerate(metadatas):
+            for key, value in (metadata or {}).items():
+                if key not in codes:
+                    codes[key] = np.full(count, _MISSING, dtype=np.int32)
+                    values[key] = []
+                    index[key] = {}
+                try:
+                    lookup = (type(value), value)  # 区分 1 / 1.0 / True
+                    code = index[key].get(lookup)
+                except TypeError:  # 不可哈希的取值不去重
+                    lookup, code = None, None
+                if code is None:
+                    code = len(values[key])
+                    values[key].append(value)
+                    if lookup is not None:
+                        index[key][lookup] = code
+                codes[key][row] = code
+        return codes, values
@@ -0,0 +1,320 @@
+"""
+Text Chunking
+文本切分 - 按 CHUNKING_STRATEGY 创建切分器
+
+- recursive:        RecursiveCharacterTextSplitter，固定 CHUNK_SIZE / CHUNK_OVERLAP
+- content_defined:  内容定义边界（CDC），边界只取决于附近的文本；文档中间的编辑只改变附近的 chunk，
+                    其余 chunk 文本不变，重新入库时命中嵌入缓存而无需重新嵌入
+- token:            按嵌入模型的 token 数切分（单遍，fast tokenizer），chunk 不会被嵌入模型 / 重排模型截断，
+                    元数据中记录 chunk 在源文本中的字符偏移
+"""
+import re
+import bisect
+import hashlib
+import logging
+import functools
+from typing import Any, List, Tuple
+
+from langchain_core.documents import Document
+
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_STRATEGY, CDC_MIN_CHUNK_SIZE, CDC_MAX_CHUNK_SIZE,
+    CHUNK_TOKEN_SIZE, CHUNK_TOKEN_OVERLAP, CHUNK_TOKENIZER
+)
+
+logger = logging.getLogger(__name__)
+
+# 句子边界：段落（空行）、中英文句末标点（含其后的引号 / 括号）
+_SENTENCE_END = r"\n[ \t]*\n\s*|[。！？；!?;…]+[”’」』）)\"']*|\.+[”’\"')\]]*(?=\s)"
+_SENTENCE_BOUNDARY = re.compile(_SENTENCE_END)
+# CDC 候选边界：句子边界与换行
+_BOUNDARY = re.compile(_SENTENCE_END + r"|\n")
+_HASH_SCALE = float(1 << 64)
+
+# 没有 fast tokenizer 时的近似分词：CJK 字符、英文单词 / 数字、其他符号各算一个 token
+_APPROX_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+_MODELS_CACHE_DIR = "./models_cache"
+
+
+def create_text_splitter(strategy: str = CHUNKING_STRATEGY) -> Any:
+    """按切分策略创建切分器（均提供 split_documents / split_text）"""
+    if strategy == "content_defined":
+        return ContentDefinedSplitter(
+            chunk_size=CHUNK_SIZE,
+            min_chunk_size=CDC_MIN_CHUNK_SIZE,
+            max_chunk_size=CDC_MAX_CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+        )
+    if strategy == "token":
+        return TokenAwareSplitter(
+            chunk_size=CHUNK_TOKEN_SIZE,
+            chunk_overlap=CHUNK_TOKEN_OVERLAP,
+            tokenizer_name=CHUNK_TOKENIZER,
+        )
+    if strategy == "recursive":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        
+        return RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+        )
+    raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+
+class ContentDefinedSplitter:
+    """
+    内容定义边界的切分器
+    
+    先在段落 / 句子末尾取候选边界，再对每个候选边界前的句子计算哈希决定是否在此切分：
+    长度未达 min_chunk_size 时不切，超过 max_chunk_size 前强制在上一个候选边界切分。
+    切分概率与句子长度成正比（平均 chunk 长度约为 chunk_size，与句子长短无关），
+    超过 chunk_size 后提高概率使长度分布集中，段落边界的概率加倍。
+    
+    切分判断只依赖该句的内容和当前 chunk 已有的长度，编辑只影响所在 chunk 与其后一两个 chunk，
+    之后的边界会重新与编辑前对齐。重叠部分取上一个 chunk 末尾的整句（不超过 chunk_overlap）。
+    
+    Usage:
+        splitter = ContentDefinedSplitter(chunk_size=600, min_chunk_size=150, max_chunk_size=1200)
+        chunks = splitter.split_documents(documents)
+    """
+    
+    def __init__(self, chunk_size: int = 600, min_chunk_size: int = 150, max_chunk_size: int = 1200, chunk_overlap: int = 0):
+        """
+        Args:
+            chunk_size: 平均 chunk 长度（字符）
+            min_chunk_size: 最小 chunk 长度（文档末尾的 chunk 除外）
+            max_chunk_size: 最大 chunk 长度（不含重叠部分）
+            chunk_overlap: 与上一个 chunk 重叠的最大长度，按整句截取
+        """
+        if not 0 < min_chunk_size < chunk_size < max_chunk_size:
+            raise ValueError(
+                f"Content-defined chunk sizes must satisfy 0 < min ({min_chunk_size}) < target ({chunk_size}) < max ({max_chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.chunk_overlap = max(0, chunk_overlap)
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """切分文档，每个 chunk 继承所属文档的元数据"""
+        chunks = []
+        for document in documents:
+            for text in self.split_text(document.page_content):
+                chunks.append(Document(page_content=text, metadata=dict(document.metadata)))
+        return chunks
+    
+    def split_text(self, text: str) -> List[str]:
+        segments = self._segments(text)
+        chunks = []
+        for first, last in self._group(text, segments):
+            start = segments[first][0]
+            if self.chunk_overlap and first > 0:
+                # 向前取上一个 chunk 末尾的整句，重叠总长（相对本 chunk 起点）不超过 chunk_overlap
+                i = first
+                while i > 0 and segments[first][0] - segments[i - 1][0] <= self.chunk_overlap:
+                    i -= 1
+                start = segments[i][0]
+            chunk = text[start:segments[last][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+    
+    def _segments(self, text: str) -> List[Tuple[int, int, bool]]:
+        """按候选边界切成句子 [(start, end, 是否段落结尾)]；超过 max_chunk_size 的句子按空白硬切"""
+        segments = []
+        start = 0
+        for match in _BOUNDARY.finditer(text):
+            end = match.end()
+            if end <= start:
+                continue
+            paragraph = match.group().count("\n") > 1
+            if segments and not text[start:end].strip():
+                # 句末标点后的空白归入上一句
+                segments[-1] = (segments[-1][0], end, segments[-1][2] or paragraph)
+            else:
+                segments.extend(self._fit(text, start, end, paragraph))
+            start = end
+        if start < len(text):
+            segments.extend(self._fit(text, start, len(text), True))
+        return segments
+    
+    def _fit(self, text: str, start: int, end: int, paragraph: bool) -> List[Tuple[int, int, bool]]:
+        pieces = []
+        while end - start > self.max_chunk_size:
+            cut = text.rfind(" ", start + self.min_chunk_size, start + self.max_chunk_size)
+            cut = cut + 1 if cut > 0 else start + self.max_chunk_size
+            pieces.append((start, cut, False))
+            start = cut
+        pieces.append((start, end, paragraph))
+        return pieces
+    
+    def _group(self, text: str, segments: List[Tuple[int, int, bool]]) -> List[Tuple[int, int]]:
+        """把句子合并为 chunk [(首句下标, 末句下标)]"""
+        groups = []
+        first = 0
+        for i, (start, end, paragraph) in enumerate(segments):
+            if i > first and end - segments[first][0] > self.max_chunk_size:
+                groups.append((first, i - 1))
+                first = i
+            length = end - segments[first][0]
+            if length >= self.min_chunk_size and self._is_boundary(text[start:end], length, paragraph):
+                groups.append((first, i))
+                first = i + 1
+        if first < len(segments):
+            groups.append((first, len(segments) - 1))
+        return groups
+    
+    def _is_boundary(self, sentence: str, length: int, paragraph: bool) -> bool:
+        """句子哈希映射到 [0, 1)，小于切分概率时在该句末尾切分"""
+        digest = hashlib.blake2b(sentence.strip().encode("utf-8"), digest_size=8).digest()
+        probability = len(sentence) / (self.chunk_size - self.min_chunk_size)
+        if length >= self.chunk_size:
+            probability *= 4
+        if paragraph:
+            probability *= 2
+        return int.from_bytes(digest, "big") / _HASH_SCALE < probability
+
+
+class _FastTokenizer:
+    """HuggingFace tokenizers（Rust）：一次编码整段文本并返回每个 token 的字符偏移"""
+    
+    def __init__(self, backend: Any):
+        backend.no_truncation()
+        backend.no_padding()
+        self._backend = backend
+    
+    def token_spans(self, text: str) -> Tuple[List[int], List[int]]:
+        return self.token_spans_batch([text])[0]
+    
+    def token_spans_batch(self, texts: List[str]) -> List[Tuple[List[int], List[int]]]:
+        """批量编码（tokenizers 在 Rust 线程池中并行）"""
+        spans = []
+        for encoding in self._backend.encode_batch(texts, add_special_tokens=False):
+            offsets = encoding.offsets
+            spans.append(([start for start, _ in offsets], [end for _, end in offsets]))
+        return spans
+
+
+class _ApproximateTokenizer:
+    """近似分词（中文 BERT 类 tokenizer 按字切分，与 CJK 一致；英文单词会略少估）"""
+    
+    def token_spans(self, text: str) -> Tuple[List[int], List[int]]:
+        starts, ends = [], []
+        for match in _APPROX_TOKEN.finditer(text):
+            starts.append(match.start())
+            ends.append(match.end())
+        return starts, ends
+    
+    def token_spans_batch(self, texts: List[str]) -> List[Tuple[List[int], List[int]]]:
+        return [self.token_spans(text) for text in texts]
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(name: str) -> Any:
+    """加载并缓存模型的 fast tokenizer（只需 tokenizer 文件，不加载模型权重）；不可用时退回近似分词"""
+    try:
+        from transformers import AutoTokenizer
+        
+        tokenizer = AutoTokenizer.from_pretrained(name, cache_dir=_MODELS_CACHE_DIR, use_fast=True)
+        if tokenizer.is_fast:
+            logger.info(f"Loaded fast tokenizer for chunking: {name}")
+            return _FastTokenizer(tokenizer.backend_tokenizer)
+        logger.warning(f"No fast tokenizer available for '{name}', estimating token counts")
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{name}' ({e}), estimating token counts")
+    return _ApproximateTokenizer()
+
+
+class TokenAwareSplitter:
+    """
+    按模型 token 数切分的单遍切分器
+    
+    整段文本只分词一次（fast tokenizer 返回每个 token 的字符偏移，多个文档批量并行编码），再按 token 下标贪心切分：
+    每个 chunk 不超过 chunk_size 个 token，切点优先取窗口后半段中最后一个句子边界，
+    其次取词边界（token 之间有空白），都没有时在 chunk_size 处切分。
+    下一个 chunk 从重叠窗口（chunk_overlap 个 token）内的第一个句子边界开始。
+    
+    chunk 元数据中的 start_index / end_index 为其在源文本（page_content）中的字符偏移。
+    
+    Usage:
+        splitter = TokenAwareSplitter(chunk_size=384, chunk_overlap=64, tokenizer_name="BAAI/bge-base-zh-v1.5")
+        chunks = splitter.split_documents(documents)
+    """
+    
+    def __init__(self, chunk_size: int = 384, chunk_overlap: int = 64, tokenizer_name: str = CHUNK_TOKENIZER):
+        """
+        Args:
+            chunk_size: 每个 chunk 的最大 token 数（不含特殊 token）
+            chunk_overlap: 与上一个 chunk 重叠的最大 token 数
+            tokenizer_name: 计算 token 数所用的模型（应与嵌入模型一致）
+        """
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"Token chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer_name = tokenizer_name
+    
+    @property
+    def tokenizer(self) -> Any:
+        return get_tokenizer(self.tokenizer_name)
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """切分文档，每个 chunk 继承所属文档的元数据并记录字符偏移"""
+        chunks = []
+        token_spans = self.tokenizer.token_spans_batch([document.page_content for document in documents])
+        for document, (starts, ends) in zip(documents, token_spans):
+            for start, end in self._split(document.page_content, starts, ends):
+                metadata = dict(document.metadata)
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                chunks.append(Document(page_content=document.page_content[start:end], metadata=metadata))
+        return chunks
+    
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+    
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """切分文本，返回各 chunk 的字符区间 [(start, end)]"""
+        starts, ends = self.tokenizer.token_spans(text)
+        return self._split(text, starts, ends)
+    
+    def _split(self, text: str, starts: List[int], ends: List[int]) -> List[Tuple[int, int]]:
+        n = len(starts)
+        if n == 0:
+            return []
+        
+        # 句子边界 → 边界之后第一个 token 的下标
+        boundaries = []
+        for match in _SENTENCE_BOUNDARY.finditer(text):
+            index = bisect.bisect_left(starts, match.end())
+            if 0 < index < n and (not boundaries or boundaries[-1] != index):
+                boundaries.append(index)
+        
+        spans = []
+        first = 0
+        while True:
+            last = min(first + self.chunk_size, n)
+            if last < n:
+                last = self._cut(starts, ends, boundaries, first, last)
+            spans.append((starts[first], ends[last - 1]))
+            if last >= n:
+                return spans
+            
+            next_first = last - self.chunk_overlap
+            if self.chunk_overlap:
+                i = bisect.bisect_left(boundaries, next_first)
+                if i < len(boundaries) and boundaries[i] < last:
+                    next_first = boundaries[i]
+            first = max(next_first, first + 1)
+    
+    def _cut(self, starts: List[int], ends: List[int], boundaries: List[int], first: int, last: int) -> int:
+        """在 (first + chunk_size / 2, last] 中选择切点：最后一个句子边界 > 最后一个词边界 > last"""
+        floor = first + self.chunk_size // 2
+        i = bisect.bisect_right(boundaries, last) - 1
+        if i >= 0 and boundaries[i] > floor:
+            return boundaries[i]
+        for index in range(last, floor, -1):
+            if starts[index] > ends[index - 1]:
+                return index
+        return last
@@ -0,0 +1,140 @@
+"""
+CPU Budget
+CPU 预算协调器 - 统一分配 torch 线程与检索线程池大小，避免 CPU 超额订阅
+
+问题：检索线程池中的每个线程调用 torch，而 torch 的 intra-op 线程池默认占满所有核，
+同机的 Ollama 还会再占用 LLM_NUM_THREAD 个线程，并发时线程数远超核数。
+
+做法：
+- 扣除为本机 Ollama 预留的核数，得到可用核数
+- torch intra-op 线程数 = 可用核数 / 预期并发请求数，inter-op 线程数 = 1
+- 检索线程池按并发请求数和每个请求的子查询数确定大小
+"""
+import os
+import sys
+import logging
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from config import (
+    CPU_BUDGET_ENABLED, CPU_RESERVED_CORES, RETRIEVAL_MAX_CONCURRENCY,
+    LLM_USE_OPENAI, LLM_NUM_THREAD, OLLAMA_BASE_URL,
+    QUERY_EXPANSION_N_SUBQUERIES
+)
+
+logger = logging.getLogger(__name__)
+
+# 这些库在首次 import 时读取线程数环境变量
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _ollama_is_local() -> bool:
+    host = urlparse(OLLAMA_BASE_URL).hostname or ""
+    return host in ("localhost", "127.0.0.1", "0.0.0.0", "::1", "host.docker.internal")
+
+
+class CPUBudget:
+    """
+    CPU 预算
+    
+    Usage:
+        budget = CPUBudget()
+        budget.apply()                     # 进程启动时调用一次（在加载模型前）
+        ThreadPoolExecutor(max_workers=budget.retrieval_workers)
+    """
+    
+    def __init__(
+        self,
+        total_cores: Optional[int] = None,
+        reserved_cores: Optional[int] = CPU_RESERVED_CORES,
+        concurrency: int = RETRIEVAL_MAX_CONCURRENCY,
+        queries_per_request: int = QUERY_EXPANSION_N_SUBQUERIES + 1,
+        enabled: bool = CPU_BUDGET_ENABLED,
+    ):
+        """
+        Args:
+            total_cores: 总核数（默认 os.cpu_count()）
+            reserved_cores: 预留给其他进程的核数（负数表示自动：本机 Ollama 时为 LLM_NUM_THREAD）
+            concurrency: 预期的并发检索请求数
+            queries_per_request: 每个请求的查询数（扩展子查询 + 原始查询）
+            enabled: 是否启用；未启用时保持各库默认行为，仅用于展示
+        """
+        self.enabled = enabled
+        self.total_cores = total_cores or os.cpu_count() or 1
+        
+        if reserved_cores is None or reserved_cores < 0:
+            reserved_cores = LLM_NUM_THREAD if (not LLM_USE_OPENAI and _ollama_is_local()) else 0
+        # 至少给本进程留一个核
+        self.reserved_cores = max(0, min(reserved_cores, self.total_cores - 1))
+        self.available_cores = self.total_cores - self.reserved_cores
+        
+        self.concurrency = max(1, concurrency)
+        self.queries_per_request = max(1, queries_per_request)
+        
+        self.torch_intra_op_threads = max(1, self.available_cores // self.concurrency)
+        self.torch_inter_op_threads = 1
+        
+        # 每个查询提交 embedding + BM25 两个任务到检索线程池
+        self.query_workers = self.concurrency * self.queries_per_request
+        self.retrieval_workers = max(2, min(self.available_cores, 2 * self.concurrency * self.queries_per_request))
+        
+        self._applied = False
+        self._lock = threading.Lock()
+    
+    def apply(self):
+        """设置线程环境变量与 torch 线程数（进程内只生效一次）"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            if self._applied:
+                return
+            self._applied = True
+        
+        for var in _THREAD_ENV_VARS:
+            os.environ.setdefault(var, str(self.torch_intra_op_threads))
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        
+        try:
+            import torch
+            torch.set_num_threads(self.torch_intra_op_threads)
+            try:
+                torch.set_num_interop_threads(self.torch_inter_op_threads)
+            except RuntimeError:
+                # inter-op 线程池已启动后不能再修改
+                logger.warning("torch inter-op threads already initialized, leaving unchanged")
+        except ImportError:
+            pass
+        
+        logger.info(f"CPU budget applied: {self.get_settings()}")
+    
+    def executor_workers(self, default: int, kind: str) -> int:
+        """检索线程池大小；未启用时返回原默认值"""
+        if not self.enabled:
+            return default
+        return self.query_workers if kind == "query" else self.retrieval_workers
+    
+    def get_settings(self) -> Dict[str, Any]:
+        """获取生效的设置（用于 /api/info）"""
+        settings = {
+            "enabled": self.enabled,
+            "total_cores": self.total_cores,
+            "reserved_cores": self.reserved_cores,
+            "available_cores": self.available_cores,
+            "concurrency": self.concurrency,
+            "query_workers": self.executor_workers(8, "query"),
+            "retrieval_workers": self.executor_workers(4, "retrieval"),
+            "torch_intra_op_threads": None,
+            "torch_inter_op_threads": None,
+        }
+        # 仅在 torch 已被加载时读取，避免为展示信息导入 torch
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            settings["torch_intra_op_threads"] = torch.get_num_threads()
+            settings["torch_inter_op_threads"] = torch.get_num_interop_threads()
+        return settings
+
+
+# 全局实例
+cpu_budget = CPUBudget()
@@ -0,0 +1,136 @@
+"""
+Near-Duplicate Detection
+入库时的近重复 chunk 检测（MinHash LSH）
+
+每个 chunk 规范化（小写、合并空白）后取字符 shingle，计算 MinHash 签名；签名按 band 分桶（LSH），
+LSH 只用来找候选：同桶的已登记 chunk 再用保存的 shingle 哈希集合计算精确 Jaccard 相似度，
+不低于阈值时才视为近重复（MinHash 估计有方差，单凭估计会合并明显低于阈值的 chunk）。
+签名计算全部向量化（numpy），与 chunk 数量线性相关。
+
+内存：每个已登记 chunk 约 num_perm × 4 字节签名、bands 个桶条目，
+加上 shingle 哈希集合（每个 shingle 8 字节，约等于 chunk 字符数 × 8 字节）。
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_61 = (1 << 61) - 1
+_SHINGLE_BASE = np.uint64(1000003)
+_SHIFT = np.uint64(32)
+
+
+def parse_aliases(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """读取 chunk 元数据中记录的近重复别名 [{"id", "filename", "source", ...}]"""
+    value = metadata.get("aliases") if metadata else None
+    if not value:
+        return []
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return []
+
+
+def dump_aliases(aliases: List[Dict[str, Any]]) -> str:
+    """别名列表 → 元数据值（Chroma 元数据只支持标量，以 JSON 字符串保存；没有别名时为空串）"""
+    return json.dumps(aliases, ensure_ascii=False) if aliases else ""
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH 近重复索引
+    
+    Usage:
+        index = NearDuplicateIndex(threshold=0.9)
+        canonical = index.add(chunk_id, text)   # 已有近重复时返回其 key，否则登记并返回 None
+    """
+    
+    def __init__(self, threshold: float = 0.9, shingle_size: int = 5, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        """
+        Args:
+            threshold: Jaccard 相似度阈值（0-1），对 LSH 候选精确计算
+            shingle_size: 字符 shingle 长度
+            num_perm: MinHash 排列数
+            bands: LSH band 数（num_perm 须能整除）；每个 band 行数越多，候选越少
+                （默认 16 × 8 行：Jaccard 0.9 的 chunk 几乎必然成为候选，0.7 以下很少进入精确比较）
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.shingle_size = max(1, shingle_size)
+        self.num_perm = num_perm
+        self.bands = bands
+        self._rows = num_perm // bands
+        
+        rng = np.random.default_rng(seed)
+        # multiply-shift 哈希族：((a * x + b) mod 2^64) >> 32，a 为奇数
+        self._a = rng.integers(1, _MERSENNE_61, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, _MERSENNE_61, size=num_perm, dtype=np.uint64)
+        
+        self._keys: List[Any] = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._shingles: List[np.ndarray] = []
+        self._buckets: Dict[bytes, List[int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def add(self, key: Any, text: str) -> Optional[Any]:
+        """
+        查找近重复；没有时以 key（如 chunk ID）登记该 chunk
+        
+        Returns:
+            近重复 chunk 的 key（先登记者为代表）；没有时为 None
+        """
+        shingles = self._shingle_hashes(text)
+        signature = self._minhash(shingles)
+        band_keys = [
+            bytes([band]) + signature[band * self._rows:(band + 1) * self._rows].tobytes()
+            for band in range(self.bands)
+        ]
+        
+        candidates = set()
+        for band_key in band_keys:
+            candidates.update(self._buckets.get(band_key, ()))
+        for index in sorted(candidates):
+            if self._jaccard(self._shingles[index], shingles) >= self.threshold:
+                return self._keys[index]
+        
+        index = len(self._keys)
+        if index == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[index] = signature
+        self._keys.append(key)
+        self._shingles.append(shingles)
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(index)
+        return None
+    
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash 签名（num_perm 个 uint32）"""
+        return self._minhash(self._shingle_hashes(text))
+    
+    def _minhash(self, shingles: np.ndarray) -> np.ndarray:
+        values = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> _SHIFT
+        return values.min(axis=1).astype(np.uint32)
+    
+    @staticmethod
+    def _jaccard(a: np.ndarray, b: np.ndarray) -> float:
+        """两个已排序去重的 shingle 哈希集合的精确 Jaccard 相似度"""
+        common = len(np.intersect1d(a, b, assume_unique=True))
+        return common / (len(a) + len(b) - common)
+    
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        """规范化文本的字符 shingle 多项式哈希（去重）；短于 shingle 长度的文本整体作为一个 shingle"""
+        normalized = " ".join(text.lower().split())
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        width = min(self.shingle_size, len(codes)) or 1
+        count = max(1, len(codes) - width + 1)
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            if offset < len(codes):
+                hashes = hashes * _SHINGLE_BASE + codes[offset:offset + count]
+        return np.unique(hashes)
@@ -0,0 +1,445 @@
+"""
+Document Parser
+文档解析器 - 在进程池中并行解析上传的文档
+
+- 每个文件一个任务；页数较多的 PDF 按页范围拆分为多个任务
+- 结果按文件完成顺序流式返回（同一文件的各页范围全部完成后按页序合并）
+- 单个文件解析失败不影响其他文件，失败信息与每个文件的耗时一起返回
+- 文档来源为 bytes（直接用 BytesIO 解析）或磁盘路径（工作进程按需读取 / mmap，进程间只传递路径）
+"""
+import io
+import os
+import csv
+import mmap
+import codecs
+import time
+import contextlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document as LangChainDocument
+
+from config import PARSE_WORKERS, PARSE_PDF_PAGES_PER_TASK
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.csv', '.txt', '.md', '.docx', '.doc')
+
+# 文档来源：内存中的内容，或磁盘上的文件路径（如 DocumentStore 中的 blob）
+DocumentSource = Union[bytes, str]
+
+
+def _extract_docx_text(source: Any) -> str:
+    """提取 Word 文档的段落与表格文本（source 为文件路径或二进制流）"""
+    from docx import Document as DocxDocument
+    
+    doc = DocxDocument(source)
+    text_parts = []
+    
+    # 提取所有段落
+    for para in doc.paragraphs:
+        if para.text.strip():
+            text_parts.append(para.text)
+    
+    # 提取表格内容
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = []
+            for cell in row.cells:
+                if cell.text.strip():
+                    row_text.append(cell.text.strip())
+            if row_text:
+                text_parts.append(" | ".join(row_text))
+    
+    # 合并所有文本
+    return "\n\n".join(text_parts)
+
+
+class WordDocumentLoader:
+    """Word文档加载器（使用python-docx）"""
+    
+    def __init__(self, file_path: str):
+        """
+        初始化Word文档加载器
+        
+        Args:
+            file_path: Word文档路径
+        """
+        self.file_path = file_path
+    
+    def load(self) -> List[LangChainDocument]:
+        """加载Word文档"""
+        try:
+            full_text = _extract_docx_text(self.file_path)
+            
+            if not full_text.strip():
+                logger.warning(f"Word document {self.file_path} appears to be empty")
+                return []
+            
+            # 创建LangChain Document对象
+            return [LangChainDocument(
+                page_content=full_text,
+                metadata={"source": self.file_path}
+            )]
+        
+        except ImportError as import_err:
+            error_msg = "python-docx library not installed. Please install it with: pip install python-docx"
+            logger.error(error_msg)
+            logger.error(f"Import error details: {import_err}")
+            raise ImportError(error_msg) from import_err
+        except Exception as e:
+            logger.error(f"Error loading Word document {self.file_path}: {e}")
+            import traceback
+            logger.error(f"Word document loading traceback: {traceback.format_exc()}")
+            raise
+
+
+# =============================================================================
+# 解析函数（在工作进程中执行，必须是模块级函数以便 pickle）
+# =============================================================================
+
+def _open_source(source: DocumentSource) -> BinaryIO:
+    """以二进制流打开文档来源（bytes → BytesIO；路径 → 文件，按需读取）"""
+    if isinstance(source, str):
+        return open(source, 'rb')
+    return io.BytesIO(source)
+
+
+@contextlib.contextmanager
+def _map_source(source: DocumentSource):
+    """以 buffer 形式访问文档内容（路径 → 只读 mmap，由内核按需分页，不复制到进程堆）"""
+    if not isinstance(source, str):
+        yield source
+        return
+    with open(source, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _parse_pdf_pages(filename: str, source: DocumentSource, start: int, end: int) -> List[LangChainDocument]:
+    """解析 PDF 的 [start, end) 页，每页一个 Document（与 PyPDFLoader 的输出一致）"""
+    from pypdf import PdfReader
+    
+    with _open_source(source) as stream:
+        reader = PdfReader(stream)
+        documents = []
+        for page_num in range(start, min(end, len(reader.pages))):
+            text = reader.pages[page_num].extract_text() or ""
+            documents.append(LangChainDocument(
+                page_content=text,
+                metadata={"source": filename, "page": page_num}
+            ))
+    return documents
+
+
+def _decode_text(file_content: Any) -> str:
+    """解码文本文件（UTF-8 优先，依次回退到 GBK、Latin-1）；file_content 为任意 bytes-like（含 mmap）"""
+    try:
+        return str(file_content, 'utf-8')
+    except UnicodeDecodeError:
+        try:
+            return str(file_content, 'gbk')
+        except UnicodeDecodeError:
+            return str(file_content, 'latin-1')
+
+
+def _parse_csv(filename: str, source: DocumentSource) -> List[LangChainDocument]:
+    """每行一个 Document，格式与 CSVLoader 一致（"列名: 值" 逐行拼接）"""
+    with _open_source(source) as raw:
+        # 只用文件开头探测编码（增量解码器允许截断在多字节字符中间）
+        encoding = 'utf-8-sig'
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(raw.read(65536), final=False)
+        except UnicodeDecodeError:
+            encoding = 'gbk'
+        raw.seek(0)
+        
+        # 流式解码，不生成整份文件的 str 副本
+        stream = io.TextIOWrapper(raw, encoding=encoding, errors='replace', newline='')
+        try:
+            return _csv_rows_to_documents(filename, stream)
+        finally:
+            stream.detach()
+
+
+def _csv_rows_to_documents(filename: str, stream: Any) -> List[LangChainDocument]:
+    documents = []
+    for row_num, row in enumerate(csv.DictReader(stream)):
+        lines = []
+        for key, value in row.items():
+            key = key.strip() if key is not None else ""
+            if isinstance(value, list):
+                value = ",".join(v.strip() for v in value)
+            else:
+                value = value.strip() if value is not None else ""
+            lines.append(f"{key}: {value}")
+        documents.append(LangChainDocument(
+            page_content="\n".join(lines),
+            metadata={"source": filename, "row": row_num}
+        ))
+    return documents
+
+
+def _parse_file(filename: str, source: DocumentSource) -> List[LangChainDocument]:
+    """解析单个非 PDF 文件"""
+    lower = filename.lower()
+    if lower.endswith('.csv'):
+        return _parse_csv(filename, source)
+    
+    if lower.endswith(('.txt', '.md')):
+        with _map_source(source) as content:
+            text = _decode_text(content)
+        return [LangChainDocument(page_content=text, metadata={"source": filename})]
+    
+    if lower.endswith(('.docx', '.doc')):
+        with _open_source(source) as stream:
+            full_text = _extract_docx_text(stream)
+        if not full_text.strip():
+            logger.warning(f"Word document {filename} appears to be empty")
+            return []
+        return [LangChainDocument(page_content=full_text, metadata={"source": filename})]
+    
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+def _run_task(filename: str, source: DocumentSource, page_range: Optional[Tuple[int, int]]) -> Tuple[List[LangChainDocument], float]:
+    """执行单个解析任务，返回 (documents, 耗时秒)"""
+    start = time.perf_counter()
+    if page_range is not None:
+        documents = _parse_pdf_pages(filename, source, *page_range)
+    else:
+        documents = _parse_file(filename, source)
+    return documents, time.perf_counter() - start
+
+
+def _count_pdf_pages(source: DocumentSource) -> int:
+    from pypdf import PdfReader
+    with _open_source(source) as stream:
+        return len(PdfReader(stream).pages)
+
+
+class ParseResult:
+    """单个文件的解析结果"""
+    
+    __slots__ = ("filename", "documents", "duration_s", "error")
+    
+    def __init__(self, filename: str, documents: List[LangChainDocument], duration_s: float, error: Optional[str] = None):
+        self.filename = filename
+        self.documents = documents
+        self.duration_s = duration_s  # 各任务解析耗时之和（CPU 时间，不含排队）
+        self.error = error
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "duration_s": round(self.duration_s, 3),
+            "error": self.error,
+        }
+
+
+class DocumentParser:
+    """
+    文档解析器
+    
+    Usage:
+        parser = DocumentParser()
+        for result in parser.parse_iter({"a.pdf": b"..."}):
+            ...
+        documents, report = parser.parse_all({"a.pdf": b"..."})
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, pdf_pages_per_task: int = PARSE_PDF_PAGES_PER_TASK):
+        """
+        Args:
+            max_workers: 工作进程数（默认 PARSE_WORKERS；<=0 时按 CPU 预算的可用核数），1 表示在当前进程解析
+            pdf_pages_per_task: 每个 PDF 任务包含的页数
+        """
+        if max_workers is None:
+            max_workers = PARSE_WORKERS
+        if max_workers <= 0:
+            from managers.cpu_budget import cpu_budget
+            max_workers = cpu_budget.available_cores
+        self.max_workers = max(1, max_workers)
+        self.pdf_pages_per_task = max(1, pdf_pages_per_task)
+        self.max_pending = 2 * self.max_workers  # 在途任务上限（背压）
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing as mp
+                # 与推理进程池一致使用 spawn，避免 fork 持有线程/torch 状态的父进程
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context("spawn"))
+                logger.info(f"DocumentParser: started process pool with {self.max_workers} workers")
+            return self._executor
+    
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+    
+    def shutdown(self):
+        self._reset_executor()
+    
+    def _plan_tasks(self, filename: str, source: DocumentSource) -> List[Optional[Tuple[int, int]]]:
+        """拆分任务：PDF 按页范围拆分，其他文件一个任务（None）"""
+        if not filename.lower().endswith('.pdf'):
+            return [None]
+        total_pages = _count_pdf_pages(source)
+        step = self.pdf_pages_per_task
+        return [(start, start + step) for start in range(0, max(total_pages, 1), step)]
+    
+    def parse_iter(self, sources: Dict[str, DocumentSource]) -> Iterator[ParseResult]:
+        """
+        并行解析，按文件完成顺序逐个返回结果
+        
+        Args:
+            sources: {filename: bytes 或磁盘路径}
+        """
+        # 规划任务（不支持的类型与无法读取页数的 PDF 直接返回错误）
+        plans: Dict[str, List[Optional[Tuple[int, int]]]] = {}
+        for filename, source in sources.items():
+            if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                logger.warning(f"Unsupported file type: {filename}")
+                yield ParseResult(filename, [], 0.0, error="Unsupported file type")
+                continue
+            try:
+                plans[filename] = self._plan_tasks(filename, source)
+            except Exception as e:
+                logger.error(f"Error loading {filename}: {e}")
+                yield ParseResult(filename, [], 0.0, error=str(e))
+        
+        total_tasks = sum(len(tasks) for tasks in plans.values())
+        if total_tasks == 0:
+            return
+        
+        # 只有一个任务或只配置了一个 worker 时在当前进程解析，省去进程间传输
+        if total_tasks == 1 or self.max_workers == 1:
+            for filename, tasks in plans.items():
+                yield self._parse_inline(filename, sources[filename], tasks)
+            return
+        
+        yield from self._parse_in_pool(sources, plans)
+    
+    def parse_all(self, sources: Dict[str, DocumentSource]) -> Tuple[List[LangChainDocument], Dict[str, Dict[str, Any]]]:
+        """
+        并行解析并汇总
+        
+        Returns:
+            (按输入文件顺序排列的 documents, {filename: {documents, duration_s, error}})
+        """
+        results = {result.filename: result for result in self.parse_iter(sources)}
+        
+        documents: List[LangChainDocument] = []
+        report: Dict[str, Dict[str, Any]] = {}
+        for filename in sources:
+            result = results.get(filename)
+            if result is None:
+                continue
+            documents.extend(result.documents)
+            report[filename] = result.to_dict()
+            if not result.error:
+                logger.info(f"Successfully loaded {len(result.documents)} pages from {filename} ({result.duration_s:.2f}s)")
+        return documents, report
+    
+    def _parse_inline(self, filename: str, source: DocumentSource, tasks: List[Optional[Tuple[int, int]]]) -> ParseResult:
+        documents: List[LangChainDocument] = []
+        duration = 0.0
+        try:
+            for page_range in tasks:
+                docs, elapsed = _run_task(filename, source, page_range)
+                documents.extend(docs)
+                duration += elapsed
+            return ParseResult(filename, documents, duration)
+        except Exception as e:
+            logger.error(f"Error loading {filename}: {e}")
+            return ParseResult(filename, [], duration, error=str(e))
+    
+    def _parse_in_pool(self, sources: Dict[str, DocumentSource], plans: Dict[str, List[Optional[Tuple[int, int]]]]) -> Iterator[ParseResult]:
+        try:
+            executor = self._get_executor()
+        except Exception as e:
+            logger.error(f"DocumentParser: process pool unavailable, parsing in-process: {e}")
+            self._reset_executor()
+            for filename, tasks in plans.items():
+                yield self._parse_inline(filename, sources[filename], tasks)
+            return
+        
+        # 按顺序惰性提交，最多 max_pending 个任务在途：消费方处理慢时不会堆积解析结果
+        pending_tasks = iter([
+            (filename, index, page_range)
+            for filename, tasks in plans.items()
+            for index, page_range in enumerate(tasks)
+        ])
+        futures: Dict[Any, Tuple[str, int]] = {}
+        
+        # 收集同一文件的各页范围，全部完成后按页序合并
+        parts: Dict[str, Dict[int, List[LangChainDocument]]] = {name: {} for name in plans}
+        durations: Dict[str, float] = {name: 0.0 for name in plans}
+        errors: Dict[str, str] = {}
+        broken = False
+        
+        def submit_more():
+            while not broken and len(futures) < self.max_pending:
+                task = next(pending_tasks, None)
+                if task is None:
+                    return
+                filename, index, page_range = task
+                if filename not in parts:
+                    continue
+                try:
+                    future = executor.submit(_run_task, filename, sources[filename], page_range)
+                except Exception as e:
+                    errors[filename] = f"failed to submit parse task: {e}"
+                    continue
+                futures[future] = (filename, index)
+        
+        submit_more()
+        while futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                filename, index = futures.pop(future)
+                if filename not in parts:
+                    continue  # 该文件已因其他页范围失败而返回
+                try:
+                    docs, elapsed = future.result()
+                    parts[filename][index] = docs
+                    durations[filename] += elapsed
+                except BrokenProcessPool as e:
+                    # 工作进程崩溃（如内存不足），剩余任务无法完成
+                    broken = True
+                    errors[filename] = f"parser process crashed: {e}"
+                except Exception as e:
+                    errors[filename] = str(e)
+                
+                if filename in errors:
+                    parts.pop(filename)
+                    logger.error(f"Error loading {filename}: {errors[filename]}")
+                    yield ParseResult(filename, [], durations[filename], error=errors[filename])
+                elif len(parts[filename]) == len(plans[filename]):
+                    file_parts = parts.pop(filename)
+                    documents = [doc for i in sorted(file_parts) for doc in file_parts[i]]
+                    yield ParseResult(filename, documents, durations[filename])
+            submit_more()
+        
+        # 未能提交的文件（进程池崩溃或提交失败）
+        for filename in list(parts):
+            error = errors.get(filename, "parser process pool crashed")
+            logger.error(f"Error loading {filename}: {error}")
+            yield ParseResult(filename, [], durations[filename], error=error)
+        
+        if broken:
+            self._reset_executor()
+
+
+# 全局解析器实例（进程池在首次并行解析时创建）
+document_parser = DocumentParser()
@@ -0,0 +1,426 @@
+"""
+Document Store
+内容寻址的磁盘文档存储 - 上传的原始文件保存在磁盘上，进程内只保留文件名到内容哈希的索引
+
+存储布局（DOCUMENT_STORE_DIR）：
+- blobs/ab/abcdef...:  原始文件内容，以 SHA-256 命名；内容相同的文件只存一份
+- index.json:          {filename: {sha256, size, uploaded_at}}，原子写入（临时文件 + rename）
+- tmp/:                上传中的临时文件，写完并校验哈希后 rename 到 blobs/
+- texts/abcdef....txt: 入库时提取的纯文本（UTF-8），页之间以空行分隔
+- texts/abcdef....json: 文本索引 —— 字符数、每页/每段的起始字符偏移、每 4096 字符的字节偏移检查点
+
+上传按块流式写入磁盘，不在内存中拼接整份文件；解析时传递文件路径，由解析器按需读取或 mmap。
+预览与范围读取（第 N 页 / 第 N 段 / offset+length）通过检查点定位后只读取所需的字节，
+耗时与文档大小无关，且不经过服务层的全局锁。
+重启后从 index.json 恢复文档列表，并清理中断上传留下的临时文件与无引用的 blob。
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_READ_CHUNK_SIZE = 1024 * 1024  # 流式写入的块大小
+_CHECKPOINT_CHARS = 4096  # 文本索引中字节偏移检查点的间隔（字符）
+_TEXT_INDEX_CACHE_SIZE = 64  # 进程内缓存的文本索引数
+_PAGE_SEPARATOR = "\n\n"
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class DocumentStore:
+    """
+    磁盘文档存储
+    
+    Usage:
+        store = DocumentStore("./document_store")
+        entry = store.put_stream("a.pdf", file.stream)
+        path = store.path("a.pdf")          # 交给解析器按需读取
+        store.put_text("a.pdf", [page.page_content for page in pages])
+        store.read_text("a.pdf", offset=0, length=1000)
+        store.delete("a.pdf")
+    """
+    
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir: 存储根目录
+        """
+        self.root_dir = root_dir
+        self._blob_dir = os.path.join(root_dir, "blobs")
+        self._tmp_dir = os.path.join(root_dir, "tmp")
+        self._text_dir = os.path.join(root_dir, "texts")
+        self._index_path = os.path.join(root_dir, "index.json")
+        
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._text_indexes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._text_lock = threading.Lock()
+        
+        self._load()
+    
+    # =========================================================================
+    # 加载
+    # =========================================================================
+    
+    def _load(self):
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        os.makedirs(self._text_dir, exist_ok=True)
+        
+        # 中断的上传
+        for name in os.listdir(self._tmp_dir):
+            os.remove(os.path.join(self._tmp_dir, name))
+        
+        index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self._index_path):
+            try:
+                with open(self._index_path, encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.error(f"DocumentStore: failed to read index, starting empty: {e}")
+        for filename, entry in index.items():
+            if os.path.exists(self._blob_path(entry["sha256"])):
+                self._index[filename] = entry
+            else:
+                logger.warning(f"DocumentStore: blob missing for '{filename}', dropping entry")
+        if len(self._index) != len(index):
+            self._write_index()
+        
+        # 无引用的 blob（写入 blob 后、写入索引前中断）
+        referenced = {entry["sha256"] for entry in self._index.values()}
+        for prefix in os.listdir(self._blob_dir):
+            prefix_dir = os.path.join(self._blob_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    os.remove(os.path.join(prefix_dir, digest))
+        for name in os.listdir(self._text_dir):
+            if name.split(".", 1)[0] not in referenced:
+                os.remove(os.path.join(self._text_dir, name))
+        
+        logger.info(f"DocumentStore: {len(self._index)} documents in {self.root_dir}")
+    
+    def _write_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._index_path)
+    
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest[:2], digest)
+    
+    def _text_paths(self, digest: str):
+        base = os.path.join(self._text_dir, digest)
+        return f"{base}.txt", f"{base}.json"
+    
+    def _remove_blob(self, digest: str):
+        """删除 blob 及其提取文本（调用方保证已无文件名引用）"""
+        for path in (self._blob_path(digest), *self._text_paths(digest)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._text_lock:
+            self._text_indexes.pop(digest, None)
+    
+    # =========================================================================
+    # 写入
+    # =========================================================================
+    
+    def put_stream(self, filename: str, stream: BinaryIO, chunk_size: int = _READ_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        按块将上传流写入磁盘
+        
+        Args:
+            filename: 文件名
+            stream: 二进制可读流
+            chunk_size: 每次读取的字节数
+        
+        Returns:
+            {filename, sha256, size, uploaded_at, deduplicated}
+        
+        Raises:
+            FileExistsError: 文件名已存在
+            ValueError: 内容为空
+        """
+        if filename in self:
+            raise FileExistsError(filename)
+        
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    block = stream.read(chunk_size)
+                    if not block:
+                        break
+                    digest.update(block)
+                    f.write(block)
+                    size += len(block)
+                f.flush()
+                os.fsync(f.fileno())
+            if size == 0:
+                raise ValueError("File is empty or could not be read")
+            
+            sha256 = digest.hexdigest()
+            blob_path = self._blob_path(sha256)
+            with self._lock:
+                if filename in self._index:
+                    raise FileExistsError(filename)
+                deduplicated = os.path.exists(blob_path)
+                if not deduplicated:
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.replace(tmp_path, blob_path)
+                entry = {"sha256": sha256, "size": size, "uploaded_at": time.time()}
+                self._index[filename] = entry
+                self._write_index()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        if deduplicated:
+            logger.info(f"DocumentStore: '{filename}' has the same content as an existing document, reusing blob")
+        return {"filename": filename, **entry, "deduplicated": deduplicated}
+    
+    def delete(self, filename: str) -> bool:
+        """删除文档；没有其他文件名引用时同时删除 blob"""
+        with self._lock:
+            entry = self._index.pop(filename, None)
+            if entry is None:
+                return False
+            self._write_index()
+            if not any(other["sha256"] == entry["sha256"] for other in self._index.values()):
+                try:
+                    self._remove_blob(entry["sha256"])
+                except OSError as e:
+                    logger.warning(f"DocumentStore: failed to remove blob for '{filename}': {e}")
+            return True
+    
+    def clear(self) -> int:
+        """删除所有文档，返回删除数量"""
+        with self._lock:
+            count = len(self._index)
+            for digest in {entry["sha256"] for entry in self._index.values()}:
+                try:
+                    self._remove_blob(digest)
+                except OSError as e:
+                    logger.warning(f"DocumentStore: failed to remove blob {digest}: {e}")
+            self._index = {}
+            self._write_index()
+            return count
+    
+    # =========================================================================
+    # 读取
+    # =========================================================================
+    
+    def __contains__(self, filename: str) -> bool:
+        with self._lock:
+            return filename in self._index
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+    
+    def list(self) -> List[str]:
+        with self._lock:
+            return sorted(self._index)
+    
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """获取文档元信息（sha256、size、uploaded_at），不存在时返回 None"""
+        with self._lock:
+            entry = self._index.get(filename)
+            return dict(entry) if entry else None
+    
+    def path(self, filename: str) -> str:
+        """文档内容在磁盘上的路径（只读；内容寻址，同一路径内容不会改变）"""
+        with self._lock:
+            entry = self._index.get(filename)
+        if entry is None:
+            raise KeyError(filename)
+        return self._blob_path(entry["sha256"])
+    
+    def sources(self) -> Dict[str, str]:
+        """{filename: 磁盘路径}，供解析器按需读取"""
+        with self._lock:
+            return {filename: self._blob_path(entry["sha256"]) for filename, entry in self._index.items()}
+    
+    def read_bytes(self, filename: str) -> bytes:
+        with open(self.path(filename), "rb") as f:
+            return f.read()
+    
+    # =========================================================================
+    # 提取文本
+    # =========================================================================
+    
+    def put_text(self, filename: str, pages: List[str]) -> Dict[str, Any]:
+        """
+        保存文档的提取文本及页/段偏移（按内容哈希存放，相同内容的文件共享）
+        
+        Args:
+            filename: 文件名
+            pages: 按顺序排列的页文本（PDF 为页，CSV 为行，其他格式为整篇）
+        
+        Returns:
+            文本索引（chars、pages、paragraphs 计数）
+        """
+        digest = self._digest(filename)
+        text = _PAGE_SEPARATOR.join(pages)
+        
+        page_starts, position = [], 0
+        for page in pages:
+            page_starts.append(position)
+            position += len(page) + len(_PAGE_SEPARATOR)
+        paragraph_starts = [0] + [match.end() for match in _PARAGRAPH_BREAK.finditer(text) if match.end() < len(text)]
+        
+        # 每 _CHECKPOINT_CHARS 个字符记录一次 UTF-8 字节偏移，范围读取时据此定位
+        checkpoints, byte_offset = [], 0
+        for start in range(0, len(text), _CHECKPOINT_CHARS):
+            checkpoints.append(byte_offset)
+            byte_offset += len(text[start:start + _CHECKPOINT_CHARS].encode("utf-8"))
+        
+        text_index = {
+            "chars": len(text),
+            "pages": page_starts,
+            "paragraphs": paragraph_starts,
+            "checkpoints": checkpoints,
+        }
+        text_path, index_path = self._text_paths(digest)
+        for path, write in (
+            (text_path, lambda f: f.write(text.encode("utf-8"))),
+            (index_path, lambda f: f.write(json.dumps(text_index).encode("utf-8"))),
+        ):
+            tmp_path = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        
+        with self._text_lock:
+            self._text_indexes.pop(digest, None)
+        return self._summarize_text_index(text_index)
+    
+    def get_text_info(self, filename: str) -> Optional[Dict[str, Any]]:
+        """提取文本的概况（chars、pages、paragraphs 计数）；尚未提取时返回 None"""
+        text_index = self._load_text_index(self._digest(filename))
+        return self._summarize_text_index(text_index) if text_index else None
+    
+    def read_text(
+        self,
+        filename: str,
+        offset: int = 0,
+        length: int = 1000,
+        page: Optional[int] = None,
+        paragraph: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取提取文本的一段
+        
+        Args:
+            filename: 文件名
+            offset: 起始字符偏移（指定 page / paragraph 时相对于该页/段起点）
+            length: 最多读取的字符数
+            page: 页号（从 1 开始），读取范围限制在该页内
+            paragraph: 段号（从 1 开始），读取范围限制在该段内
+        
+        Returns:
+            {text, start, end, range_end, truncated}；尚未提取文本时返回 None
+        
+        Raises:
+            KeyError: 文件不存在
+            IndexError: 页号/段号超出范围
+        """
+        digest = self._digest(filename)
+        text_index = self._load_text_index(digest)
+        if text_index is None:
+            return None
+        
+        total = text_index["chars"]
+        range_start, range_end = 0, total
+        for number, starts in ((page, text_index["pages"]), (paragraph, text_index["paragraphs"])):
+            if number is None:
+                continue
+            if not 1 <= number <= len(starts):
+                raise IndexError(f"out of range (1-{len(starts)})")
+            range_start = starts[number - 1]
+            range_end = starts[number] if number < len(starts) else total
+            break
+        
+        start = min(range_start + max(0, offset), range_end)
+        end = min(start + max(0, length), range_end)
+        text = self._read_chars(digest, text_index, start, end)
+        return {
+            "text": text.rstrip() if page is not None or paragraph is not None else text,
+            "start": start,
+            "end": end,
+            "range_end": range_end,
+            "truncated": end < range_end,
+        }
+    
+    def _digest(self, filename: str) -> str:
+        with self._lock:
+            entry = self._index.get(filename)
+        if entry is None:
+            raise KeyError(filename)
+        return entry["sha256"]
+    
+    def _load_text_index(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._text_lock:
+            text_index = self._text_indexes.get(digest)
+            if text_index is not None:
+                self._text_indexes.move_to_end(digest)
+                return text_index
+        
+        _, index_path = self._text_paths(digest)
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                text_index = json.load(f)
+        except FileNotFoundError:
+            return None
+        
+        with self._text_lock:
+            self._text_indexes[digest] = text_index
+            while len(self._text_indexes) > _TEXT_INDEX_CACHE_SIZE:
+                self._text_indexes.popitem(last=False)
+        return text_index
+    
+    def _read_chars(self, digest: str, text_index: Dict[str, Any], start: int, end: int) -> str:
+        """读取字符区间 [start, end)：从最近的检查点开始解码，读取量与文档大小无关"""
+        if end <= start:
+            return ""
+        checkpoint = start // _CHECKPOINT_CHARS
+        skip = start - checkpoint * _CHECKPOINT_CHARS
+        text_path, _ = self._text_paths(digest)
+        with open(text_path, "rb") as f:
+            f.seek(text_index["checkpoints"][checkpoint])
+            # UTF-8 每字符最多 4 字节
+            data = f.read(4 * (skip + end - start))
+        return data.decode("utf-8", errors="ignore")[skip:skip + end - start]
+    
+    @staticmethod
+    def _summarize_text_index(text_index: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "chars": text_index["chars"],
+            "pages": len(text_index["pages"]),
+            "paragraphs": len(text_index["paragraphs"]),
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(entry["size"] for entry in self._index.values())
+            unique = {entry["sha256"]: entry["size"] for entry in self._index.values()}
+        stored = sum(unique.values())
+        return {
+            "directory": self.root_dir,
+            "documents": len(self._index),
+            "blobs": len(unique),
+            "size_mb": round(stored / (1024 * 1024), 2),
+            "deduplicated_mb": round((total - stored) / (1024 * 1024), 2),
+        }
@@ -0,0 +1,265 @@
+"""
+Embedding Cache
+内容寻址的持久化嵌入缓存 - 重建知识库时只为新增/变化的 chunk 调用嵌入模型
+
+存储格式（每个嵌入模型一个目录）：
+- meta.json:   模型名、向量维度、存储精度
+- keys.bin:    每条记录 20 字节的 SHA-1(chunk 文本)，按写入顺序追加
+- vectors.bin: 与 keys.bin 一一对应的向量（float16/float32 行主序），按写入顺序追加
+
+只追加写入：先写向量再写 key，进程中断时以两者中较短的一方为准，保证 key 总有对应向量。
+写入出错（如磁盘已满）时两个文件都截回写入前的长度；截断也失败时本进程不再写入，
+避免之后追加的 key 与向量错位（重启后 _load 截掉多余的尾部）。
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+_KEY_SIZE = 20  # SHA-1 digest
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    嵌入缓存（单个模型）
+    
+    Usage:
+        cache = EmbeddingCache("./embedding_cache", "BAAI/bge-base-zh-v1.5")
+        vectors = cache.get_many(texts)     # 未命中的位置为 None
+        cache.put_many(miss_texts, miss_vectors)
+    """
+    
+    def __init__(self, cache_dir: str, model_name: str, dtype: str = "float16"):
+        """
+        Args:
+            cache_dir: 缓存根目录
+            model_name: 嵌入模型名（不同模型的向量分目录存放）
+            dtype: 存储精度 float16 | float32
+        """
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.directory = os.path.join(cache_dir, slug or hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16])
+        
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._keys_path = os.path.join(self.directory, "keys.bin")
+        self._vectors_path = os.path.join(self.directory, "vectors.bin")
+        
+        self._index: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._dim: Optional[int] = None
+        self._writable = True
+        self._lock = threading.Lock()
+        
+        self._load()
+    
+    # =========================================================================
+    # 加载
+    # =========================================================================
+    
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self._meta_path):
+            return
+        
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta.get("model") != self.model_name or meta.get("dtype") != self.dtype.name:
+                logger.info(f"EmbeddingCache: settings changed, discarding cache at {self.directory}")
+                self._reset_files()
+                return
+            
+            self._dim = int(meta["dim"])
+            with open(self._keys_path, "rb") as f:
+                keys = f.read()
+            
+            row_bytes = self._dim * self.dtype.itemsize
+            vector_rows = os.path.getsize(self._vectors_path) // row_bytes
+            rows = min(len(keys) // _KEY_SIZE, vector_rows)
+            
+            # 截掉中断写入留下的不完整尾部
+            if rows * _KEY_SIZE != len(keys) or rows != vector_rows:
+                logger.warning(f"EmbeddingCache: truncating to {rows} consistent entries")
+                with open(self._keys_path, "r+b") as f:
+                    f.truncate(rows * _KEY_SIZE)
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(rows * row_bytes)
+            
+            self._index = {keys[i * _KEY_SIZE:(i + 1) * _KEY_SIZE]: i for i in range(rows)}
+            self._remap(rows)
+            logger.info(f"EmbeddingCache: loaded {rows} embeddings ({self.dtype.name}, dim={self._dim}) from {self.directory}")
+        
+        except Exception as e:
+            logger.error(f"EmbeddingCache: failed to load cache, starting empty: {e}")
+            self._reset_files()
+    
+    def _reset_files(self):
+        for path in (self._meta_path, self._keys_path, self._vectors_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._index = {}
+        self._vectors = None
+        self._dim = None
+    
+    def _remap(self, rows: int):
+        """重新映射向量文件（只读 mmap，不占用常驻内存）"""
+        if rows == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self._dim))
+    
+    # =========================================================================
+    # 读写
+    # =========================================================================
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """按文本查找向量，未命中的位置返回 None"""
+        with self._lock:
+            vectors = self._vectors
+            index = self._index
+            results: List[Optional[np.ndarray]] = []
+            for text in texts:
+                row = index.get(_text_key(text))
+                results.append(None if row is None else np.asarray(vectors[row], dtype=np.float32))
+            return results
+    
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """追加新向量（已存在的 key 跳过）"""
+        if not texts:
+            return
+        
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim != 2 or array.shape[0] != len(texts):
+            raise ValueError("vectors must be a 2-D array with one row per text")
+        
+        with self._lock:
+            if not self._writable:
+                return
+            if self._dim is None:
+                self._dim = int(array.shape[1])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self._dim, "dtype": self.dtype.name}, f)
+            elif array.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension changed ({array.shape[1]} != {self._dim})")
+            
+            new_keys: List[bytes] = []
+            new_rows: List[int] = []
+            seen = set()
+            for i, text in enumerate(texts):
+                key = _text_key(text)
+                if key in self._index or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(i)
+            if not new_keys:
+                return
+            
+            # 先写向量再写 key：key 存在即保证向量完整
+            start = len(self._index)
+            try:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(array[new_rows].astype(self.dtype).tobytes())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+            except Exception:
+                self._rollback(start)
+                raise
+            
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+            self._remap(len(self._index))
+    
+    def _rollback(self, rows: int):
+        """写入失败：两个文件截回 rows 条记录，保持 key 与向量逐行对应"""
+        try:
+            for path, row_bytes in ((self._vectors_path, self._dim * self.dtype.itemsize), (self._keys_path, _KEY_SIZE)):
+                if os.path.exists(path):
+                    with open(path, "r+b") as f:
+                        f.truncate(rows * row_bytes)
+        except Exception as e:
+            self._writable = False
+            logger.error(f"EmbeddingCache: failed to roll back a partial write, disabling writes until restart: {e}")
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计（用于 /api/info）"""
+        size = 0
+        for path in (self._keys_path, self._vectors_path):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return {
+            "directory": self.directory,
+            "entries": len(self._index),
+            "dim": self._dim,
+            "dtype": self.dtype.name,
+            "size_mb": round(size / (1024 * 1024), 2),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带缓存的嵌入模型包装
+    
+    embed_documents 只为缓存未命中的文本调用底层模型；embed_query 直接透传（查询不缓存）。
+    hits / misses 为累计计数，调用方可在前后取差值得到单次操作的命中情况。
+    """
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+        
+        # 未命中的文本去重后再计算
+        miss_texts: List[str] = []
+        miss_positions: Dict[str, int] = {}
+        for text, vector in zip(texts, cached):
+            if vector is None and text not in miss_positions:
+                miss_positions[text] = len(miss_texts)
+                miss_texts.append(text)
+        
+        computed: List[List[float]] = []
+        if miss_texts:
+            computed = self.embeddings.embed_documents(miss_texts)
+            try:
+                self.cache.put_many(miss_texts, computed)
+            except Exception as e:
+                logger.error(f"EmbeddingCache: failed to store embeddings: {e}")
+        
+        with self._stats_lock:
+            self.hits += len(texts) - len(miss_texts)
+            self.misses += len(miss_texts)
+        
+        results: List[List[float]] = []
+        for text, vector in zip(texts, cached):
+            if vector is None:
+                results.append(list(computed[miss_positions[text]]))
+            else:
+                results.append(vector.tolist())
+        return results
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
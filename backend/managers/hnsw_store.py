@@ -0,0 +1,266 @@
+"""
+HNSW Vector Store
+近似最近邻向量存储后端（VECTOR_BACKEND=hnsw，可选依赖 hnswlib：pip install hnswlib）
+
+在 NumpyCollection 的存储（向量矩阵 + SQLite）之上建立 hnswlib 索引，标签为矩阵行号：
+- 查询走 HNSW 图（ef_search 控制召回率与延迟），带元数据条件的查询对矩阵精确扫描
+- 写入：新行 add_items，已有 ID 原位更新；删除：mark_deleted；矩阵压缩后重建索引
+- 持久化：关闭时保存 hnsw.bin 与参数文件 hnsw.json；首次写入前删除参数文件，
+  进程异常退出后（参数文件缺失或与配置不符）打开时由向量矩阵重建索引
+- 并发：查询之间、查询与 add_items / mark_deleted 之间可并行，只有 resize_index 需要独占
+
+存储格式与 numpy 后端相同，两个后端之间切换无需重建知识库。
+"""
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import hnswlib
+import numpy as np
+
+from managers.numpy_store import NumpyCollection
+from config import HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE = "hnsw.bin"
+_PARAMS_FILE = "hnsw.json"
+
+
+class _ReadWriteLock:
+    """读写锁：多个读者并行，写者独占（写者等待时不再接纳新读者）"""
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class HnswCollection(NumpyCollection):
+    """
+    HNSW 近似检索集合（线程安全）
+    
+    Usage:
+        collection = HnswCollection("documents", directory="./chroma_db/numpy/documents")
+        collection.ef_search = 128      # 提高召回率（延迟随之增加）
+        results = collection.query(query_embeddings=[q], n_results=10, include=["distances"])
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        directory: Optional[str] = None,
+        m: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+        ef_search: int = HNSW_EF_SEARCH
+    ):
+        """
+        Args:
+            m: 每个节点的最大邻居数（越大召回率越高，内存与构建时间随之增加）
+            ef_construction: 构建时的候选列表长度
+            ef_search: 查询时的候选列表长度（实际取 max(ef_search, k)）
+        """
+        self._index = None
+        self._index_ids: List[Optional[str]] = []  # 索引标签（行号）对应的 ID 列表，压缩后与新索引一起替换
+        self._index_lock = _ReadWriteLock()
+        self._params = {"space": "l2", "M": m, "ef_construction": ef_construction}
+        self._ef_search = ef_search
+        self._saved = False  # 磁盘上的索引与当前状态一致（参数文件存在）
+        super().__init__(name, directory, quantization="none")  # hnswlib 自身保存 float32 向量，量化编码不减少内存
+    
+    @property
+    def ef_search(self) -> int:
+        return self._ef_search
+    
+    @ef_search.setter
+    def ef_search(self, value: int):
+        with self._index_lock.write():
+            self._ef_search = value
+            if self._index is not None:
+                self._index.set_ef(value)
+    
+    # =========================================================================
+    # 读取
+    # =========================================================================
+    
+    def _search(self, queries: np.ndarray, n_results: int, where: Optional[Dict[str, Any]]) -> Tuple[List[List[str]], List[List[float]]]:
+        if where is not None:
+            return super()._search(queries, n_results, where)
+        with self._index_lock.read():
+            index, ids = self._index, self._index_ids
+            k = min(n_results, len(self._rows))
+            if index is None or k <= 0:
+                return [[] for _ in queries], [[] for _ in queries]
+            try:
+                # 单条查询由检索线程池并发执行，只用一个线程；批量查询按查询并行
+                labels, distances = index.knn_query(queries, k=k, num_threads=1 if len(queries) == 1 else -1)
+            except RuntimeError:
+                # 删除的节点较多、图中可达节点不足 k 个时 hnswlib 报错，改为精确扫描
+                labels = None
+        if labels is None:
+            return super()._search(queries, n_results, where)
+        
+        result_ids, result_distances = [], []
+        for query_labels, query_distances in zip(labels, distances):
+            pairs = [
+                (ids[label], float(distance))
+                for label, distance in zip(query_labels.tolist(), query_distances.tolist())
+                if label < len(ids) and ids[label] is not None  # 检索期间被删除的行
+            ]
+            result_ids.append([chunk_id for chunk_id, _ in pairs])
+            result_distances.append([distance for _, distance in pairs])
+        return result_ids, result_distances
+    
+    # =========================================================================
+    # 写入
+    # =========================================================================
+    
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None
+    ):
+        if not len(ids):
+            return
+        with self._lock:
+            self._mark_unsaved()
+            super().upsert(ids, embeddings, documents, metadatas)
+            # 同一批中重复的 ID 只保留最后一次写入
+            latest = {self._rows[chunk_id]: position for position, chunk_id in enumerate(ids)}
+            rows = np.fromiter(latest.keys(), dtype=np.int64, count=len(latest))
+            self._index.add_items(self._matrix[rows], rows)
+    
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            rows = self._select_rows(ids, where) if ids is not None or where is not None else []
+            if not rows:
+                return super().delete(ids=ids, where=where)
+            self._mark_unsaved()
+            ids_before = self._ids
+            super().delete(ids=ids, where=where)
+            if self._ids is ids_before:  # 未压缩（压缩时已重建索引）
+                for row in rows:
+                    self._index.mark_deleted(row)
+    
+    def close(self, persist: bool = True):
+        with self._lock:
+            if persist and self._index is not None and not self._saved and self._directory and os.path.isdir(self._directory):
+                self._save_index()
+            self._index = None
+            super().close(persist)
+    
+    # =========================================================================
+    # 索引维护
+    # =========================================================================
+    
+    def _load(self):
+        super()._load()
+        if self._matrix is None:
+            return
+        index_path, params_path = self._index_paths()
+        if params_path and os.path.exists(params_path) and os.path.exists(index_path):
+            try:
+                with open(params_path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                rows = saved.get("rows", -1)
+                if saved.get("params") == self._params and len(self._ids) <= rows <= self._matrix.shape[0]:
+                    index = hnswlib.Index(space="l2", dim=self._matrix.shape[1])
+                    index.load_index(index_path, max_elements=self._matrix.shape[0])
+                    index.set_ef(self._ef_search)
+                    # 末尾已删除的行不在 SQLite 中：补齐为墓碑，新行不复用索引中已删除的标签
+                    self._ids.extend([None] * (rows - len(self._ids)))
+                    self._index, self._index_ids = index, self._ids
+                    self._saved = True
+                    logger.info(f"Loaded HNSW index of collection '{self.name}': {index.get_current_count()} nodes")
+                    return
+                logger.info(f"HNSW index of collection '{self.name}' does not match the configured parameters")
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.warning(f"Failed to load HNSW index of collection '{self.name}': {e}")
+        self._index, self._index_ids = self._build_index(self._matrix.shape[0]), self._ids
+    
+    def _ensure_capacity(self, size: int, dim: int):
+        super()._ensure_capacity(size, dim)
+        capacity = self._matrix.shape[0]
+        if self._index is None:
+            self._index, self._index_ids = self._build_index(capacity), self._ids
+        elif self._index.get_max_elements() < capacity:
+            with self._index_lock.write():
+                self._index.resize_index(capacity)
+    
+    def _compact(self):
+        # 重建期间的查询继续使用旧索引与旧 ID 列表（两者一起替换）
+        super()._compact()
+        index = self._build_index(self._matrix.shape[0])
+        with self._index_lock.write():
+            self._index, self._index_ids = index, self._ids
+    
+    def _build_index(self, capacity: int) -> Any:
+        """由向量矩阵（存活行）构建索引"""
+        start = time.perf_counter()
+        index = hnswlib.Index(space="l2", dim=self._matrix.shape[1])
+        index.init_index(max_elements=capacity, ef_construction=self._params["ef_construction"], M=self._params["M"])
+        index.set_ef(self._ef_search)
+        rows = np.flatnonzero(self._alive[:len(self._ids)])
+        if len(rows):
+            index.add_items(self._matrix[rows], rows)
+            logger.info(f"Built HNSW index of collection '{self.name}': {len(rows)} nodes in {time.perf_counter() - start:.1f}s")
+        return index
+    
+    def _index_paths(self) -> Tuple[Optional[str], Optional[str]]:
+        if not self._directory:
+            return None, None
+        return os.path.join(self._directory, _INDEX_FILE), os.path.join(self._directory, _PARAMS_FILE)
+    
+    def _mark_unsaved(self):
+        """首次写入前删除参数文件：写入后异常退出时，磁盘上的旧索引不会被当作有效索引加载"""
+        if not self._saved:
+            return
+        _, params_path = self._index_paths()
+        if params_path and os.path.exists(params_path):
+            os.remove(params_path)
+        self._saved = False
+    
+    def _save_index(self):
+        index_path, params_path = self._index_paths()
+        start = time.perf_counter()
+        self._index.save_index(index_path)
+        with open(params_path, "w", encoding="utf-8") as f:
+            json.dump({"params": self._params, "rows": len(self._ids)}, f)
+        self._saved = True
+        logger.info(f"Saved HNSW index of collection '{self.name}' in {time.perf_counter() - start:.1f}s")
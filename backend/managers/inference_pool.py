@@ -0,0 +1,473 @@
+"""
+Inference Pool
+进程外模型推理池
+
+每个 worker 是独立的 Python 进程，各自持有 embedding 模型和 Cross-Encoder 模型，
+通过 Pipe 与 Web 进程通信，从而绕开 GIL，使 CPU 密集的推理随核数扩展。
+
+- 请求队列：调用方从空闲 worker 队列中取出一个 worker，独占使用后归还
+- 健康检查：后台线程定期检查进程存活并对空闲 worker 发送 ping，异常则重启
+- 启动失败：worker 按指数退避重新启动；所有 worker 都启动失败时请求立即报错，不等待超时
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    DEVICE, EMBEDDING_MODEL, RERANKING_MODEL,
+    INFERENCE_POOL_WORKERS, INFERENCE_POOL_TIMEOUT, INFERENCE_POOL_HEALTH_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+_BOOT_RETRY_BASE = 5.0    # 启动失败后首次重试的等待时间（秒），之后逐次翻倍
+_BOOT_RETRY_MAX = 300.0
+
+
+# =============================================================================
+# Worker 进程
+# =============================================================================
+
+def _worker_main(conn, worker_id: int, embedding_model: str, reranking_model: str,
+                 device: str, torch_threads: int):
+    """
+    Worker 进程入口（在子进程中运行）
+    
+    协议: 父进程发送 (op, payload)，worker 回复 ("ok", result) 或 ("error", message)
+    """
+    try:
+        import torch
+        torch.set_num_threads(max(1, torch_threads))
+    except Exception:
+        pass
+    
+    embedder = None
+    reranker = None
+    served = 0
+    
+    try:
+        from sentence_transformers import SentenceTransformer
+        embedder = SentenceTransformer(embedding_model, device=device, cache_folder="./models_cache")
+        conn.send(("ready", {"pid": os.getpid(), "worker_id": worker_id}))
+    except Exception as e:
+        conn.send(("error", f"Failed to load embedding model: {e}"))
+        return
+    
+    while True:
+        try:
+            op, payload = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        
+        if op == "stop":
+            break
+        
+        try:
+            if op == "ping":
+                result = {"pid": os.getpid(), "served": served, "reranker_loaded": reranker is not None}
+            elif op == "embed":
+                import numpy as np
+                texts = [t.replace("\n", " ") for t in payload["texts"]]
+                result = np.asarray(
+                    embedder.encode(texts, normalize_embeddings=True, convert_to_numpy=True),
+                    dtype=np.float32
+                )
+            elif op == "rerank":
+                import numpy as np
+                if reranker is None:
+                    from sentence_transformers import CrossEncoder
+                    reranker = CrossEncoder(reranking_model, max_length=512, device=device)
+                result = np.asarray(
+                    reranker.predict(payload["pairs"], batch_size=payload["batch_size"], show_progress_bar=False),
+                    dtype=np.float32
+                )
+            else:
+                conn.send(("error", f"Unknown op: {op}"))
+                continue
+            
+            served += 1
+            conn.send(("ok", result))
+        
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+# =============================================================================
+# 父进程侧
+# =============================================================================
+
+class _WorkerHandle:
+    """单个 worker 进程的句柄"""
+    
+    def __init__(self, worker_id: int, process: Any, conn: Any, boot_failures: int = 0):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.boot_failures = boot_failures  # 连续启动失败次数（启动成功后清零）
+        self.boot_error: Optional[str] = None  # 本次启动失败的原因（None 表示启动中或已就绪）
+        self.retry_at = 0.0  # 启动失败后由健康检查重新启动的时间
+        self.started_at = time.time()
+        self.last_ok = 0.0
+        self.requests = 0
+        self.failures = 0
+    
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class InferencePool:
+    """
+    进程外推理池
+    
+    Usage:
+        pool = InferencePool(num_workers=2)
+        pool.start()
+        vectors = pool.embed(["hello", "world"])
+        scores = pool.rerank([("query", "doc")])
+    """
+    
+    def __init__(
+        self,
+        num_workers: int = 2,
+        timeout: float = 60.0,
+        health_interval: float = 10.0,
+        embedding_model: str = EMBEDDING_MODEL,
+        reranking_model: str = RERANKING_MODEL,
+        device: str = DEVICE,
+    ):
+        self.num_workers = max(1, num_workers)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.embedding_model = embedding_model
+        self.reranking_model = reranking_model
+        self.device = device
+        
+        self._ctx = mp.get_context("spawn")  # torch 不支持 fork 后使用
+        self._workers: Dict[int, _WorkerHandle] = {}
+        self._idle: "queue.Queue[_WorkerHandle]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self._restarts = 0
+        self._started = False
+    
+    # =========================================================================
+    # 生命周期
+    # =========================================================================
+    
+    def start(self):
+        """启动所有 worker 和健康检查线程"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        
+        for worker_id in range(self.num_workers):
+            self._spawn_worker(worker_id)
+        
+        self._health_thread = threading.Thread(
+            target=self._health_loop, name="inference-pool-health", daemon=True
+        )
+        self._health_thread.start()
+        logger.info(f"InferencePool started with {self.num_workers} workers")
+    
+    def shutdown(self):
+        """停止所有 worker"""
+        self._stop_event.set()
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        
+        for handle in workers:
+            self._terminate(handle)
+        logger.info("InferencePool shut down")
+    
+    def _spawn_worker(self, worker_id: int, boot_failures: int = 0):
+        """创建 worker 进程，并在后台等待其加载完模型"""
+        from managers.cpu_budget import cpu_budget
+        torch_threads = max(1, cpu_budget.available_cores // self.num_workers)
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, worker_id, self.embedding_model, self.reranking_model,
+                  self.device, torch_threads),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        
+        handle = _WorkerHandle(worker_id, process, parent_conn, boot_failures)
+        with self._lock:
+            self._workers[worker_id] = handle
+        
+        threading.Thread(
+            target=self._await_ready, args=(handle,), name=f"inference-worker-{worker_id}-boot", daemon=True
+        ).start()
+    
+    def _await_ready(self, handle: _WorkerHandle):
+        """等待 worker 加载模型完成后加入空闲队列"""
+        try:
+            # 首次加载可能需要下载模型，超时放宽
+            if not handle.conn.poll(max(self.timeout, 600)):
+                raise TimeoutError("worker did not become ready in time")
+            status, info = handle.conn.recv()
+            if status != "ready":
+                raise RuntimeError(info)
+            
+            handle.ready = True
+            handle.boot_failures = 0
+            handle.last_ok = time.time()
+            self._idle.put(handle)
+            logger.info(f"Inference worker {handle.worker_id} ready (pid={info.get('pid')})")
+        
+        except Exception as e:
+            self._terminate(handle)
+            # 句柄保留在 _workers 中，由健康检查在退避时间到达后重新启动
+            handle.boot_failures += 1
+            delay = min(_BOOT_RETRY_MAX, _BOOT_RETRY_BASE * 2 ** (handle.boot_failures - 1))
+            handle.retry_at = time.time() + delay
+            handle.boot_error = str(e) or type(e).__name__
+            logger.error(
+                f"Inference worker {handle.worker_id} failed to start "
+                f"(attempt {handle.boot_failures}, retry in {delay:.0f}s): {handle.boot_error}"
+            )
+    
+    def _terminate(self, handle: _WorkerHandle):
+        """终止 worker 进程"""
+        try:
+            if handle.is_alive():
+                try:
+                    handle.conn.send(("stop", None))
+                except Exception:
+                    pass
+                handle.process.join(timeout=2)
+                if handle.process.is_alive():
+                    handle.process.terminate()
+            handle.conn.close()
+        except Exception:
+            pass
+    
+    def _restart_worker(self, handle: _WorkerHandle):
+        """重启失败的 worker"""
+        if self._stop_event.is_set():
+            return
+        with self._lock:
+            # 健康检查线程与调用方可能同时发现故障，只重启一次
+            if self._workers.get(handle.worker_id) is not handle:
+                return
+            self._workers.pop(handle.worker_id)
+            self._restarts += 1
+        
+        logger.warning(f"Restarting inference worker {handle.worker_id}")
+        self._terminate(handle)
+        self._spawn_worker(handle.worker_id, handle.boot_failures)
+    
+    def _boot_error(self) -> Optional[str]:
+        """所有 worker 都启动失败（没有就绪或启动中的 worker）时返回失败原因"""
+        with self._lock:
+            workers = list(self._workers.values())
+        errors = [handle.boot_error for handle in workers]
+        if not workers or any(error is None for error in errors):
+            return None
+        return errors[0]
+    
+    # =========================================================================
+    # 请求分发
+    # =========================================================================
+    
+    def _call(self, op: str, payload: Any) -> Any:
+        """取一个空闲 worker 执行请求（调用方在此排队）"""
+        if not self._started:
+            self.start()
+        
+        deadline = time.time() + self.timeout
+        while True:
+            error = self._boot_error()
+            if error is not None:
+                raise RuntimeError(f"No inference worker could start: {error}")
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"No inference worker available within {self.timeout}s")
+            try:
+                # 分段等待，以便启动中的 worker 全部失败时及时报错
+                handle = self._idle.get(timeout=min(remaining, 1.0))
+                break
+            except queue.Empty:
+                continue
+        
+        healthy = True
+        try:
+            handle.requests += 1
+            handle.conn.send((op, payload))
+            if not handle.conn.poll(self.timeout):
+                healthy = False
+                raise TimeoutError(f"Inference worker {handle.worker_id} timed out on '{op}'")
+            
+            status, result = handle.conn.recv()
+            if status != "ok":
+                handle.failures += 1
+                raise RuntimeError(f"Inference worker {handle.worker_id} error: {result}")
+            
+            handle.last_ok = time.time()
+            return result
+        
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError) as e:
+            healthy = False
+            raise RuntimeError(f"Inference worker {handle.worker_id} crashed: {e}") from e
+        
+        finally:
+            if healthy:
+                self._idle.put(handle)
+            else:
+                self._restart_worker(handle)
+    
+    def embed(self, texts: Sequence[str]) -> Any:
+        """批量嵌入，返回 float32 numpy 数组 (n, dim)"""
+        return self._call("embed", {"texts": list(texts)})
+    
+    def rerank(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32) -> Any:
+        """Cross-Encoder 打分，返回 float32 numpy 数组 (n,)"""
+        return self._call("rerank", {"pairs": [tuple(p) for p in pairs], "batch_size": batch_size})
+    
+    # =========================================================================
+    # 健康检查
+    # =========================================================================
+    
+    def _health_loop(self):
+        while not self._stop_event.wait(self.health_interval):
+            try:
+                self.health_check()
+            except Exception as e:
+                logger.error(f"Inference pool health check failed: {e}")
+    
+    def health_check(self) -> Dict[str, Any]:
+        """检查所有 worker：重启已退出的进程与到达退避时间的启动失败 worker，对空闲 worker 发送 ping"""
+        with self._lock:
+            workers = list(self._workers.values())
+        
+        for handle in workers:
+            if handle.boot_error is not None:
+                if time.time() >= handle.retry_at:
+                    self._restart_worker(handle)
+            elif handle.ready and not handle.is_alive():
+                logger.error(f"Inference worker {handle.worker_id} exited unexpectedly")
+                handle.ready = False
+                self._restart_worker(handle)
+        
+        # 只 ping 当前空闲的 worker，不与正在处理请求的调用方抢占
+        pinged = []
+        while True:
+            try:
+                handle = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            pinged.append(handle)
+        
+        for handle in pinged:
+            try:
+                handle.conn.send(("ping", None))
+                if handle.conn.poll(5) and handle.conn.recv()[0] == "ok":
+                    handle.last_ok = time.time()
+                    self._idle.put(handle)
+                    continue
+            except Exception:
+                pass
+            handle.ready = False
+            self._restart_worker(handle)
+        
+        return self.get_stats()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取推理池状态（用于 /api/info）"""
+        with self._lock:
+            workers = list(self._workers.values())
+            restarts = self._restarts
+        
+        return {
+            "enabled": True,
+            "num_workers": self.num_workers,
+            "ready_workers": sum(1 for w in workers if w.ready and w.is_alive()),
+            "idle_workers": self._idle.qsize(),
+            "restarts": restarts,
+            "workers": [
+                {
+                    "worker_id": w.worker_id,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": w.is_alive(),
+                    "ready": w.ready,
+                    "boot_error": w.boot_error,
+                    "requests": w.requests,
+                    "failures": w.failures,
+                    "last_ok_age_s": round(time.time() - w.last_ok, 1) if w.last_ok else None,
+                }
+                for w in sorted(workers, key=lambda w: w.worker_id)
+            ],
+        }
+
+
+# =============================================================================
+# 适配器：对上层保持与进程内模型相同的接口
+# =============================================================================
+
+class PooledEmbeddings(Embeddings):
+    """与 LangChain Embeddings 接口兼容的进程池嵌入模型"""
+    
+    def __init__(self, pool: InferencePool):
+        self._pool = pool
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._pool.embed(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._pool.embed([text])[0].tolist()
+
+
+class PooledCrossEncoder:
+    """与 sentence-transformers CrossEncoder.predict 接口兼容的进程池重排模型"""
+    
+    def __init__(self, pool: InferencePool):
+        self._pool = pool
+    
+    def predict(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        return self._pool.rerank(sentences, batch_size=batch_size)
+
+
+# =============================================================================
+# 全局实例
+# =============================================================================
+
+_pool: Optional[InferencePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool() -> InferencePool:
+    """获取（必要时创建并启动）全局推理池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(
+                num_workers=INFERENCE_POOL_WORKERS,
+                timeout=INFERENCE_POOL_TIMEOUT,
+                health_interval=INFERENCE_POOL_HEALTH_INTERVAL,
+            )
+            _pool.start()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def get_inference_pool_stats() -> Dict[str, Any]:
+    """获取推理池状态，未启用时返回 disabled"""
+    if _pool is None:
+        return {"enabled": False}
+    return _pool.get_stats()
@@ -0,0 +1,390 @@
+"""
+Ingestion Pipeline
+流式入库流水线：解析 → 切分 → 嵌入 → 写入
+
+各阶段之间通过有界队列连接，解析、嵌入与写入互相重叠：
+- 生产者（调用线程）：逐个消费解析结果，切分为 chunks 后放入 chunk 队列
+- 嵌入线程：按固定批大小从 chunk 队列取出并计算嵌入，放入写入队列
+- 写入线程：将每批 (ids, embeddings, documents, metadatas) upsert 到 Chroma collection
+
+背压：队列满时上游阻塞；此外在途数据（chunk 文本 + 向量）受内存上限约束，
+超过上限时生产者等待写入线程释放额度。峰值内存因此与批大小和上限相关，而与语料规模无关。
+
+传入 JobProgress 时按阶段（parse / chunk / embed / insert）上报进度，并在每个文件与每批嵌入前检查取消。
+
+传入 NearDuplicateIndex 时，与本次已入库 chunk 近重复的 chunk 不嵌入也不写入，
+而是作为别名（ID 与元数据）记录在代表 chunk 的 aliases 元数据中，全部写入后统一更新。
+"""
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from managers.job_manager import JobCancelled, JobProgress
+from managers.dedup import NearDuplicateIndex, dump_aliases, parse_aliases
+from config import INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE, INGEST_MEMORY_LIMIT_MB
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# 向量以 list[float] 传递，每个 Python float 对象约 24 字节 + 8 字节列表指针
+_FLOAT_BYTES = 32
+_DEFAULT_DIM = 1024  # 首批嵌入完成前的维度估计
+
+
+class _MemoryBudget:
+    """在途数据的内存额度（字节）；单个超大条目在额度空闲时仍允许通过，避免死锁"""
+    
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.used = 0
+        self.peak = 0
+        self.wait_s = 0.0
+        self._cond = threading.Condition()
+    
+    def acquire(self, size: int, abort: threading.Event) -> bool:
+        start = time.perf_counter()
+        with self._cond:
+            while self.limit_bytes > 0 and self.used > 0 and self.used + size > self.limit_bytes:
+                if abort.is_set():
+                    return False
+                self._cond.wait(timeout=0.5)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        self.wait_s += time.perf_counter() - start
+        return True
+    
+    def release(self, size: int):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+class IngestionPipeline:
+    """
+    流式入库流水线
+    
+    Usage:
+        pipeline = IngestionPipeline(split_documents, assign_ids, embeddings, collection)
+        stats = pipeline.run(document_parser.parse_iter(sources))
+    """
+    
+    def __init__(
+        self,
+        split_documents: Callable[[List[Any]], List[Any]],
+        assign_ids: Callable[[List[Any]], List[str]],
+        embeddings: Any,
+        collection: Any,
+        batch_size: int = INGEST_BATCH_SIZE,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        memory_limit_mb: float = INGEST_MEMORY_LIMIT_MB,
+        progress: Optional[JobProgress] = None,
+        deduplicator: Optional[NearDuplicateIndex] = None,
+    ):
+        """
+        Args:
+            split_documents: 切分函数（单个文件的 documents → chunks）
+            assign_ids: 为单个文件的 chunks 分配稳定 ID
+            embeddings: 嵌入模型（embed_documents）
+            collection: Chroma collection（upsert）
+            batch_size: 每批嵌入/写入的 chunk 数
+            queue_size: 各阶段队列容量（批）
+            memory_limit_mb: 在途数据内存上限（MB），0 表示只靠队列容量限制
+            progress: 任务进度（可选）；请求取消时 run 抛出 JobCancelled
+            deduplicator: 近重复索引（可选）；提供时近重复 chunk 合并为代表 chunk 的别名
+        """
+        self.split_documents = split_documents
+        self.assign_ids = assign_ids
+        self.embeddings = embeddings
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.progress = progress
+        self.deduplicator = deduplicator
+        
+        self._chunk_queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size) * self.batch_size)
+        self._insert_queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+        self._budget = _MemoryBudget(int(memory_limit_mb * 1024 * 1024))
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._vector_bytes = _DEFAULT_DIM * _FLOAT_BYTES
+        
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "files": 0,
+            "files_failed": 0,
+            "documents": 0,
+            "chunks": 0,
+            "embedded": 0,
+            "inserted": 0,
+            "parse_s": 0.0,
+            "split_s": 0.0,
+            "embed_s": 0.0,
+            "insert_s": 0.0,
+            "duplicates": 0,
+            "dedup_s": 0.0,
+        }
+        self.document_chunks: Dict[str, int] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.aliases: Dict[str, List[Dict[str, Any]]] = {}  # {代表 chunk ID: [别名元数据（含 id）]}
+        self.alias_refs: Dict[str, Set[str]] = {}  # {别名所在文件: 其他文件中的代表 chunk ID}
+        self._duplicate_chars = 0
+    
+    # =========================================================================
+    # 执行
+    # =========================================================================
+    
+    def run(self, parse_results: Iterable[Any]) -> Dict[str, Any]:
+        """
+        执行流水线（阻塞直到全部写入完成）
+        
+        Args:
+            parse_results: ParseResult 可迭代对象（通常为 DocumentParser.parse_iter 的生成器）
+        
+        Returns:
+            统计信息；任一阶段失败时抛出该异常
+        """
+        start = time.perf_counter()
+        hits_before = getattr(self.embeddings, "hits", 0)
+        misses_before = getattr(self.embeddings, "misses", 0)
+        
+        workers = [
+            threading.Thread(target=self._guard, args=(self._embed_loop,), name="ingest-embed", daemon=True),
+            threading.Thread(target=self._guard, args=(self._insert_loop,), name="ingest-insert", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        
+        try:
+            self._produce(parse_results)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._chunk_queue, _DONE, force=True)
+            for worker in workers:
+                worker.join()
+        
+        if self._error is not None:
+            raise self._error
+        
+        if self.aliases:
+            self._write_aliases()
+        
+        elapsed = time.perf_counter() - start
+        result = dict(self.stats)
+        for key in ("parse_s", "split_s", "embed_s", "insert_s", "dedup_s"):
+            result[key] = round(result[key], 3)
+        result.update({
+            "total_s": round(elapsed, 3),
+            "memory_wait_s": round(self._budget.wait_s, 3),
+            "peak_inflight_mb": round(self._budget.peak / (1024 * 1024), 1),
+            "embeddings_cached": getattr(self.embeddings, "hits", 0) - hits_before,
+            "embeddings_computed": (
+                getattr(self.embeddings, "misses", 0) - misses_before
+                if hasattr(self.embeddings, "misses") else self.stats["embedded"]
+            ),
+            "chunks_per_s": round(self.stats["inserted"] / elapsed, 1) if elapsed else 0.0,
+        })
+        if self.deduplicator is not None:
+            # 节省量估计：重复 chunk 的文本与向量（float32）不再存储，嵌入耗时按本次平均每个 chunk 的耗时估计
+            duplicates = self.stats["duplicates"]
+            per_chunk_s = self.stats["embed_s"] / self.stats["embedded"] if self.stats["embedded"] else 0.0
+            result.update({
+                "duplicate_ratio": round(duplicates / (duplicates + self.stats["chunks"]), 4) if duplicates else 0.0,
+                "dedup_saved_mb": round((self._duplicate_chars * 3 + duplicates * self._vector_bytes // _FLOAT_BYTES * 4) / (1024 * 1024), 2),
+                "dedup_saved_embed_s": round(duplicates * per_chunk_s, 3),
+            })
+        return result
+    
+    def _produce(self, parse_results: Iterable[Any]):
+        iterator = iter(parse_results)
+        while not self._abort.is_set():
+            wait_start = time.perf_counter()
+            result = next(iterator, None)
+            self.stats["parse_s"] += time.perf_counter() - wait_start
+            if result is None:
+                self._report_done("parse", "chunk")
+                if self.progress is not None:
+                    self.progress.set_total("embed", self.stats["chunks"])
+                    self.progress.set_total("insert", self.stats["chunks"])
+                return
+            self._report("parse", 1)
+            if self.progress is not None:
+                self.progress.check_cancelled()
+            
+            self.files[result.filename] = result.to_dict()
+            with self._lock:
+                self.stats["files"] += 1
+                if result.error:
+                    self.stats["files_failed"] += 1
+                    continue
+                self.stats["documents"] += len(result.documents)
+            
+            split_start = time.perf_counter()
+            chunks = self.split_documents(result.documents) if result.documents else []
+            ids = self.assign_ids(chunks)
+            self.stats["split_s"] += time.perf_counter() - split_start
+            self.files[result.filename]["chunks"] = len(chunks)
+            self._report("chunk", len(chunks))
+            result.documents = []  # 切分后不再需要原始页面
+            
+            for chunk_id, chunk in zip(ids, chunks):
+                filename = chunk.metadata["filename"]
+                self.document_chunks.setdefault(filename, 0)
+                if self.deduplicator is not None and self._collapse(chunk_id, chunk):
+                    self.files[result.filename]["duplicates"] = self.files[result.filename].get("duplicates", 0) + 1
+                    continue
+                self.document_chunks[filename] += 1
+                size = 2 * len(chunk.page_content) + self._vector_bytes
+                if not self._budget.acquire(size, self._abort):
+                    return
+                if not self._put(self._chunk_queue, (chunk_id, chunk, size)):
+                    return
+                with self._lock:
+                    self.stats["chunks"] += 1
+    
+    def _embed_loop(self):
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    # 已有部分批次时短暂等待后即提交：内存上限可能小于一整批，不能无限等待凑满
+                    item = self._chunk_queue.get(timeout=0.2) if batch else self._chunk_queue.get()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            if not batch or self._abort.is_set():
+                continue
+            if self.progress is not None:
+                self.progress.check_cancelled()
+            
+            texts = [chunk.page_content for _, chunk, _ in batch]
+            embed_start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts)
+            self.stats["embed_s"] += time.perf_counter() - embed_start
+            if vectors:
+                self._vector_bytes = len(vectors[0]) * _FLOAT_BYTES
+            
+            with self._lock:
+                self.stats["embedded"] += len(batch)
+            self._report("embed", len(batch))
+            if not self._put(self._insert_queue, (batch, vectors)):
+                return
+        self._report_done("embed")
+        self._put(self._insert_queue, _DONE, force=True)
+    
+    def _insert_loop(self):
+        while True:
+            item = self._insert_queue.get()
+            if item is _DONE:
+                self._report_done("insert")
+                return
+            batch, vectors = item
+            if not self._abort.is_set():
+                insert_start = time.perf_counter()
+                self.collection.upsert(
+                    ids=[chunk_id for chunk_id, _, _ in batch],
+                    embeddings=vectors,
+                    documents=[chunk.page_content for _, chunk, _ in batch],
+                    metadatas=[chunk.metadata for _, chunk, _ in batch],
+                )
+                self.stats["insert_s"] += time.perf_counter() - insert_start
+                with self._lock:
+                    self.stats["inserted"] += len(batch)
+                self._report("insert", len(batch))
+            self._budget.release(sum(size for _, _, size in batch))
+    
+    # =========================================================================
+    # 近重复合并
+    # =========================================================================
+    
+    def _collapse(self, chunk_id: str, chunk: Any) -> bool:
+        """chunk 与已登记的 chunk 近重复时记录为别名并返回 True（不嵌入、不写入）"""
+        dedup_start = time.perf_counter()
+        filename = chunk.metadata["filename"]
+        canonical = self.deduplicator.add((chunk_id, filename), chunk.page_content)
+        self.stats["dedup_s"] += time.perf_counter() - dedup_start
+        if canonical is None:
+            return False
+        
+        canonical_id, canonical_filename = canonical
+        self.aliases.setdefault(canonical_id, []).append({"id": chunk_id, **chunk.metadata})
+        if canonical_filename != filename:
+            self.alias_refs.setdefault(filename, set()).add(canonical_id)
+        self._duplicate_chars += len(chunk.page_content)
+        with self._lock:
+            self.stats["duplicates"] += 1
+        return True
+    
+    def _write_aliases(self):
+        """将别名写入代表 chunk 的元数据（代表 chunk 此时均已写入集合）"""
+        canonical_ids = list(self.aliases)
+        for start in range(0, len(canonical_ids), self.batch_size):
+            ids = canonical_ids[start:start + self.batch_size]
+            current = self.collection.get(ids=ids, include=["metadatas"])
+            metadatas = []
+            for chunk_id, metadata in zip(current["ids"], current["metadatas"]):
+                metadata = dict(metadata)
+                metadata["aliases"] = dump_aliases(parse_aliases(metadata) + self.aliases[chunk_id])
+                metadatas.append(metadata)
+            if metadatas:
+                self.collection.update(ids=current["ids"], metadatas=metadatas)
+    
+    # =========================================================================
+    # 辅助
+    # =========================================================================
+    
+    def _report(self, phase: str, count: int):
+        if self.progress is not None:
+            self.progress.advance(phase, count)
+    
+    def _report_done(self, *phases: str):
+        if self.progress is not None and not self._abort.is_set():
+            for phase in phases:
+                self.progress.finish(phase)
+    
+    def _guard(self, loop: Callable[[], None]):
+        try:
+            loop()
+        except BaseException as e:
+            self._fail(e)
+            # 排空上游队列，避免生产者在已失败的流水线上阻塞
+            self._drain(self._chunk_queue)
+            self._put(self._insert_queue, _DONE, force=True)
+    
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+            if isinstance(error, JobCancelled):
+                logger.info("Ingestion pipeline cancelled")
+            else:
+                logger.error(f"Ingestion pipeline failed: {error}")
+        self._abort.set()
+    
+    def _put(self, target: "queue.Queue[Any]", item: Any, force: bool = False) -> bool:
+        """带中止检查的阻塞 put；force=True 时用于投递结束标记，失败后会先腾出空间"""
+        while True:
+            if self._abort.is_set() and not force:
+                return False
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._abort.is_set():
+                    self._drain(target)
+    
+    @staticmethod
+    def _drain(target: "queue.Queue[Any]"):
+        try:
+            while True:
+                item = target.get_nowait()
+                if item is _DONE:
+                    target.put_nowait(_DONE)
+                    return
+        except queue.Empty:
+            pass
@@ -0,0 +1,268 @@
+"""
+Job Manager
+后台任务管理器
+
+耗时操作（如重建知识库）在后台线程中执行，接口立即返回任务 ID，调用方通过 ID 轮询状态、请求取消。
+任务按阶段上报进度（计数、总数、速率），用于估算重建窗口与定位耗时所在阶段。
+互斥类型的任务（如重建）同时只运行一个；已结束的任务保留最近 JOB_HISTORY_SIZE 条供查询。
+"""
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import JOB_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """任务已被请求取消（由任务函数在检查点抛出）"""
+
+
+class JobProgress:
+    """
+    分阶段进度
+    
+    每个阶段记录已完成数量、总数（未知时为 None）、开始/结束时间，速率按阶段自身耗时计算。
+    各阶段可以重叠（流水线中解析、嵌入、写入同时进行）。
+    
+    Usage:
+        progress = JobProgress([("parse", "docs"), ("embed", "chunks")])
+        progress.set_total("parse", 10)
+        progress.advance("parse")
+        progress.finish("parse")
+        progress.check_cancelled()   # 已请求取消时抛出 JobCancelled
+    """
+    
+    def __init__(self, phases: List[Tuple[str, str]]):
+        """
+        Args:
+            phases: [(阶段名, 计数单位)]，单位用于速率字段名（如 docs → docs_per_s）
+        """
+        self._phases: "OrderedDict[str, Dict[str, Any]]" = OrderedDict(
+            (name, {"unit": unit, "count": 0, "total": None, "started_at": None, "finished_at": None})
+            for name, unit in phases
+        )
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+    
+    # =========================================================================
+    # 更新（任务线程）
+    # =========================================================================
+    
+    def start(self, phase: str):
+        with self._lock:
+            entry = self._phases[phase]
+            if entry["started_at"] is None:
+                entry["started_at"] = time.time()
+    
+    def set_total(self, phase: str, total: int):
+        with self._lock:
+            self._phases[phase]["total"] = total
+    
+    def advance(self, phase: str, count: int = 1):
+        with self._lock:
+            entry = self._phases[phase]
+            if entry["started_at"] is None:
+                entry["started_at"] = time.time()
+            entry["count"] += count
+    
+    def finish(self, phase: str):
+        with self._lock:
+            entry = self._phases[phase]
+            now = time.time()
+            if entry["started_at"] is None:
+                entry["started_at"] = now
+            entry["finished_at"] = now
+    
+    # =========================================================================
+    # 取消
+    # =========================================================================
+    
+    def cancel(self):
+        self._cancel.set()
+    
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+    
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+    
+    # =========================================================================
+    # 读取
+    # =========================================================================
+    
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        phases: Dict[str, Any] = {}
+        with self._lock:
+            for name, entry in self._phases.items():
+                started, finished = entry["started_at"], entry["finished_at"]
+                elapsed = ((finished or now) - started) if started else 0.0
+                if started is None:
+                    state = "pending"
+                elif finished is None:
+                    state = "running"
+                else:
+                    state = "done"
+                total = entry["total"]
+                phases[name] = {
+                    "state": state,
+                    "count": entry["count"],
+                    "total": total,
+                    "percent": round(100.0 * entry["count"] / total, 1) if total else None,
+                    "elapsed_s": round(elapsed, 3),
+                    f"{entry['unit']}_per_s": round(entry["count"] / elapsed, 1) if elapsed > 0 else None,
+                }
+        return phases
+
+
+class Job:
+    """单个后台任务"""
+    
+    def __init__(self, kind: str, phases: Optional[List[Tuple[str, str]]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = "queued"  # queued | running | succeeded | failed | cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.progress = JobProgress(phases or [])
+    
+    @property
+    def is_active(self) -> bool:
+        return self.state in ("queued", "running")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "cancel_requested": self.progress.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at else None,
+            "progress": self.progress.to_dict(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器
+    
+    Usage:
+        jobs = JobManager()
+        job = jobs.submit("rebuild", rebuild_fn, phases=[("parse", "docs")])   # rebuild_fn(job) -> Dict
+        jobs.get(job.id).to_dict()
+        jobs.cancel(job.id)
+    """
+    
+    def __init__(self, max_history: int = JOB_HISTORY_SIZE):
+        self.max_history = max(1, max_history)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[Job], Dict[str, Any]],
+        phases: Optional[List[Tuple[str, str]]] = None,
+        exclusive: bool = True
+    ) -> Job:
+        """
+        提交任务；exclusive 时同类型任务正在运行则直接返回该任务
+        
+        Args:
+            kind: 任务类型
+            fn: 任务函数，接收 Job（用于上报进度、检查取消），返回结果字典；
+                返回 {"status": "error"} 或抛出异常视为失败，返回 {"status": "cancelled"} 或抛出 JobCancelled 视为取消
+            phases: [(阶段名, 计数单位)]
+            exclusive: 同类型任务是否互斥（如重建）；批量上传等各自独立的任务传 False
+        """
+        with self._lock:
+            active = self._find_active(kind) if exclusive else None
+            if active is not None:
+                return active
+            job = Job(kind, phases)
+            self._jobs[job.id] = job
+            self._trim()
+        
+        thread = threading.Thread(target=self._run, args=(job, fn), name=f"job-{kind}-{job.id}", daemon=True)
+        thread.start()
+        logger.info(f"Job submitted: {kind} ({job.id})")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self, kind: Optional[str] = None) -> List[Job]:
+        """按提交时间倒序列出任务（含历史）"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if kind is None or job.kind == kind]
+        return list(reversed(jobs))
+    
+    def find_active(self, kind: str) -> Optional[Job]:
+        with self._lock:
+            return self._find_active(kind)
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        请求取消任务（协作式：任务在下一个检查点停止并回滚）
+        
+        Returns:
+            任务；不存在时返回 None。已结束的任务不受影响
+        """
+        job = self.get(job_id)
+        if job is not None and job.is_active:
+            job.progress.cancel()
+            logger.info(f"Job {job.kind} ({job.id}) cancellation requested")
+        return job
+    
+    def _find_active(self, kind: str) -> Optional[Job]:
+        for job in self._jobs.values():
+            if job.kind == kind and job.is_active:
+                return job
+        return None
+    
+    def _run(self, job: Job, fn: Callable[[Job], Dict[str, Any]]):
+        job.started_at = time.time()
+        job.state = "running"
+        state, error = "succeeded", None
+        try:
+            job.progress.check_cancelled()
+            result = fn(job) or {}
+            status = result.get("status")
+            if status == "cancelled":
+                state = "cancelled"
+            elif status == "error":
+                state, error = "failed", result.get("message")
+        except JobCancelled:
+            result, state = None, "cancelled"
+        except Exception as e:
+            logger.error(f"Job {job.kind} ({job.id}) failed: {e}")
+            result, state, error = None, "failed", str(e)
+        
+        # 先写结束时间与结果，最后切换状态：轮询方看到终态时信息已完整
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.state = state
+        logger.info(f"Job {job.kind} ({job.id}) {job.state} in {job.finished_at - job.started_at:.2f}s")
+    
+    def _trim(self):
+        """只保留最近 max_history 个已结束的任务（进行中的任务不淘汰）"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
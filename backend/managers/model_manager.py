@@ -7,11 +7,11 @@ from typing import Optional, Any
 import logging
 
 from interfaces.vector_store import EmbeddingInterface, LLMInterface
-from managers.cache_manager import CacheManager
+from managers.model_registry import model_registry
 from config import (
     LLM_USE_OPENAI, LLM_OPENAI_MODEL, LLM_OPENAI_API_KEY, LLM_OPENAI_API_BASE,
     EMBEDDING_MODEL, DEVICE, LLM_TEMPERATURE, LLM_LOCAL_MODEL, OLLAMA_BASE_URL,
-    LLM_NUM_CTX, LLM_NUM_PREDICT
+    LLM_NUM_CTX, LLM_NUM_PREDICT, INFERENCE_POOL_ENABLED, MODEL_IDLE_UNLOAD_SECONDS
 )
 
 logger = logging.getLogger(__name__)
@@ -20,15 +20,15 @@ logger = logging.getLogger(__name__)
 class EmbeddingManager(EmbeddingInterface):
     """嵌入模型管理器"""
     
+    MODEL_NAME = "embedding_model"
+    
     def __init__(self):
-        self._cache_manager = CacheManager(
-            ttl=3600,  # 1小时TTL
-            name="embedding_model"
-        )
+        # 向量存储持有嵌入模型引用，卸载无法释放内存，因此固定
+        model_registry.register(self.MODEL_NAME, self._create_embedding_model, pinned=True)
     
     def get_embeddings(self) -> Optional[Any]:
         """获取嵌入模型"""
-        return self._cache_manager.get_or_create(self._create_embedding_model)
+        return model_registry.get(self.MODEL_NAME)
     
     def is_available(self) -> bool:
         """检查嵌入模型是否可用"""
@@ -41,6 +41,11 @@ class EmbeddingManager(EmbeddingInterface):
     
     def _create_embedding_model(self) -> Optional[Any]:
         """创建嵌入模型"""
+        if INFERENCE_POOL_ENABLED:
+            from managers.inference_pool import get_inference_pool, PooledEmbeddings
+            logger.info(f"Using inference pool for embedding model: {EMBEDDING_MODEL}")
+            return PooledEmbeddings(get_inference_pool())
+        
         try:
             from langchain_huggingface import HuggingFaceEmbeddings
             
@@ -89,19 +94,18 @@ class QueryExpansionLLMManager:
     与主 LLM（如 gpt-4o）分开管理。
     """
     
+    MODEL_NAME = "query_expansion_llm"
+    
     def __init__(self):
         from config import QUERY_EXPANSION_MODEL, QUERY_EXPANSION_TEMPERATURE
         
-        self._cache_manager = CacheManager(
-            ttl=3600,
-            name="query_expansion_llm"
-        )
         self.model = QUERY_EXPANSION_MODEL
         self.temperature = QUERY_EXPANSION_TEMPERATURE
+        model_registry.register(self.MODEL_NAME, self._create_llm)
     
     def get_llm(self) -> Optional[Any]:
         """获取 Query Expansion LLM"""
-        return self._cache_manager.get_or_create(self._create_llm)
+        return model_registry.get(self.MODEL_NAME)
     
     def _create_llm(self) -> Optional[Any]:
         """创建轻量 LLM"""
@@ -135,21 +139,25 @@ class RerankingModelManager:
     模型较大，需要统一管理和缓存。
     """
     
+    MODEL_NAME = "reranking_model"
+    
     def __init__(self):
         from config import RERANKING_MODEL
         
-        self._cache_manager = CacheManager(
-            ttl=3600,
-            name="reranking_model"
-        )
         self.model_name = RERANKING_MODEL
+        model_registry.register(self.MODEL_NAME, self._create_model)
     
     def get_model(self) -> Optional[Any]:
         """获取 Reranking 模型"""
-        return self._cache_manager.get_or_create(self._create_model)
+        return model_registry.get(self.MODEL_NAME)
     
     def _create_model(self) -> Optional[Any]:
         """创建 CrossEncoder 模型"""
+        if INFERENCE_POOL_ENABLED:
+            from managers.inference_pool import get_inference_pool, PooledCrossEncoder
+            logger.info(f"Using inference pool for Cross-Encoder model: {self.model_name}")
+            return PooledCrossEncoder(get_inference_pool())
+        
         try:
             from sentence_transformers import CrossEncoder
             
@@ -169,15 +177,14 @@ class RerankingModelManager:
 class LLMManager(LLMInterface):
     """大语言模型管理器（主 LLM，用于生成回答）"""
     
+    MODEL_NAME = "llm_model"
+    
     def __init__(self):
-        self._cache_manager = CacheManager(
-            ttl=3600,  # 1小时TTL
-            name="llm_model"
-        )
+        model_registry.register(self.MODEL_NAME, self._create_llm_model)
     
     def get_llm(self) -> Optional[Any]:
         """获取LLM模型"""
-        return self._cache_manager.get_or_create(self._create_llm_model)
+        return model_registry.get(self.MODEL_NAME)
     
     def is_available(self) -> bool:
         """检查LLM是否可用"""
@@ -242,12 +249,18 @@ class LLMManager(LLMInterface):
             logger.info(f"Ollama base URL: {OLLAMA_BASE_URL}")
             logger.info(f"Context window: {LLM_NUM_CTX}, Max predict: {LLM_NUM_PREDICT}")
             
+            ollama_kwargs = {}
+            if MODEL_IDLE_UNLOAD_SECONDS > 0:
+                # Ollama 模型运行在独立进程中，由 Ollama 按 keep_alive 自行卸载
+                ollama_kwargs["keep_alive"] = f"{int(MODEL_IDLE_UNLOAD_SECONDS)}s"
+            
             llm = ChatOllama(
                 model=LLM_LOCAL_MODEL,
                 base_url=OLLAMA_BASE_URL,
                 temperature=LLM_TEMPERATURE,
                 num_ctx=LLM_NUM_CTX,
                 num_predict=LLM_NUM_PREDICT,
+                **ollama_kwargs
             )
             
             logger.info(f"Ollama model loaded successfully: {LLM_LOCAL_MODEL}")
@@ -0,0 +1,368 @@
+"""
+Model Registry
+模型注册表 - 统一管理模型实例的加载、刷新与统计
+
+与 CacheManager 的区别：
+- 模型只加载一次，不按时间过期
+- 单飞（single-flight）加载：同一模型并发请求时只有一个线程执行加载，其余线程等待结果，
+  加载期间不持有全局锁，其他模型的请求不受影响
+- 刷新在后台进行，刷新期间继续提供旧实例，加载完成后原子替换；
+  固定（pinned）的模型被长期持有（如嵌入模型被向量存储引用），替换注册表中的实例不会生效，不支持刷新
+- 内存预算：超出预算时按 LRU 卸载未固定（pinned）的模型；空闲超时的模型也会被卸载，
+  下次使用时按需重新加载
+"""
+import gc
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from config import MODEL_MEMORY_BUDGET_MB, MODEL_IDLE_UNLOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """读取当前进程常驻内存（仅 Linux）"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def estimate_model_memory(instance: Any, _depth: int = 0) -> int:
+    """
+    估算模型权重占用的内存（字节）
+    
+    识别 torch.nn.Module，并向下查找常见的包装属性
+    （HuggingFaceEmbeddings._client、CrossEncoder.model 等）。
+    无法识别（如远程 API 客户端）时返回 0。
+    """
+    if instance is None or _depth > 3:
+        return 0
+    
+    if hasattr(instance, "parameters") and hasattr(instance, "buffers"):
+        try:
+            total = sum(p.numel() * p.element_size() for p in instance.parameters())
+            total += sum(b.numel() * b.element_size() for b in instance.buffers())
+            return int(total)
+        except Exception:
+            pass
+    
+    for attr in ("_client", "client", "model", "auto_model"):
+        child = getattr(instance, attr, None)
+        if child is not None and child is not instance:
+            size = estimate_model_memory(child, _depth + 1)
+            if size:
+                return size
+    return 0
+
+
+class ModelRecord:
+    """单个模型的注册信息与运行状态"""
+    
+    def __init__(self, name: str, loader: Callable[[], Any], pinned: bool = False):
+        self.name = name
+        self.loader = loader
+        self.pinned = pinned  # 固定的模型不会被卸载，也不刷新
+        self.instance: Any = None
+        self.state = "unloaded"  # unloaded | loading | ready | failed | evicted
+        self.loaded_at: Optional[float] = None
+        self.load_time_s: Optional[float] = None
+        self.load_count = 0
+        self.memory_bytes = 0
+        self.rss_delta_bytes: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.last_used: Optional[float] = None
+        self.evictions = 0
+        
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "pinned": self.pinned,
+            "loaded": self.instance is not None,
+            "loaded_at": self.loaded_at,
+            "load_time_s": round(self.load_time_s, 3) if self.load_time_s is not None else None,
+            "load_count": self.load_count,
+            "memory_mb": round(self.memory_bytes / (1024 * 1024), 1),
+            "rss_delta_mb": (
+                round(self.rss_delta_bytes / (1024 * 1024), 1)
+                if self.rss_delta_bytes is not None else None
+            ),
+            "last_used": self.last_used,
+            "evictions": self.evictions,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRegistry:
+    """
+    模型注册表
+    
+    Usage:
+        registry.register("reranking_model", create_reranking_model)
+        model = registry.get("reranking_model")
+        registry.refresh("reranking_model")  # 后台重载
+    """
+    
+    def __init__(self, memory_budget_mb: float = 0, idle_unload_seconds: float = 0):
+        """
+        Args:
+            memory_budget_mb: 模型内存预算（MB），0 表示不限制
+            idle_unload_seconds: 空闲多久后卸载模型（秒），0 表示从不卸载
+        """
+        self._records: Dict[str, ModelRecord] = {}
+        self._lock = threading.Lock()
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.idle_unload_seconds = idle_unload_seconds
+        self._reaper: Optional[threading.Thread] = None
+    
+    def register(self, name: str, loader: Callable[[], Any], pinned: bool = False) -> ModelRecord:
+        """注册模型加载函数（重复注册保留首个，保证全局共享同一实例）"""
+        with self._lock:
+            record = self._records.get(name)
+            if record is None:
+                record = ModelRecord(name, loader, pinned=pinned)
+                self._records[name] = record
+            if self.idle_unload_seconds > 0 and self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name="model-reaper", daemon=True)
+                self._reaper.start()
+            return record
+    
+    def get(self, name: str, loader: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """
+        获取模型实例，未加载时加载（单飞）
+        
+        Args:
+            name: 模型名称
+            loader: 加载函数（首次调用时自动注册）
+        """
+        record = self._records.get(name)
+        if record is None:
+            if loader is None:
+                raise KeyError(f"Model '{name}' is not registered")
+            record = self.register(name, loader)
+        
+        record.last_used = time.time()
+        instance = record.instance
+        if instance is not None:
+            return instance
+        return self._load(record)
+    
+    def peek(self, name: str) -> Optional[Any]:
+        """获取已加载的实例，不触发加载"""
+        record = self._records.get(name)
+        return record.instance if record else None
+    
+    def refresh(self, name: str, background: bool = True) -> bool:
+        """
+        重新加载模型
+        
+        刷新期间继续返回旧实例；新实例加载成功后原子替换，失败则保留旧实例。
+        固定的模型不刷新：其实例被调用方长期持有，新实例只会与旧实例同时占用内存而不被使用。
+        
+        Returns:
+            是否已触发（后台模式）或成功完成（同步模式）刷新；同步刷新失败时原因见 last_error
+        """
+        record = self._records.get(name)
+        if record is None:
+            return False
+        if record.pinned:
+            logger.warning(f"ModelRegistry: '{name}' is pinned and cannot be refreshed; restart the service to reload it")
+            return False
+        
+        if background:
+            threading.Thread(
+                target=self._load, args=(record, True), name=f"model-refresh-{name}", daemon=True
+            ).start()
+            return True
+        # 刷新失败时 _load 仍返回保留的旧实例，以本次加载记录的错误判断结果
+        self._load(record, refresh=True)
+        return record.last_error is None
+    
+    def refresh_all(self, background: bool = True):
+        """刷新所有未固定的模型"""
+        for name, record in list(self._records.items()):
+            if not record.pinned:
+                self.refresh(name, background=background)
+    
+    def _load(self, record: ModelRecord, refresh: bool = False) -> Optional[Any]:
+        """单飞加载：同一时刻只有一个线程执行 loader，其余线程等待"""
+        with record._lock:
+            if not refresh and record.instance is not None:
+                return record.instance
+            if record._inflight is not None:
+                event, leader = record._inflight, False
+            else:
+                event, leader = threading.Event(), True
+                record._inflight = event
+                if record.instance is None:
+                    record.state = "loading"
+        
+        if not leader:
+            event.wait()
+            return record.instance
+        
+        start = time.perf_counter()
+        rss_before = _current_rss_bytes()
+        instance = None
+        error = None
+        try:
+            instance = record.loader()
+            if instance is None:
+                error = "loader returned None"
+        except Exception as e:
+            error = str(e)
+            logger.error(f"ModelRegistry: failed to load '{record.name}': {e}")
+        
+        elapsed = time.perf_counter() - start
+        rss_after = _current_rss_bytes()
+        
+        with record._lock:
+            if instance is not None:
+                record.instance = instance
+                record.state = "ready"
+                record.loaded_at = time.time()
+                record.load_time_s = elapsed
+                record.load_count += 1
+                record.memory_bytes = estimate_model_memory(instance)
+                record.rss_delta_bytes = (
+                    max(0, rss_after - rss_before)
+                    if rss_before is not None and rss_after is not None else None
+                )
+                record.last_error = None
+                logger.info(
+                    f"ModelRegistry: '{record.name}' {'refreshed' if refresh else 'loaded'} "
+                    f"in {elapsed:.2f}s ({record.memory_bytes / (1024 * 1024):.1f} MB)"
+                )
+            else:
+                # 加载失败不缓存，下次调用重试；刷新失败时保留旧实例
+                record.state = "ready" if record.instance is not None else "failed"
+                record.last_error = error
+            record._inflight = None
+            event.set()
+        
+        if instance is not None:
+            self._enforce_budget(keep=record)
+        return record.instance
+    
+    # =========================================================================
+    # 内存预算与卸载
+    # =========================================================================
+    
+    def unload(self, name: str) -> bool:
+        """卸载模型（下次 get 时重新加载）"""
+        record = self._records.get(name)
+        if record is None:
+            return False
+        return self._evict(record, reason="manual")
+    
+    def _evict(self, record: ModelRecord, reason: str) -> bool:
+        with record._lock:
+            if record.instance is None or record._inflight is not None:
+                return False
+            freed_mb = record.memory_bytes / (1024 * 1024)
+            record.instance = None
+            record.state = "evicted"
+            record.evictions += 1
+        
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        
+        logger.info(f"ModelRegistry: unloaded '{record.name}' ({reason}, freed ~{freed_mb:.1f} MB)")
+        return True
+    
+    def _enforce_budget(self, keep: Optional[ModelRecord] = None):
+        """超出内存预算时按最近最少使用顺序卸载未固定的模型"""
+        if self.memory_budget_bytes <= 0:
+            return
+        
+        with self._lock:
+            records = list(self._records.values())
+        
+        used = sum(r.memory_bytes for r in records if r.instance is not None)
+        if used <= self.memory_budget_bytes:
+            return
+        
+        candidates = sorted(
+            (r for r in records if r.instance is not None and not r.pinned and r is not keep and r.memory_bytes > 0),
+            key=lambda r: r.last_used or 0
+        )
+        for record in candidates:
+            if used <= self.memory_budget_bytes:
+                break
+            size = record.memory_bytes
+            if self._evict(record, reason="memory budget"):
+                used -= size
+        
+        if used > self.memory_budget_bytes:
+            logger.warning(
+                f"ModelRegistry: memory budget exceeded ({used / (1024 * 1024):.1f} MB > "
+                f"{self.memory_budget_bytes / (1024 * 1024):.1f} MB) and nothing left to unload"
+            )
+    
+    def _reap_loop(self):
+        """定期卸载空闲超时的模型"""
+        interval = max(5.0, min(60.0, self.idle_unload_seconds / 4))
+        while True:
+            time.sleep(interval)
+            try:
+                self.unload_idle()
+            except Exception as e:
+                logger.error(f"ModelRegistry: idle unload failed: {e}")
+    
+    def unload_idle(self) -> int:
+        """卸载空闲超过 idle_unload_seconds 的模型，返回卸载数量"""
+        if self.idle_unload_seconds <= 0:
+            return 0
+        
+        now = time.time()
+        with self._lock:
+            records = list(self._records.values())
+        
+        unloaded = 0
+        for record in records:
+            if record.pinned or record.instance is None or record.memory_bytes <= 0:
+                continue
+            if record.last_used and now - record.last_used > self.idle_unload_seconds:
+                if self._evict(record, reason=f"idle > {self.idle_unload_seconds:.0f}s"):
+                    unloaded += 1
+        return unloaded
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """获取内存预算与占用（用于 /api/info）"""
+        with self._lock:
+            records = list(self._records.values())
+        
+        used = sum(r.memory_bytes for r in records if r.instance is not None)
+        return {
+            "budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1) if self.memory_budget_bytes else None,
+            "used_mb": round(used / (1024 * 1024), 1),
+            "idle_unload_seconds": self.idle_unload_seconds or None,
+            "loaded_models": [r.name for r in records if r.instance is not None],
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取所有模型的加载状态、耗时与内存（用于 /api/info）"""
+        with self._lock:
+            records = list(self._records.values())
+        return {record.name: record.to_dict() for record in records}
+
+
+# 全局注册表实例
+model_registry = ModelRegistry(
+    memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+    idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS
+)
@@ -0,0 +1,657 @@
+"""
+NumPy Vector Store
+精确暴力检索的向量存储后端（VECTOR_BACKEND=numpy），适用于数十万 chunk 以内的知识库
+
+- 向量：float32[capacity, dim] 矩阵，持久化模式下为 mmap 的 embeddings.npy（容量按倍数增长）
+- 文本与元数据：SQLite 表（行号、chunk ID、文本、元数据 JSON、filename 列带索引）
+- 查询：一次 BLAS 矩阵乘法计算全部距离，argpartition 取 top-k，结果精确；支持批量查询
+- 删除：行标记为墓碑，查询时排除；墓碑行多于存活行时压缩（重写矩阵与行号）
+- 压缩的崩溃恢复：新矩阵先写入 embeddings.compact.npy，SQLite 行号重排与待替换标记在同一事务中提交，
+  之后才替换 embeddings.npy；打开集合时按标记完成或丢弃未完成的压缩，矩阵与行号始终对应
+- 量化（VECTOR_QUANTIZATION）：粗排只扫描常驻内存的 float16 / int8 / binary 编码，候选从 mmap 矩阵读取后精确重排
+
+NumpyCollection 实现向量存储管理器与检索阶段用到的 Chroma 集合接口子集（upsert / update / delete / get / count / query），
+距离与 Chroma 默认的 l2 一致（欧氏距离平方），NumpyVectorStore 对应 LangChain 的 Chroma 封装。
+"""
+import os
+import re
+import json
+import atexit
+import shutil
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from langchain_core.documents import Document
+
+from managers.quantization import QUANTIZATION_MODES, Quantizer
+from config import VECTOR_QUANTIZATION, VECTOR_RESCORE_FACTOR
+
+logger = logging.getLogger(__name__)
+
+_EMBEDDINGS_FILE = "embeddings.npy"
+_COMPACT_FILE = "embeddings.compact.npy"  # 压缩后的矩阵，SQLite 行号重排提交后替换 embeddings.npy
+_DB_FILE = "chunks.sqlite3"
+_INITIAL_CAPACITY = 1024
+_COMPACT_MIN_DEAD = 4096  # 墓碑行数超过该值且多于存活行时压缩
+_SQL_BATCH = 500  # 单条 SQL 的参数个数上限
+_ENCODE_BLOCK = 65536  # 打开集合时按块读取向量矩阵生成量化编码
+_CENTER_SAMPLE = 16384  # 估计量化中心向量的采样行数
+_METADATA_KEY = re.compile(r"^\w+$")
+
+_registry: Dict[str, "NumpyCollection"] = {}  # 进程内已打开的集合（同一目录 / 内存集合只打开一次）
+_registry_lock = threading.Lock()
+
+
+class NumpyCollection:
+    """
+    精确检索集合（线程安全）
+    
+    Usage:
+        collection = NumpyCollection("documents", directory="./chroma_db/numpy/documents")
+        collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        results = collection.query(query_embeddings=[q], n_results=10, include=["distances"])
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        directory: Optional[str] = None,
+        quantization: str = VECTOR_QUANTIZATION,
+        rescore_factor: int = VECTOR_RESCORE_FACTOR
+    ):
+        """
+        Args:
+            name: 集合名
+            directory: 持久化目录；None 时向量与元数据只保存在内存
+            quantization: none | float16 | int8 | binary；量化时粗排只扫描常驻内存的编码，
+                float32 矩阵留在 mmap 文件中，只读取候选行精确重排（编码在打开集合时由矩阵生成，不单独保存）
+            rescore_factor: 精确重排的候选数为 k × rescore_factor
+        """
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {quantization}")
+        self.name = name
+        self._directory = directory
+        self._quantization = quantization
+        self._rescore_factor = max(1, rescore_factor)
+        self._quantizer: Optional[Quantizer] = None
+        self._codes: Optional[np.ndarray] = None  # 量化编码 [capacity, width]
+        self._scales: Optional[np.ndarray] = None  # int8 的每行缩放系数
+        self._lock = threading.RLock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, _DB_FILE) if directory else ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT, filename TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_filename ON chunks (filename)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        
+        self._matrix: Optional[np.ndarray] = None  # float32[capacity, dim]
+        self._norms = np.zeros(0, dtype=np.float32)  # 每行向量的范数平方
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []  # 行号 → chunk ID（墓碑为 None）
+        self._rows: Dict[str, int] = {}  # chunk ID → 行号
+        self._load()
+    
+    # =========================================================================
+    # 读取
+    # =========================================================================
+    
+    def count(self) -> int:
+        return len(self._rows)
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict[str, Any]:
+        """按 ID 和/或元数据条件读取 chunks（与 Chroma 的 get 返回格式相同）"""
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            result: Dict[str, Any] = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include or "metadatas" in include:
+                documents, metadatas = self._fetch(rows)
+                if "documents" in include:
+                    result["documents"] = documents
+                if "metadatas" in include:
+                    result["metadatas"] = metadatas
+            if "embeddings" in include:
+                result["embeddings"] = (
+                    np.array(self._matrix[rows]) if rows and self._matrix is not None
+                    else np.zeros((0, self.dimension or 0), dtype=np.float32)
+                )
+            return result
+    
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+        where: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        精确 top-k 检索（一次矩阵乘法覆盖批量查询）
+        
+        Returns:
+            {"ids": [[...]], "distances": [[...]], ...}，每个查询一个列表，距离为欧氏距离平方（升序）
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        ids, distances = self._search(queries, n_results, where)
+        return self._results(ids, distances, include)
+    
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._matrix is None else int(self._matrix.shape[1])
+    
+    @property
+    def memory_bytes(self) -> int:
+        """检索时每次扫描的向量数据字节数（量化时为编码与范数，未量化时为整个 float32 矩阵与范数）"""
+        size = len(self._ids)
+        if self._matrix is None:
+            return 0
+        if self._codes is None:
+            return int(self._matrix[:size].nbytes + self._norms[:size].nbytes)
+        scales = self._scales[:size].nbytes if self._scales is not None else 0
+        return int(self._codes[:size].nbytes + scales + self._norms[:size].nbytes)
+    
+    # =========================================================================
+    # 写入
+    # =========================================================================
+    
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None
+    ):
+        """写入 chunks（已存在的 ID 原位覆盖）"""
+        if not len(ids):
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError(f"Expected {len(ids)} embeddings, got shape {vectors.shape}")
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        
+        with self._lock:
+            if self._matrix is None:
+                self._init_codes(0, vectors.shape[1], vectors)
+            self._ensure_capacity(len(self._ids) + len(ids), vectors.shape[1])
+            codes, scales = self._quantizer.encode(vectors) if self._quantizer is not None else (None, None)
+            records = []
+            for position, (chunk_id, vector, document, metadata) in enumerate(zip(ids, vectors, documents, metadatas)):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(chunk_id)
+                    self._rows[chunk_id] = row
+                self._matrix[row] = vector
+                self._norms[row] = float(np.dot(vector, vector))
+                if codes is not None:
+                    self._codes[row] = codes[position]
+                if scales is not None:
+                    self._scales[row] = scales[position]
+                self._alive[row] = True
+                records.append((row, chunk_id, document, self._dump_metadata(metadata), (metadata or {}).get("filename")))
+            if isinstance(self._matrix, np.memmap):
+                self._matrix.flush()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata, filename) VALUES (?, ?, ?, ?, ?)", records
+            )
+            self._db.commit()
+    
+    def update(
+        self,
+        ids: Sequence[str],
+        embeddings: Any = None,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None
+    ):
+        """更新已有 chunks 的向量、文本或元数据（不存在的 ID 忽略）"""
+        with self._lock:
+            current = self.get(ids=ids, include=["documents", "metadatas"])
+            found = {chunk_id: index for index, chunk_id in enumerate(current["ids"])}
+            positions = [(index, chunk_id) for index, chunk_id in enumerate(ids) if chunk_id in found]
+            if not positions:
+                return
+            vectors = (
+                np.asarray(embeddings, dtype=np.float32)[[index for index, _ in positions]] if embeddings is not None
+                else self._matrix[[self._rows[chunk_id] for _, chunk_id in positions]]
+            )
+            self.upsert(
+                ids=[chunk_id for _, chunk_id in positions],
+                embeddings=vectors,
+                documents=[
+                    documents[index] if documents is not None else current["documents"][found[chunk_id]]
+                    for index, chunk_id in positions
+                ],
+                metadatas=[
+                    metadatas[index] if metadatas is not None else current["metadatas"][found[chunk_id]]
+                    for index, chunk_id in positions
+                ],
+            )
+    
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """删除 chunks（行标记为墓碑，墓碑过多时压缩）"""
+        if ids is None and where is None:
+            raise ValueError("delete requires ids or where")
+        with self._lock:
+            rows = self._select_rows(ids, where)
+            if not rows:
+                return
+            for start in range(0, len(rows), _SQL_BATCH):
+                batch = rows[start:start + _SQL_BATCH]
+                self._db.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            for row in rows:
+                self._rows.pop(self._ids[row], None)
+                self._ids[row] = None
+                self._alive[row] = False
+            
+            dead = len(self._ids) - len(self._rows)
+            if dead > _COMPACT_MIN_DEAD and dead > len(self._rows):
+                self._compact()
+    
+    def close(self, persist: bool = True):
+        """
+        关闭集合
+        
+        Args:
+            persist: 是否保存派生数据（子类的索引）；集合即将删除时为 False
+        """
+        with self._lock:
+            self._db.close()
+            self._matrix = None
+    
+    # =========================================================================
+    # 内部
+    # =========================================================================
+    
+    def _load(self):
+        """从持久化目录恢复：行号与 ID 取自 SQLite，向量矩阵以 mmap 打开"""
+        self._recover_compaction()
+        for row, chunk_id in self._db.execute("SELECT row, id FROM chunks ORDER BY row"):
+            while len(self._ids) < row:
+                self._ids.append(None)
+            self._ids.append(chunk_id)
+            self._rows[chunk_id] = row
+        
+        path = self._embeddings_path()
+        if path and os.path.exists(path):
+            self._matrix = np.load(path, mmap_mode="r+")
+            if self._matrix.shape[0] < len(self._ids):
+                raise ValueError(f"Vector matrix of collection '{self.name}' has fewer rows than its chunk table")
+            capacity = self._matrix.shape[0]
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._alive[list(self._rows.values())] = True
+            self._norms = np.zeros(capacity, dtype=np.float32)
+            live_rows = np.sort(np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows)))
+            if len(live_rows) > _CENTER_SAMPLE:
+                live_rows = live_rows[np.linspace(0, len(live_rows) - 1, _CENTER_SAMPLE).astype(np.int64)]
+            self._init_codes(capacity, self._matrix.shape[1], self._matrix[live_rows])
+            size = len(self._ids)
+            for start in range(0, size, _ENCODE_BLOCK):
+                block = np.asarray(self._matrix[start:min(size, start + _ENCODE_BLOCK)])
+                self._norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+                if self._quantizer is not None:
+                    codes, scales = self._quantizer.encode(block)
+                    self._codes[start:start + len(block)] = codes
+                    if scales is not None:
+                        self._scales[start:start + len(block)] = scales
+            quantization = f", {self._quantization} codes" if self._quantizer is not None else ""
+            logger.info(f"Opened vector collection '{self.name}': {len(self._rows)} chunks, dim {self._matrix.shape[1]}{quantization}")
+        elif self._rows:
+            raise ValueError(f"Vector matrix of collection '{self.name}' is missing")
+    
+    def _embeddings_path(self) -> Optional[str]:
+        return os.path.join(self._directory, _EMBEDDINGS_FILE) if self._directory else None
+    
+    def _recover_compaction(self):
+        """
+        处理上次进程在压缩中途退出留下的状态：
+        - SQLite 已提交行号重排（有待替换标记）：新矩阵尚未替换时完成替换，然后清除标记
+        - 未提交：SQLite 仍为旧行号，丢弃写了一半或未替换的新矩阵
+        """
+        if not self._directory:
+            return
+        compact_path = os.path.join(self._directory, _COMPACT_FILE)
+        pending = self._db.execute("SELECT value FROM state WHERE key = 'compaction'").fetchone() is not None
+        if pending:
+            if os.path.exists(compact_path):
+                os.replace(compact_path, self._embeddings_path())
+            self._db.execute("DELETE FROM state WHERE key = 'compaction'")
+            self._db.commit()
+            logger.warning(f"Completed interrupted compaction of vector collection '{self.name}'")
+        elif os.path.exists(compact_path):
+            os.remove(compact_path)
+            logger.warning(f"Discarded interrupted compaction of vector collection '{self.name}'")
+    
+    def _ensure_capacity(self, size: int, dim: int):
+        """保证矩阵至少有 size 行（按倍数扩容；持久化模式下写新文件后替换）"""
+        if self._matrix is not None and self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimension {self._matrix.shape[1]}")
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(_INITIAL_CAPACITY, capacity)
+        while new_capacity < size:
+            new_capacity *= 2
+        self._matrix = self._allocate(new_capacity, dim, self._matrix[:len(self._ids)] if self._matrix is not None else None)
+        self._norms = self._grown(self._norms, new_capacity)
+        self._alive = self._grown(self._alive, new_capacity)
+        if self._codes is not None:
+            self._codes = self._grown(self._codes, new_capacity)
+        if self._scales is not None:
+            self._scales = self._grown(self._scales, new_capacity)
+    
+    def _init_codes(self, capacity: int, dim: int, sample: np.ndarray):
+        """
+        创建量化编码器与编码数组（未量化时不创建）
+        
+        Args:
+            sample: 估计中心向量的样本（打开集合时为存活行的均匀采样，新集合为首批写入的向量）；
+                进程内中心向量固定，编码前后一致，下次打开时按全部数据重新估计
+        """
+        if self._quantization == "none":
+            return
+        center = np.asarray(sample, dtype=np.float32).mean(axis=0) if len(sample) else None
+        self._quantizer = Quantizer(self._quantization, dim, center)
+        width, dtype = self._quantizer.code_shape
+        self._codes = np.zeros((capacity, width), dtype=dtype)
+        self._scales = np.zeros(capacity, dtype=np.float32) if self._quantization == "int8" else None
+    
+    @staticmethod
+    def _grown(array: np.ndarray, capacity: int) -> np.ndarray:
+        """扩容后的新数组（复制已有行，不修改查询持有的旧数组）"""
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+    
+    def _allocate(self, capacity: int, dim: int, rows: Optional[np.ndarray], replace: bool = True) -> np.ndarray:
+        """
+        新矩阵（复制已有行）；查询持有的旧矩阵引用仍然有效
+        
+        Args:
+            replace: 持久化模式下写完后替换 embeddings.npy；False 时留在 embeddings.compact.npy 中，由调用方替换
+        """
+        path = self._embeddings_path()
+        if path is None:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if rows is not None:
+                matrix[:len(rows)] = rows
+            return matrix
+        
+        tmp_path = f"{path}.tmp" if replace else os.path.join(self._directory, _COMPACT_FILE)
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if rows is not None:
+            matrix[:len(rows)] = rows
+        matrix.flush()
+        if replace:
+            os.replace(tmp_path, path)
+        return matrix
+    
+    def _compact(self):
+        """去掉墓碑行：存活行按原顺序重新编号，重写矩阵与 SQLite 行号"""
+        live_rows = [row for row, chunk_id in enumerate(self._ids) if chunk_id is not None]
+        dim = self._matrix.shape[1]
+        capacity = max(_INITIAL_CAPACITY, len(live_rows) * 2)
+        matrix = self._allocate(capacity, dim, self._matrix[live_rows] if live_rows else None, replace=False)
+        
+        # 行号重排与待替换标记在同一事务中提交，提交后才替换矩阵文件（中途退出由 _recover_compaction 处理）
+        mapping = [(new_row, old_row) for new_row, old_row in enumerate(live_rows)]
+        self._db.execute("UPDATE chunks SET row = -1 - row")  # 先移到负数区间，避免主键冲突
+        self._db.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(new_row, -1 - old_row) for new_row, old_row in mapping])
+        self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('compaction', 'pending')")
+        self._db.commit()
+        if self._directory:
+            os.replace(os.path.join(self._directory, _COMPACT_FILE), self._embeddings_path())
+            self._db.execute("DELETE FROM state WHERE key = 'compaction'")
+            self._db.commit()
+        
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:len(live_rows)] = self._norms[live_rows]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(live_rows)] = True
+        ids = [self._ids[row] for row in live_rows]
+        if self._codes is not None:
+            codes = np.zeros((capacity,) + self._codes.shape[1:], dtype=self._codes.dtype)
+            codes[:len(live_rows)] = self._codes[live_rows]
+            self._codes = codes
+        if self._scales is not None:
+            scales = np.zeros(capacity, dtype=np.float32)
+            scales[:len(live_rows)] = self._scales[live_rows]
+            self._scales = scales
+        
+        # 替换为新对象（不原位修改），计算中的查询继续使用旧数组与旧 ID 列表
+        self._matrix, self._norms, self._alive, self._ids = matrix, norms, alive, ids
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        logger.info(f"Compacted vector collection '{self.name}': {len(ids)} live chunks")
+    
+    def _select_rows(self, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> List[int]:
+        """按 ID 与元数据条件筛选行号（ID 顺序保持；两者都为 None 时返回全部存活行）"""
+        if ids is not None:
+            rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+            if where is None:
+                return rows
+            matched = set(self._select_rows(None, where))
+            return [row for row in rows if row in matched]
+        if where is None:
+            return [row for row, chunk_id in enumerate(self._ids) if chunk_id is not None]
+        clause, params = self._where_sql(where)
+        return [row for (row,) in self._db.execute(f"SELECT row FROM chunks WHERE {clause} ORDER BY row", params)]
+    
+    def _search(self, queries: np.ndarray, n_results: int, where: Optional[Dict[str, Any]]) -> Tuple[List[List[str]], List[List[float]]]:
+        """
+        精确检索：在锁内取数组引用，锁外计算（写入与压缩替换数组对象而不修改查询持有的部分）
+        
+        量化时先按编码粗排取 k × rescore_factor 个候选，再读取候选行的 float32 向量精确重排。
+        """
+        with self._lock:
+            matrix, ids, size = self._matrix, self._ids, len(self._ids)
+            quantizer, codes, scales = self._quantizer, self._codes, self._scales
+            norms = self._norms[:size]
+            alive = self._alive[:size].copy()
+            if where is not None and size:
+                allowed = np.zeros(size, dtype=bool)
+                allowed[self._select_rows(None, where)] = True
+                alive &= allowed
+        
+        k = min(n_results, int(alive.sum()))
+        if matrix is None or k <= 0:
+            return [[] for _ in queries], [[] for _ in queries]
+        if quantizer is None:
+            distances = self._distances(queries, matrix[:size], norms)
+            distances[:, ~alive] = np.inf
+            top = self._top_k(distances, k)
+            hits = [(rows, distances[query_index, rows]) for query_index, rows in enumerate(top)]
+        else:
+            coarse = quantizer.coarse_distances(queries, codes[:size], scales[:size] if scales is not None else None, norms)
+            coarse[:, ~alive] = np.inf
+            candidates = min(int(alive.sum()), k * self._rescore_factor)
+            hits = []
+            for query, rows in zip(queries, np.argpartition(coarse, candidates - 1, axis=1)[:, :candidates]):
+                rows = np.sort(rows)  # 按行号顺序读取 mmap
+                exact = self._distances(query[None, :], matrix[rows], norms[rows])[0]
+                best = np.argsort(exact, kind="stable")[:k]
+                hits.append((rows[best], exact[best]))
+        
+        result_ids, result_distances = [], []
+        for rows, distances in hits:
+            pairs = [
+                (ids[row], float(max(0.0, distance)))
+                for row, distance in zip(rows.tolist(), distances.tolist())
+                if ids[row] is not None  # 计算期间被删除的行
+            ]
+            result_ids.append([chunk_id for chunk_id, _ in pairs])
+            result_distances.append([distance for _, distance in pairs])
+        return result_ids, result_distances
+    
+    @staticmethod
+    def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+        """每行距离最小的 k 个下标（升序）"""
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1)
+    
+    def _results(self, ids: List[List[str]], distances: List[List[float]], include: Sequence[str]) -> Dict[str, List[List[Any]]]:
+        """按 include 组装 query 结果（文本与元数据只为命中的 chunk 读取）"""
+        result: Dict[str, List[List[Any]]] = {"ids": ids}
+        if "distances" in include:
+            result["distances"] = distances
+        if "documents" in include or "metadatas" in include:
+            result["documents"], result["metadatas"] = [], []
+            with self._lock:
+                for query_ids in ids:
+                    rows = [self._rows.get(chunk_id, -1) for chunk_id in query_ids]  # 检索后被删除的 chunk 为空
+                    documents, metadatas = self._fetch(rows)
+                    result["documents"].append(documents)
+                    result["metadatas"].append(metadatas)
+        return result
+    
+    def _fetch(self, rows: List[int]) -> Tuple[List[Optional[str]], List[Dict[str, Any]]]:
+        """按行号读取文本与元数据（保持行号顺序）"""
+        found: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        for start in range(0, len(rows), _SQL_BATCH):
+            batch = rows[start:start + _SQL_BATCH]
+            for row, document, metadata in self._db.execute(
+                f"SELECT row, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch
+            ):
+                found[row] = (document, metadata)
+        documents, metadatas = [], []
+        for row in rows:
+            document, metadata = found.get(row, (None, None))
+            documents.append(document)
+            metadatas.append(json.loads(metadata) if metadata else {})
+        return documents, metadatas
+    
+    @staticmethod
+    def _where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """元数据条件 → SQL（支持 {key: value}、{key: {"$eq" | "$ne" | "$in" | "$nin": ...}}，多个字段为 AND）"""
+        clauses, params = [], []
+        for key, condition in where.items():
+            if not _METADATA_KEY.match(key):
+                raise ValueError(f"Unsupported metadata key in filter: {key!r}")
+            column = "filename" if key == "filename" else f"json_extract(metadata, '$.{key}')"
+            operator, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            if operator in ("$eq", "$ne"):
+                clauses.append(f"{column} {'=' if operator == '$eq' else '!='} ?")
+                params.append(value)
+            elif operator in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    clauses.append("0" if operator == "$in" else "1")
+                    continue
+                clauses.append(f"{column} {'IN' if operator == '$in' else 'NOT IN'} ({','.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return " AND ".join(clauses) or "1", params
+    
+    @staticmethod
+    def _dump_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+        return json.dumps(metadata, ensure_ascii=False) if metadata else None
+    
+    @staticmethod
+    def _distances(queries: np.ndarray, matrix: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """欧氏距离平方 ‖q‖² + ‖x‖² - 2 q·x，一次矩阵乘法"""
+        return (queries * queries).sum(axis=1)[:, None] + norms[None, :] - 2.0 * (queries @ matrix.T)
+
+
+@atexit.register
+def _close_all():
+    """进程退出时关闭已打开的集合（子类在此保存索引）"""
+    with _registry_lock:
+        collections = list(_registry.values())
+        _registry.clear()
+    for collection in collections:
+        try:
+            collection.close()
+        except Exception as e:
+            logger.warning(f"Failed to close vector collection '{collection.name}': {e}")
+
+
+class NumpyClient:
+    """集合的创建、列出与删除（对应 Chroma client 的同名方法）"""
+    
+    def __init__(self, persist_directory: Optional[str] = None, collection_class: Type[NumpyCollection] = NumpyCollection):
+        """
+        Args:
+            persist_directory: 持久化根目录（集合保存在其下的 numpy/ 子目录）；None 时为内存集合
+            collection_class: 集合实现（NumpyCollection 或在相同存储上建立索引的子类）
+        """
+        self._root = os.path.join(persist_directory, "numpy") if persist_directory else None
+        self._collection_class = collection_class
+    
+    def get_or_create_collection(self, name: str) -> NumpyCollection:
+        key = self._key(name)
+        with _registry_lock:
+            collection = _registry.get(key)
+            if collection is None:
+                collection = self._collection_class(name, os.path.join(self._root, name) if self._root else None)
+                _registry[key] = collection
+            return collection
+    
+    def list_collections(self) -> List[str]:
+        if self._root is None:
+            with _registry_lock:
+                return [key.split(":", 1)[1] for key in _registry if key.startswith("memory:")]
+        if not os.path.isdir(self._root):
+            return []
+        return sorted(name for name in os.listdir(self._root) if os.path.isdir(os.path.join(self._root, name)))
+    
+    def delete_collection(self, name: str):
+        with _registry_lock:
+            collection = _registry.pop(self._key(name), None)
+        if collection is not None:
+            collection.close(persist=False)
+        if self._root is not None:
+            shutil.rmtree(os.path.join(self._root, name), ignore_errors=True)
+    
+    def _key(self, name: str) -> str:
+        return f"memory:{name}" if self._root is None else os.path.abspath(os.path.join(self._root, name))
+
+
+class NumpyVectorStore:
+    """
+    NumPy 向量存储（与 LangChain Chroma 封装相同的用法：_collection、_client、embeddings、similarity_search_with_score）
+    """
+    
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Any,
+        persist_directory: Optional[str] = None,
+        collection_class: Type[NumpyCollection] = NumpyCollection
+    ):
+        self._client = NumpyClient(persist_directory, collection_class)
+        self._collection = self._client.get_or_create_collection(collection_name)
+        self._embedding_function = embedding_function
+    
+    @property
+    def embeddings(self) -> Any:
+        return self._embedding_function
+    
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        results = self._collection.query(
+            query_embeddings=[self._embedding_function.embed_query(query)],
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (Document(page_content=document or "", metadata=metadata or {}), distance)
+            for document, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0])
+        ]
+    
+    def similarity_search_by_vectors(self, vectors: Iterable[Sequence[float]], k: int = 4) -> Dict[str, List[List[Any]]]:
+        """批量查询（多个查询向量一次矩阵乘法），返回各查询的 ID 与距离"""
+        return self._collection.query(query_embeddings=list(vectors), n_results=k, include=["distances"])
+    
+    def delete_collection(self):
+        self._client.delete_collection(self._collection.name)
@@ -0,0 +1,110 @@
+"""
+Vector Quantization
+向量的量化编码：粗排在常驻内存的量化编码上进行，候选再以原始 float32 向量精确重排
+
+- float16: 每维 2 字节
+- int8:    每维 1 字节 + 每行一个 float32 缩放系数（对称标量量化 x ≈ scale × code）
+- binary:  每维 1 位（减去中心向量后的符号位），粗排按汉明距离
+
+float32 原始向量仍保存在 mmap 文件中，只有重排时读取候选行，不再整体常驻内存。
+粗排按块解码为 float32 后做矩阵乘法：int8 的扫描速度与 float32 相当；numpy 的 float16 → float32 转换较慢，
+float16 的扫描明显慢于 int8，一般选 int8（召回率相近，内存减半）。
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "float16", "int8", "binary")
+
+_BLOCK_ROWS = 1024  # 粗排按块解码，解码后的 float32 块保持在 CPU 缓存内
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class Quantizer:
+    """
+    量化编码器（编码只依赖向量本身与固定的中心向量，可逐批增量编码）
+    
+    Usage:
+        quantizer = Quantizer("int8", dim=768)
+        codes, scales = quantizer.encode(vectors)
+        coarse = quantizer.coarse_distances(queries, codes, scales, norms)   # [Q, N]，越小越近
+    """
+    
+    def __init__(self, mode: str, dim: int, center: Optional[np.ndarray] = None):
+        """
+        Args:
+            center: binary 取符号位前减去的中心向量（通常为向量均值）。嵌入向量普遍有较大的公共分量，
+                不减去时多数维度的符号位对所有向量相同，汉明距离区分度很低
+        """
+        if mode not in QUANTIZATION_MODES or mode == "none":
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.mode = mode
+        self.dim = dim
+        self.center = np.zeros(dim, dtype=np.float32) if center is None else np.asarray(center, dtype=np.float32)
+    
+    @property
+    def code_shape(self) -> Tuple[int, np.dtype]:
+        """每行编码的宽度与类型"""
+        if self.mode == "float16":
+            return self.dim, np.dtype(np.float16)
+        if self.mode == "int8":
+            return self.dim, np.dtype(np.int8)
+        return (self.dim + 7) // 8, np.dtype(np.uint8)
+    
+    @property
+    def bytes_per_vector(self) -> int:
+        width, dtype = self.code_shape
+        return width * dtype.itemsize + (4 if self.mode == "int8" else 0)
+    
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Returns:
+            (编码 [N, width]，int8 的每行缩放系数 float32[N]；其他模式为 None)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode == "float16":
+            return vectors.astype(np.float16), None
+        if self.mode == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return self._sign_bits(vectors), None
+    
+    def coarse_distances(self, queries: np.ndarray, codes: np.ndarray, scales: Optional[np.ndarray], norms: np.ndarray) -> np.ndarray:
+        """
+        粗排距离 [Q, N]（越小越近）：float16 / int8 为近似欧氏距离平方（范数取精确值），binary 为汉明距离
+        
+        Args:
+            norms: 原始向量的范数平方（与编码同行序）
+        """
+        if self.mode == "binary":
+            return self._hamming(self._sign_bits(queries), codes)
+        dots = np.empty((len(queries), len(codes)), dtype=np.float32)
+        buffer = np.empty((_BLOCK_ROWS, self.dim), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS]
+            decoded = buffer[:len(block)]
+            np.copyto(decoded, block, casting="unsafe")
+            dots[:, start:start + len(block)] = queries @ decoded.T
+        if scales is not None:
+            dots *= scales[None, :]
+        return (queries * queries).sum(axis=1)[:, None] + norms[None, :] - 2.0 * dots
+    
+    def _sign_bits(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > self.center[None, :], axis=1)
+    
+    @staticmethod
+    def _hamming(query_bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        distances = np.empty((len(query_bits), len(codes)), dtype=np.float32)
+        if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+            # 按 64 位字异或与计数（numpy >= 2.0）
+            query_bits, codes = query_bits.view(np.uint64), np.ascontiguousarray(codes).view(np.uint64)
+            popcount = np.bitwise_count
+        else:
+            popcount = _POPCOUNT.__getitem__  # 按字节查表
+        for start in range(0, len(codes), _BLOCK_ROWS * 8):
+            block = codes[start:start + _BLOCK_ROWS * 8]
+            for index, bits in enumerate(query_bits):
+                distances[index, start:start + len(block)] = popcount(np.bitwise_xor(block, bits)).sum(axis=1, dtype=np.int32)
+        return distances
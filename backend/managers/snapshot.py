@@ -0,0 +1,334 @@
+"""
+Knowledge Base Snapshot
+知识库快照 - 单个文件包含恢复知识库所需的全部数据，新副本加载快照即可提供服务，无需重新解析与嵌入
+
+文件格式（未压缩 tar，成员数据在文件中连续存放，可按偏移直接 mmap）：
+- chunks.json:       chunk ID 与元数据（按行顺序）
+- texts.bin:         chunk 文本（UTF-8 依次拼接）
+- text_offsets.npy:  int64[N + 1]，每个 chunk 在 texts.bin 中的字节起止
+- embeddings.npy:    float32[N, dim]，与 chunks 一一对应
+- bm25.json:         BM25 索引统计（逐文档词频、IDF、文档长度），恢复时无需重新分词
+- manifest.json:     格式版本、嵌入模型、维度、源文档清单（文件名、内容哈希、chunk 数）、
+                     各成员的 SHA-256 与大小；最后写入
+
+加载时检查格式版本并校验各成员的校验和；向量与文本以只读 mmap 映射，不整体读入内存。
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tarfile
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "ragenius-kb-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".kbsnap"
+
+_MANIFEST = "manifest.json"
+_CHUNKS = "chunks.json"
+_TEXTS = "texts.bin"
+_TEXT_OFFSETS = "text_offsets.npy"
+_EMBEDDINGS = "embeddings.npy"
+_BM25 = "bm25.json"
+_MEMBERS = (_CHUNKS, _TEXTS, _TEXT_OFFSETS, _EMBEDDINGS, _BM25)
+
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotError(Exception):
+    """快照无效（格式、版本、校验和或与当前配置不兼容）"""
+
+
+def _sha256_file(path: str, offset: int = 0, size: Optional[int] = None) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = size
+        while remaining is None or remaining > 0:
+            block = f.read(_READ_CHUNK_SIZE if remaining is None else min(_READ_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+class SnapshotWriter:
+    """
+    快照写入器：按批追加 chunks，向量直接写入磁盘，最后打包并原子替换目标文件
+    
+    Usage:
+        with SnapshotWriter("kb.kbsnap") as writer:
+            writer.add(ids, texts, metadatas, embeddings)
+            writer.set_bm25(bm25_state)
+            manifest = writer.commit({"embedding_model": ..., "files": {...}})
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._work_dir = tempfile.mkdtemp(prefix=".snapshot-", dir=directory)
+        
+        self._chunks: List[Dict[str, Any]] = []
+        self._offsets: List[int] = [0]
+        self._dim: Optional[int] = None
+        self._bm25: Optional[Dict[str, Any]] = None
+        self._texts = open(os.path.join(self._work_dir, _TEXTS), "wb")
+        self._vectors = open(os.path.join(self._work_dir, "embeddings.raw"), "wb")
+    
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __len__(self) -> int:
+        return len(self._chunks)
+    
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], embeddings: Any):
+        """追加一批 chunks（四者按行对应）"""
+        array = np.asarray(embeddings, dtype=np.float32)
+        if array.ndim != 2 or array.shape[0] != len(ids) or len(texts) != len(ids) or len(metadatas) != len(ids):
+            raise ValueError("ids, texts, metadatas and embeddings must have one row per chunk")
+        if self._dim is None:
+            self._dim = int(array.shape[1])
+        elif array.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension changed ({array.shape[1]} != {self._dim})")
+        
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            encoded = text.encode("utf-8")
+            self._texts.write(encoded)
+            self._offsets.append(self._offsets[-1] + len(encoded))
+            self._chunks.append({"id": chunk_id, "metadata": metadata or {}})
+        self._vectors.write(array.tobytes())
+    
+    # 以下属性与 KnowledgeBaseSnapshot 一致，可用 ChunkStore.from_snapshot(writer) 按行顺序读回已写入的 chunks
+    
+    @property
+    def ids(self) -> List[str]:
+        return [chunk["id"] for chunk in self._chunks]
+    
+    @property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return [chunk["metadata"] for chunk in self._chunks]
+    
+    @property
+    def text_buffer(self) -> np.ndarray:
+        """已写入文本的 UTF-8 缓冲（临时文件的只读 mmap）"""
+        self._texts.flush()
+        path = os.path.join(self._work_dir, _TEXTS)
+        size = os.path.getsize(path)
+        return np.memmap(path, dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+    
+    @property
+    def text_offsets(self) -> np.ndarray:
+        return np.asarray(self._offsets, dtype=np.int64)
+    
+    def set_bm25(self, state: Optional[Dict[str, Any]]):
+        self._bm25 = state
+    
+    def commit(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        写出全部成员与清单并打包（先写临时文件再 rename）
+        
+        Args:
+            manifest: 清单字段（embedding_model、generation、files 等）
+        
+        Returns:
+            完整清单
+        """
+        if not self._chunks:
+            raise SnapshotError("Cannot write an empty snapshot")
+        self._texts.close()
+        self._vectors.close()
+        
+        work = self._work_dir
+        np.save(os.path.join(work, _TEXT_OFFSETS), np.asarray(self._offsets, dtype=np.int64))
+        
+        # 向量已按行写入 raw 文件，补上 .npy 头后原样拷贝，不经过内存
+        raw_path = os.path.join(work, "embeddings.raw")
+        with open(os.path.join(work, _EMBEDDINGS), "wb") as out, open(raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                "fortran_order": False,
+                "shape": (len(self._chunks), self._dim),
+            })
+            shutil.copyfileobj(raw, out, _READ_CHUNK_SIZE)
+        os.remove(raw_path)
+        
+        with open(os.path.join(work, _CHUNKS), "w", encoding="utf-8") as f:
+            json.dump(self._chunks, f, ensure_ascii=False)
+        with open(os.path.join(work, _BM25), "w", encoding="utf-8") as f:
+            json.dump(self._bm25, f, ensure_ascii=False)
+        
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "chunks": len(self._chunks),
+            "dim": self._dim,
+            "dtype": "float32",
+            **manifest,
+            "members": {
+                name: {"size": os.path.getsize(os.path.join(work, name)), "sha256": _sha256_file(os.path.join(work, name))}
+                for name in _MEMBERS
+            },
+        }
+        with open(os.path.join(work, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        
+        tmp_path = f"{self.path}.tmp"
+        with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as tar:
+            for name in _MEMBERS + (_MANIFEST,):
+                tar.add(os.path.join(work, name), arcname=name)
+        os.replace(tmp_path, self.path)
+        
+        logger.info(f"Snapshot written: {self.path} ({len(self._chunks)} chunks, {os.path.getsize(self.path) / (1024 * 1024):.1f} MB)")
+        return manifest
+    
+    def close(self):
+        """释放临时文件（commit 之后或放弃写入时调用）"""
+        for f in (self._texts, self._vectors):
+            if not f.closed:
+                f.close()
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+        if os.path.exists(f"{self.path}.tmp"):
+            os.remove(f"{self.path}.tmp")
+
+
+class KnowledgeBaseSnapshot:
+    """
+    只读快照
+    
+    Usage:
+        snapshot = KnowledgeBaseSnapshot("kb.kbsnap")          # 校验版本与校验和
+        for ids, texts, metadatas, embeddings in snapshot.iter_batches(256):
+            ...
+        bm25_state = snapshot.bm25_state()
+    """
+    
+    def __init__(self, path: str, verify: bool = True):
+        """
+        Args:
+            path: 快照文件路径
+            verify: 是否校验各成员的 SHA-256（逐块读取整个文件）
+        
+        Raises:
+            SnapshotError: 不是快照文件、版本不受支持、成员缺失或校验失败
+        """
+        self.path = path
+        try:
+            with tarfile.open(path, "r:") as tar:
+                self._members = {member.name: (member.offset_data, member.size) for member in tar.getmembers() if member.isfile()}
+        except (tarfile.TarError, OSError) as e:
+            raise SnapshotError(f"Not a knowledge base snapshot: {e}")
+        
+        if _MANIFEST not in self._members:
+            raise SnapshotError("Not a knowledge base snapshot: manifest missing")
+        self.manifest: Dict[str, Any] = json.loads(self._read(_MANIFEST))
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unknown snapshot format: {self.manifest.get('format')}")
+        if self.manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {self.manifest.get('version')} (supported: <= {SNAPSHOT_VERSION})")
+        missing = [name for name in _MEMBERS if name not in self._members]
+        if missing:
+            raise SnapshotError(f"Snapshot is missing members: {', '.join(missing)}")
+        
+        if verify:
+            self.verify()
+        
+        chunks = json.loads(self._read(_CHUNKS))
+        self.ids: List[str] = [chunk["id"] for chunk in chunks]
+        self.metadatas: List[Dict[str, Any]] = [chunk["metadata"] for chunk in chunks]
+        self.text_offsets = self._load_array(_TEXT_OFFSETS)
+        self.embeddings = self._load_array(_EMBEDDINGS)
+        offset, size = self._members[_TEXTS]
+        self._texts = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+        
+        count = self.manifest.get("chunks")
+        if not (len(self.ids) == self.embeddings.shape[0] == len(self.text_offsets) - 1 == count):
+            raise SnapshotError("Snapshot members disagree on the number of chunks")
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def verify(self):
+        """按清单校验每个成员的大小与 SHA-256"""
+        for name, expected in self.manifest.get("members", {}).items():
+            if name not in self._members:
+                raise SnapshotError(f"Snapshot is missing member: {name}")
+            offset, size = self._members[name]
+            if size != expected["size"] or _sha256_file(self.path, offset, size) != expected["sha256"]:
+                raise SnapshotError(f"Checksum mismatch for snapshot member: {name}")
+    
+    @property
+    def text_buffer(self) -> np.ndarray:
+        """全部 chunk 文本的 UTF-8 缓冲（只读 mmap），按 text_offsets 切分"""
+        return self._texts
+    
+    def text(self, index: int) -> str:
+        start, end = int(self.text_offsets[index]), int(self.text_offsets[index + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+    
+    def iter_batches(self, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]]:
+        """按行顺序分批产出 (ids, texts, metadatas, embeddings)；向量为 mmap 切片"""
+        for start in range(0, len(self.ids), batch_size):
+            end = min(start + batch_size, len(self.ids))
+            yield (
+                self.ids[start:end],
+                [self.text(i) for i in range(start, end)],
+                self.metadatas[start:end],
+                self.embeddings[start:end],
+            )
+    
+    def bm25_state(self) -> Optional[Dict[str, Any]]:
+        return json.loads(self._read(_BM25))
+    
+    def get_info(self) -> Dict[str, Any]:
+        """清单摘要（不含逐文件清单与成员校验和）"""
+        info = {key: value for key, value in self.manifest.items() if key not in ("files", "members")}
+        info.update({
+            "path": self.path,
+            "size_mb": round(os.path.getsize(self.path) / (1024 * 1024), 2),
+            "documents": len(self.manifest.get("files", {})),
+        })
+        return info
+    
+    def _read(self, name: str) -> bytes:
+        offset, size = self._members[name]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+    
+    def _load_array(self, name: str) -> np.ndarray:
+        """按成员偏移读取 .npy 头，数据部分以只读 mmap 映射"""
+        offset, _ = self._members[name]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+        if fortran_order:
+            raise SnapshotError(f"Unsupported array layout in snapshot member: {name}")
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=data_offset, shape=shape)
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """只读取快照清单（不校验、不映射数据），用于列出快照"""
+    try:
+        with tarfile.open(path, "r:") as tar:
+            return json.load(tar.extractfile(tar.getmember(_MANIFEST)))
+    except (KeyError, ValueError, tarfile.TarError, OSError) as e:
+        raise SnapshotError(f"Not a knowledge base snapshot: {e}")
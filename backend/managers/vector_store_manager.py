@@ -3,109 +3,96 @@ Vector Store Manager
 向量存储管理器实现
 """
 import os
+import json
 import time
+import uuid
+import hashlib
 import threading
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Set, Tuple
 import logging
-import tempfile
 
 from langchain_community.vectorstores import Chroma
 from langchain_community.document_loaders import PyPDFLoader, CSVLoader, TextLoader
-from langchain_core.documents import Document as LangChainDocument
 
 from interfaces.vector_store import VectorStoreInterface, EmbeddingInterface
+from managers.document_parser import WordDocumentLoader, ParseResult, DocumentSource, document_parser
+from managers.ingestion_pipeline import IngestionPipeline
+from managers.chunking import create_text_splitter
+from managers.dedup import NearDuplicateIndex, dump_aliases, parse_aliases
+from managers.job_manager import JobCancelled, JobProgress
+from managers.snapshot import KnowledgeBaseSnapshot, SnapshotError, SnapshotWriter
+from managers.numpy_store import NumpyCollection, NumpyVectorStore
 from managers.cache_manager import CacheManager
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import (
+    EMBEDDING_MODEL, VECTOR_BACKEND, VECTOR_QUANTIZATION,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DTYPE,
+    INGEST_BATCH_SIZE, DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_SHINGLE_SIZE,
+    DEDUP_NUM_PERM
+)
 
 logger = logging.getLogger(__name__)
 
-
-class WordDocumentLoader:
-    """Word文档加载器（使用python-docx）"""
-    
-    def __init__(self, file_path: str):
-        """
-        初始化Word文档加载器
-        
-        Args:
-            file_path: Word文档路径
-        """
-        self.file_path = file_path
-    
-    def load(self) -> List[LangChainDocument]:
-        """加载Word文档"""
-        try:
-            from docx import Document as DocxDocument
-            
-            doc = DocxDocument(self.file_path)
-            text_parts = []
-            
-            # 提取所有段落
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_parts.append(para.text)
-            
-            # 提取表格内容
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            row_text.append(cell.text.strip())
-                    if row_text:
-                        text_parts.append(" | ".join(row_text))
-            
-            # 合并所有文本
-            full_text = "\n\n".join(text_parts)
-            
-            if not full_text.strip():
-                logger.warning(f"Word document {self.file_path} appears to be empty")
-                return []
-            
-            # 创建LangChain Document对象
-            return [LangChainDocument(
-                page_content=full_text,
-                metadata={"source": self.file_path}
-            )]
-            
-        except ImportError as import_err:
-            error_msg = "python-docx library not installed. Please install it with: pip install python-docx"
-            logger.error(error_msg)
-            logger.error(f"Import error details: {import_err}")
-            raise ImportError(error_msg) from import_err
-        except Exception as e:
-            logger.error(f"Error loading Word document {self.file_path}: {e}")
-            import traceback
-            logger.error(f"Word document loading traceback: {traceback.format_exc()}")
-            raise
+DEFAULT_COLLECTION = "documents"
+_MANIFEST_FILE = "kb_manifest.json"  # 持久化目录中的知识库清单：激活集合、各文件 chunk 数与内容哈希、嵌入模型、版本号
+_MANIFEST_VERSION = 1
+_LEGACY_ACTIVE_COLLECTION_FILE = "active_collection"  # 旧版本只记录激活集合名，加载时迁移到清单
+_RETIRED_COLLECTION_GRACE_S = 30.0  # 切换后旧集合保留的时间，供进行中的查询读完
 
 
 class ChromaVectorStoreManager(VectorStoreInterface):
     """ChromaDB向量存储管理器"""
     
-    def __init__(self, embedding_interface: EmbeddingInterface):
+    def __init__(self, embedding_interface: EmbeddingInterface, load_persistent: bool = True):
         """
         初始化向量存储管理器
         
         Args:
             embedding_interface: 嵌入模型接口
+            load_persistent: 是否在构造时加载持久化数据（后台预热模式下为 False，
+                由 WarmupManager 调用 load_persistent_store）
         """
         self.embedding_interface = embedding_interface
         
         # 初始化状态变量
         self._vector_store = None
         self._vectorized_documents = []
+        self._document_chunks: Dict[str, int] = {}  # {filename: chunk_count}
+        self._document_hashes: Dict[str, Optional[str]] = {}  # {filename: 源文件内容 SHA-256}
+        self._alias_refs: Dict[str, Set[str]] = {}  # {filename: 以该文件的近重复 chunk 为别名的其他文件中的代表 chunk ID}
         self._total_chunks = 0
         self._last_build_time = None
+        self._generation = 0  # 每次写入（重建/增量更新/删除/清空）递增，供下游判断索引是否需要刷新
+        self._last_build_stats: Dict[str, Any] = {}
+        
+        # 持久化嵌入缓存（首次写入时创建）
+        self._embedding_cache = None
+        self._cached_embeddings = None
+        
+        # 当前对外服务的集合；重建写入新集合，完成后原子切换（blue/green）
+        self._collection_name = DEFAULT_COLLECTION
+        
+        # 后台重建状态：重建期间的增量变更记录下来，切换前重放到新集合
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._build_changes: Dict[str, Optional[DocumentSource]] = {}  # {filename: 来源，None 表示删除}
+        self._build_discarded = False
         
         self._lock = threading.RLock()
         
         # 启动时尝试加载持久化数据
-        self._load_persistent_store()
+        if load_persistent:
+            self._load_persistent_store()
         
         mode = "persistent" if self._vector_store else "memory-only"
         logger.info(f"ChromaVectorStoreManager initialized ({mode} mode)")
     
+    def load_persistent_store(self):
+        """加载持久化的向量存储（已有向量存储时跳过，避免覆盖启动后新建的知识库）"""
+        with self._lock:
+            if self._vector_store is not None:
+                return
+            self._load_persistent_store()
+    
     def _load_persistent_store(self):
         """启动时加载持久化的向量存储（如果存在）"""
         persist_dir = os.getenv("CHROMA_PERSIST_DIR", "")
@@ -127,38 +114,66 @@ class ChromaVectorStoreManager(VectorStoreInterface):
                 logger.warning("Embedding model not available, cannot load persistent store")
                 return
             
-            # 加载持久化的向量存储
-            self._vector_store = Chroma(
-                persist_directory=persist_dir,
-                embedding_function=embedding_model,
-                collection_name="documents"
-            )
+            # 加载持久化的向量存储（清单中记录的激活集合）
+            manifest = self._read_manifest(persist_dir)
+            if manifest is not None:
+                self._collection_name = manifest.get("collection") or DEFAULT_COLLECTION
+            else:
+                self._collection_name = self._read_legacy_active_collection(persist_dir)
+            if manifest is not None and self._storage_format(manifest.get("vector_backend", "chroma")) != self._storage_format(VECTOR_BACKEND):
+                logger.warning(
+                    f"Knowledge base was built with vector backend '{manifest.get('vector_backend', 'chroma')}', "
+                    f"but '{VECTOR_BACKEND}' is configured; rebuild the knowledge base or import a snapshot"
+                )
+            self._vector_store = self._create_store(embedding_model, self._collection_name)
+            self._drop_stale_collections()
             
-            # 尝试获取文档数量
+            # 恢复文档列表：清单与集合的 chunk 数一致时直接使用清单（O(文件数)），
+            # 否则（旧数据没有清单、或清单未随最后一次写入更新）扫描全部 chunk 元数据并重写清单
             try:
                 collection = self._vector_store._collection
                 count = collection.count()
                 self._total_chunks = count
                 
-                # 尝试恢复文档列表
-                if count > 0:
-                    # 从 collection 中获取所有 metadata
-                    results = collection.get(include=["metadatas"])
-                    document_set = set()
-                    for metadata in results.get("metadatas", []):
-                        if metadata and "source" in metadata:
-                            filename = os.path.basename(metadata["source"])
-                            if filename:
-                                document_set.add(filename)
-                    self._vectorized_documents = sorted(list(document_set))
+                if manifest is not None and manifest.get("total_chunks") == count:
+                    files = manifest.get("files", {})
+                    self._document_chunks = {filename: info["chunks"] for filename, info in files.items()}
+                    self._document_hashes = {filename: info.get("sha256") for filename, info in files.items()}
+                    self._alias_refs = {filename: set(info["aliased_in"]) for filename, info in files.items() if info.get("aliased_in")}
+                    self._generation = max(self._generation, manifest.get("generation", 0))
+                    if manifest.get("embedding_model") != EMBEDDING_MODEL:
+                        logger.warning(
+                            f"Knowledge base was built with embedding model '{manifest.get('embedding_model')}', "
+                            f"but '{EMBEDDING_MODEL}' is configured; rebuild the knowledge base"
+                        )
+                else:
+                    if manifest is not None:
+                        logger.warning(f"Knowledge base manifest is stale ({manifest.get('total_chunks')} != {count} chunks), rescanning chunk metadata")
+                    self._document_chunks, self._alias_refs = self._scan_collection(collection) if count > 0 else ({}, {})
+                    # 只保留 chunk 数仍一致的文件的哈希
+                    files = manifest.get("files", {}) if manifest is not None else {}
+                    self._document_hashes = {
+                        filename: files[filename].get("sha256")
+                        for filename, chunks in self._document_chunks.items()
+                        if files.get(filename, {}).get("chunks") == chunks
+                    }
+                self._vectorized_documents = sorted(self._document_chunks)
+                self._generation += 1
                 
-                logger.info(f"Loaded persistent store: {self._total_chunks} chunks, {len(self._vectorized_documents)} documents")
+                if manifest is None or manifest.get("total_chunks") != count:
+                    self._write_manifest()
                 
+                logger.info(f"Loaded persistent store: {self._total_chunks} chunks, {len(self._vectorized_documents)} documents")
+            
             except Exception as e:
                 logger.warning(f"Could not get collection info: {e}")
-                
+        
         except Exception as e:
             logger.error(f"Failed to load persistent store: {e}")
+            if self._storage_format(VECTOR_BACKEND) != "chroma":
+                # numpy / hnsw 后端打开失败时保留数据（可能只是部分集合不一致），由管理员排查、重建知识库或导入快照
+                logger.error(f"Persistent data left in place: {persist_dir}")
+                return
             # 如果加载失败，清理可能损坏的数据（清空目录内容，不删除目录）
             import shutil
             try:
@@ -203,17 +218,24 @@ class ChromaVectorStoreManager(VectorStoreInterface):
                     except Exception as e:
                         logger.error(f"Failed to clear persistent directory contents: {e}")
                 
-                # 清空向量存储
+                # 清空向量存储；进行中的重建结果作废
                 self._vector_store = None
+                self._collection_name = DEFAULT_COLLECTION
+                if self._building:
+                    self._build_discarded = True
                 
                 # 清空元数据
                 self._vectorized_documents = []
+                self._document_chunks = {}
+                self._document_hashes = {}
+                self._alias_refs = {}
                 self._total_chunks = 0
                 self._last_build_time = None
+                self._generation += 1
                 
                 logger.info("Vector store and metadata cleared successfully")
                 return True
-                
+        
         except Exception as e:
             logger.error(f"Failed to clear vector store: {e}")
             return False
@@ -228,176 +250,946 @@ class ChromaVectorStoreManager(VectorStoreInterface):
         Returns:
             重建是否成功
         """
-        logger.warning("rebuild_store is deprecated. Use rebuild_store_from_memory instead.")
+        logger.warning("rebuild_store is deprecated. Use rebuild_store_from_sources instead.")
         
         documents = self._load_documents(documents_dir)
         if not documents:
             logger.warning("No documents found to process")
             return False
-                
+        
         return self._build_vector_store_from_documents(documents)
     
-    def rebuild_store_from_memory(self, in_memory_documents: Dict[str, bytes]) -> bool:
+    def rebuild_store_from_sources(self, sources: Dict[str, DocumentSource], progress: Optional[JobProgress] = None) -> bool:
         """
-        从内存文档重建向量存储
+        从文档来源重建向量存储
         
         Args:
-            in_memory_documents: 内存中的文档字典 {filename: file_content_bytes}
+            sources: {filename: 文件内容 bytes 或磁盘路径}；传路径时解析进程按需读取，不经过内存拷贝
+            progress: 任务进度（可选），用于上报各阶段进度与响应取消
         
         Returns:
             重建是否成功
         """
-        if not in_memory_documents:
-            logger.warning("No documents in memory to process")
+        if not sources:
+            logger.warning("No documents to process")
             return False
         
-        logger.info(f"Loading {len(in_memory_documents)} documents from memory")
-        documents = self._load_documents_from_memory(in_memory_documents)
-        if not documents:
-            logger.warning("No documents loaded from memory")
-            return False
-        
-        return self._build_vector_store_from_documents(documents)
+        logger.info(f"Streaming {len(sources)} documents into the vector store")
+        if progress is not None:
+            progress.set_total("parse", len(sources))
+        return self._build_vector_store(document_parser.parse_iter(sources), progress, sources)
     
-    def _build_vector_store_from_documents(self, documents: List[Any]) -> bool:
+    def upsert_document(self, filename: str, source: DocumentSource, documents: Optional[List[Any]] = None) -> Dict[str, Any]:
         """
-        从文档列表构建向量存储（公共方法，消除代码重复）
+        增量索引单个文档：只解析、切分、嵌入该文件，并以稳定 ID 替换其旧的 chunks
         
         Args:
-            documents: 已加载的文档列表
+            filename: 文件名
+            source: 文件内容 bytes 或磁盘路径
+            documents: 调用方已解析出的页面（可选，避免重复解析）
         
         Returns:
-            构建是否成功
+            {"status": ..., "chunks": n}
         """
-        with self._lock:
-            try:
-                logger.info("Starting vector store build...")
+        try:
+            embedding_model = self.embedding_interface.get_embeddings()
+            if not embedding_model:
+                return {"status": "error", "message": "Embedding model not available"}
+            embedding_model = self._with_embedding_cache(embedding_model)
+            
+            # 在锁外解析与计算嵌入，锁内只做写入，避免阻塞查询
+            prepared = self._prepare_document(filename, source, embedding_model, documents)
+            if "error" in prepared:
+                return {"status": "error", "message": prepared["error"]}
+            content_hash = self._content_hash(source)
+            
+            with self._lock:
+                if self._vector_store is None:
+                    # 先尝试加载已有的持久化数据，避免覆盖或遗漏其中的文档
+                    self._load_persistent_store()
+                if self._vector_store is None:
+                    self._vector_store = self._create_store(embedding_model, self._collection_name, reset=True)
                 
-                # 1. 清除旧的内存存储
-                self._vector_store = None
-                self._vectorized_documents = []
-                self._total_chunks = 0
+                promoted = self._write_document(
+                    self._vector_store._collection, filename, prepared, self._document_chunks, self._alias_refs,
+                    replace=filename in self._document_chunks
+                )
                 
-                logger.info(f"Processing {len(documents)} documents")
+                chunk_count = len(prepared["ids"])
+                self._total_chunks += chunk_count + promoted - self._document_chunks.get(filename, 0)
+                self._document_chunks[filename] = chunk_count
+                self._document_hashes[filename] = content_hash
+                self._vectorized_documents = sorted(self._document_chunks)
+                self._last_build_time = time.time()
+                self._generation += 1
+                self._write_manifest()
                 
-                # 2. 处理文档为 chunks
-                chunks = self._process_documents(documents)
-                if not chunks:
-                    logger.warning("No chunks generated from documents")
-                    return False
+                # 后台重建进行中：记录变更，切换前重放到新集合
+                if self._building:
+                    self._build_changes[filename] = source
+            
+            logger.info(f"Incrementally indexed '{filename}': {chunk_count} chunks (total {self._total_chunks})")
+            return {"status": "success", "chunks": chunk_count}
+        
+        except Exception as e:
+            logger.error(f"Failed to index document '{filename}': {e}")
+            return {"status": "error", "message": str(e)}
+    
+    def upsert_documents(
+        self,
+        sources: Dict[str, DocumentSource],
+        progress: Optional[JobProgress] = None,
+        on_parsed: Optional[Callable[[ParseResult], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        批量增量索引：多个文档经流式入库流水线（并行解析、批量嵌入与写入）写入当前集合
+        
+        Args:
+            sources: {filename: 文件内容 bytes 或磁盘路径}
+            progress: 任务进度（可选）；失败或取消时删除本批已写入的 chunks，被替换的文件从索引中移除
+            on_parsed: 每个文件解析完成后的回调（如缓存提取文本），在流水线生产者线程中调用
+        
+        Returns:
+            {"status": ..., "stats": 流水线统计, "files": {filename: {documents, duration_s, error, chunks}}}
+        """
+        store = None
+        replaced: List[str] = []
+        try:
+            embedding_model = self.embedding_interface.get_embeddings()
+            if not embedding_model:
+                return {"status": "error", "message": "Embedding model not available"}
+            embedding_model = self._with_embedding_cache(embedding_model)
+            
+            with self._lock:
+                if self._vector_store is None:
+                    self._load_persistent_store()
+                if self._vector_store is None:
+                    self._vector_store = self._create_store(embedding_model, self._collection_name, reset=True)
+                store = self._vector_store
+                replaced = [filename for filename in sources if filename in self._document_chunks]
+                if replaced:
+                    self._total_chunks += self._remove_file_chunks(store._collection, replaced, self._document_chunks, self._alias_refs)
+            
+            # 在锁外写入（Chroma collection 自身线程安全），查询不受影响
+            pipeline = IngestionPipeline(
+                split_documents=self._process_documents,
+                assign_ids=self._assign_chunk_ids,
+                embeddings=embedding_model,
+                collection=store._collection,
+                progress=progress,
+                deduplicator=self._new_deduplicator(),
+            )
+            parse_results = document_parser.parse_iter(sources)
+            if on_parsed is not None:
+                parse_results = self._observe(parse_results, on_parsed)
+            stats = pipeline.run(parse_results)
+            content_hashes = {filename: self._content_hash(sources[filename]) for filename in pipeline.document_chunks}
+            
+            with self._lock:
+                swapped = self._vector_store is not store
+                if not swapped:
+                    for filename in replaced:
+                        self._total_chunks -= self._document_chunks.pop(filename, 0)
+                        self._document_hashes.pop(filename, None)
+                    for filename, chunk_count in pipeline.document_chunks.items():
+                        self._total_chunks += chunk_count
+                        self._document_chunks[filename] = chunk_count
+                    for filename, canonical_ids in pipeline.alias_refs.items():
+                        self._alias_refs.setdefault(filename, set()).update(canonical_ids)
+                    self._document_hashes.update(content_hashes)
+                    self._vectorized_documents = sorted(self._document_chunks)
+                    self._last_build_time = time.time()
+                    self._generation += 1
+                    self._write_manifest()
                 
-                logger.info(f"Generated {len(chunks)} chunks")
+                # 后台重建进行中：记录变更，切换前重放到新集合
+                if self._building:
+                    for filename in pipeline.document_chunks:
+                        self._build_changes[filename] = sources[filename]
+            
+            # 写入期间重建已完成切换：逐个补写到新集合（嵌入已缓存，只需重新解析与写入）
+            if swapped:
+                logger.info("Vector store was swapped during bulk ingest, re-indexing into the new collection")
+                for filename in pipeline.document_chunks:
+                    self.upsert_document(filename, sources[filename])
+            
+            logger.info(f"Bulk indexed {len(pipeline.document_chunks)} documents: {stats['chunks']} chunks in {stats['total_s']}s")
+            return {"status": "success", "stats": stats, "files": pipeline.files}
+        
+        except Exception as e:
+            cancelled = isinstance(e, JobCancelled)
+            if cancelled:
+                logger.info("Bulk ingest cancelled")
+            else:
+                logger.error(f"Bulk ingest failed: {e}")
+            if store is not None:
+                # 删除本批已写入的 chunks：新文件的部分写入，以及被替换文件的部分新 chunks（旧 chunks 在入库前已删除）
+                try:
+                    with self._lock:
+                        new_files = [filename for filename in sources if filename not in self._document_chunks]
+                        if new_files or replaced:
+                            store._collection.delete(where={"filename": {"$in": new_files + replaced}})
+                        if replaced and self._vector_store is store:
+                            for filename in replaced:
+                                self._total_chunks -= self._document_chunks.pop(filename, 0)
+                                self._document_hashes.pop(filename, None)
+                            self._vectorized_documents = sorted(self._document_chunks)
+                            self._generation += 1
+                            self._write_manifest()
+                            logger.warning(f"Replaced documents were removed from the index: {replaced}")
+                except Exception as cleanup_error:
+                    logger.warning(f"Failed to clean up partial bulk ingest: {cleanup_error}")
+            return {"status": "cancelled" if cancelled else "error", "message": "Bulk ingest cancelled" if cancelled else str(e)}
+    
+    @staticmethod
+    def _observe(parse_results: Iterable[ParseResult], callback: Callable[[ParseResult], None]) -> Iterator[ParseResult]:
+        for result in parse_results:
+            callback(result)
+            yield result
+    
+    def delete_document(self, filename: str) -> bool:
+        """
+        从向量存储中删除单个文档的所有 chunks
+        
+        Args:
+            filename: 文件名
+        
+        Returns:
+            是否删除了该文档的 chunks
+        """
+        try:
+            with self._lock:
+                if self._building:
+                    self._build_changes[filename] = None
                 
-                # 3. 获取嵌入模型
-                embedding_model = self.embedding_interface.get_embeddings()
-                if not embedding_model:
-                    logger.error("Embedding model not available")
+                if self._vector_store is None or filename not in self._document_chunks:
                     return False
                 
-                # 4. 创建向量存储（支持持久化）
-                # 从环境变量读取持久化配置
-                persist_dir = os.getenv("CHROMA_PERSIST_DIR", "")
+                promoted = self._remove_file_chunks(self._vector_store._collection, [filename], self._document_chunks, self._alias_refs)
                 
-                if persist_dir:
-                    # 持久化模式 - 先清空旧数据再创建新的
-                    logger.info(f"Using persistent mode with directory: {persist_dir}")
-                    
-                    # 清空持久化目录内容（不删除目录本身，因为可能是挂载点）
-                    if os.path.exists(persist_dir):
-                        import shutil
-                        for item in os.listdir(persist_dir):
-                            item_path = os.path.join(persist_dir, item)
-                            try:
-                                if os.path.isdir(item_path):
-                                    shutil.rmtree(item_path)
-                                else:
-                                    os.remove(item_path)
-                            except Exception as e:
-                                logger.warning(f"Failed to remove {item_path}: {e}")
-                        logger.info(f"Cleared old persistent data at: {persist_dir}")
-                    
-                    os.makedirs(persist_dir, exist_ok=True)
-                    self._vector_store = Chroma.from_documents(
-                        documents=chunks,
-                        embedding=embedding_model,
-                        collection_name="documents",
-                        persist_directory=persist_dir
-                    )
-                else:
-                    # 纯内存模式（使用 EphemeralClient）
-                    logger.info("Using ephemeral (in-memory) mode")
-                    import chromadb
-                    ephemeral_client = chromadb.EphemeralClient()
-                    self._vector_store = Chroma(
-                        client=ephemeral_client,
-                        embedding_function=embedding_model,
-                    collection_name="documents"
-                )
-                    # 手动添加文档
-                    self._vector_store.add_documents(documents=chunks)
-                
-                # 5. 记录向量化的文档信息
-                document_set = set()
-                for chunk in chunks:
-                    if hasattr(chunk, 'metadata') and 'source' in chunk.metadata:
-                        source = chunk.metadata['source']
-                        filename = os.path.basename(source)
-                        if filename:
-                            document_set.add(filename)
+                self._total_chunks += promoted - self._document_chunks.pop(filename)
+                self._document_hashes.pop(filename, None)
+                self._vectorized_documents = sorted(self._document_chunks)
+                self._generation += 1
+                self._write_manifest()
                 
-                self._vectorized_documents = sorted(list(document_set))
-                self._total_chunks = len(chunks)
-                self._last_build_time = time.time()
+                logger.info(f"Removed '{filename}' from vector store ({self._total_chunks} chunks remaining)")
+                return True
+        
+        except Exception as e:
+            logger.error(f"Failed to delete document '{filename}' from vector store: {e}")
+            return False
+    
+    def _prepare_document(
+        self, filename: str, source: DocumentSource, embedding_model: Any, documents: Optional[List[Any]] = None
+    ) -> Dict[str, Any]:
+        """解析、切分并嵌入单个文档（不修改任何集合）"""
+        report: Dict[str, Any] = {}
+        if documents is None:
+            documents, report = document_parser.parse_all({filename: source})
+        if not documents:
+            error = report.get(filename, {}).get("error")
+            return {"error": error or f"No content could be loaded from '{filename}'"}
+        
+        chunks = self._process_documents(documents)
+        if not chunks:
+            return {"error": f"No chunks generated from '{filename}'"}
+        
+        ids = self._assign_chunk_ids(chunks)
+        deduplicator = self._new_deduplicator()
+        if deduplicator is not None:
+            ids, chunks = self._collapse_duplicates(deduplicator, ids, chunks)
+        embeddings = embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+        return {"ids": ids, "chunks": chunks, "embeddings": embeddings}
+    
+    def _write_document(
+        self,
+        collection: Any,
+        filename: str,
+        prepared: Dict[str, Any],
+        document_chunks: Dict[str, int],
+        alias_refs: Dict[str, Set[str]],
+        replace: bool = True
+    ) -> int:
+        """将准备好的 chunks 写入集合（replace 时先删除该文件的旧 chunks），返回由别名接替的 chunk 数"""
+        promoted = self._remove_file_chunks(collection, [filename], document_chunks, alias_refs) if replace else 0
+        collection.upsert(
+            ids=prepared["ids"],
+            embeddings=prepared["embeddings"],
+            documents=[chunk.page_content for chunk in prepared["chunks"]],
+            metadatas=[chunk.metadata for chunk in prepared["chunks"]]
+        )
+        return promoted
+    
+    # =========================================================================
+    # 近重复合并
+    # =========================================================================
+    
+    @staticmethod
+    def _new_deduplicator() -> Optional[NearDuplicateIndex]:
+        """DEDUP_ENABLED 时为每次入库创建近重复索引（只在同一次入库的 chunks 之间合并）"""
+        if not DEDUP_ENABLED:
+            return None
+        return NearDuplicateIndex(
+            threshold=DEDUP_THRESHOLD, shingle_size=DEDUP_SHINGLE_SIZE, num_perm=DEDUP_NUM_PERM
+        )
+    
+    @staticmethod
+    def _collapse_duplicates(deduplicator: NearDuplicateIndex, ids: List[str], chunks: List[Any]) -> Tuple[List[str], List[Any]]:
+        """合并单个文件内的近重复 chunks（如重复的页眉页脚），别名记录在代表 chunk 的元数据中"""
+        kept_ids, kept_chunks = [], []
+        canonical_chunks: Dict[str, Any] = {}
+        for chunk_id, chunk in zip(ids, chunks):
+            canonical = deduplicator.add(chunk_id, chunk.page_content)
+            if canonical is None:
+                kept_ids.append(chunk_id)
+                kept_chunks.append(chunk)
+                canonical_chunks[chunk_id] = chunk
+                continue
+            metadata = canonical_chunks[canonical].metadata
+            metadata["aliases"] = dump_aliases(parse_aliases(metadata) + [{"id": chunk_id, **chunk.metadata}])
+        if len(kept_ids) < len(ids):
+            logger.info(f"Collapsed {len(ids) - len(kept_ids)} near-duplicate chunks")
+        return kept_ids, kept_chunks
+    
+    def _remove_file_chunks(
+        self,
+        collection: Any,
+        filenames: List[str],
+        document_chunks: Dict[str, int],
+        alias_refs: Dict[str, Set[str]]
+    ) -> int:
+        """
+        删除文件的全部 chunks，并维护近重复别名（调用方持有锁，或操作的是尚未切换的新集合）：
+        - 其他文件中以被删除文件的 chunk 为别名的代表 chunk：移除这些别名
+        - 被删除文件中作为其他文件别名代表的 chunk：由第一个别名接替（改用别名的 ID 与元数据，文本与向量不变）
+        
+        chunk ID 以所属文件名的哈希为前缀（见 _assign_chunk_ids），接替后仍然成立。
+        
+        Returns:
+            由别名接替的 chunk 数（已计入 document_chunks 中别名所在的文件）
+        """
+        deleted = set(filenames)
+        file_keys = {self._file_key(filename) for filename in deleted}
+        prune_ids = set()
+        for filename in deleted:
+            prune_ids.update(alias_refs.pop(filename, ()))
+        prune_ids = {chunk_id for chunk_id in prune_ids if chunk_id.split("-", 1)[0] not in file_keys}
+        promote_ids = {
+            chunk_id for canonical_ids in alias_refs.values() for chunk_id in canonical_ids
+            if chunk_id.split("-", 1)[0] in file_keys
+        }
+        
+        promoted = 0
+        if prune_ids or promote_ids:
+            current = collection.get(ids=sorted(prune_ids | promote_ids), include=["documents", "metadatas", "embeddings"])
+            update_ids, update_metadatas = [], []
+            new_rows: Dict[str, List[Any]] = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+            for chunk_id, text, metadata, embedding in zip(current["ids"], current["documents"], current["metadatas"], current["embeddings"]):
+                aliases = [alias for alias in parse_aliases(metadata) if alias.get("filename") not in deleted]
+                if chunk_id not in promote_ids:
+                    update_ids.append(chunk_id)
+                    update_metadatas.append({**metadata, "aliases": dump_aliases(aliases)})
+                    continue
+                if not aliases:
+                    continue
                 
-                logger.info(f"Vector store built: {self._total_chunks} chunks, {len(self._vectorized_documents)} documents")
+                successor, rest = dict(aliases[0]), aliases[1:]
+                new_id = successor.pop("id")
+                owner = successor["filename"]
+                new_rows["ids"].append(new_id)
+                new_rows["embeddings"].append(embedding.tolist() if hasattr(embedding, "tolist") else list(embedding))
+                new_rows["documents"].append(text)
+                new_rows["metadatas"].append({**successor, "aliases": dump_aliases(rest)})
+                document_chunks[owner] = document_chunks.get(owner, 0) + 1
+                promoted += 1
                 
-                return True
+                alias_refs.get(owner, set()).discard(chunk_id)
+                for alias in rest:
+                    refs = alias_refs.setdefault(alias["filename"], set())
+                    refs.discard(chunk_id)
+                    if alias["filename"] != owner:
+                        refs.add(new_id)
+            for filename in [filename for filename, refs in alias_refs.items() if not refs]:
+                del alias_refs[filename]
+            
+            if update_ids:
+                collection.update(ids=update_ids, metadatas=update_metadatas)
+            if new_rows["ids"]:
+                collection.upsert(**new_rows)
+                logger.info(f"{len(new_rows['ids'])} near-duplicate aliases took over chunks of {sorted(deleted)}")
+        
+        collection.delete(where={"filename": filenames[0]} if len(filenames) == 1 else {"filename": {"$in": filenames}})
+        return promoted
+    
+    def get_generation(self) -> int:
+        """获取知识库版本号（每次写入递增）"""
+        return self._generation
+    
+    def get_last_build_stats(self) -> Dict[str, Any]:
+        """获取最近一次全量重建的耗时与嵌入缓存命中情况"""
+        return dict(self._last_build_stats)
+    
+    def get_embedding_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取嵌入缓存统计（未启用或尚未创建时返回 None）"""
+        if self._embedding_cache is None:
+            return None
+        return self._embedding_cache.get_stats()
+    
+    def _with_embedding_cache(self, embedding_model: Any) -> Any:
+        """
+        用持久化嵌入缓存包装嵌入模型（只影响 embed_documents，查询嵌入不缓存）
+        
+        未启用或缓存初始化失败时返回原模型。
+        """
+        if not EMBEDDING_CACHE_ENABLED:
+            return embedding_model
+        
+        with self._lock:
+            cached = self._cached_embeddings
+            if cached is not None and cached.embeddings is embedding_model:
+                return cached
+            
+            try:
+                from managers.embedding_cache import EmbeddingCache, CachedEmbeddings
                 
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, EMBEDDING_CACHE_DTYPE)
+                # 模型实例可能被刷新，缓存按模型名共享，只需重新包装
+                self._cached_embeddings = CachedEmbeddings(embedding_model, self._embedding_cache)
+                return self._cached_embeddings
+            except Exception as e:
+                logger.error(f"Embedding cache unavailable, embedding without cache: {e}")
+                return embedding_model
+    
+    def _create_store(self, embedding_model: Any, collection_name: str = DEFAULT_COLLECTION, reset: bool = False) -> Any:
+        """创建（或打开）向量存储集合（按 VECTOR_BACKEND 选择后端），持久化与纯内存模式共用"""
+        persist_dir = os.getenv("CHROMA_PERSIST_DIR", "")
+        if VECTOR_BACKEND in ("numpy", "hnsw"):
+            store = NumpyVectorStore(collection_name, embedding_model, persist_directory=persist_dir or None, collection_class=self._collection_class())
+        elif persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            store = Chroma(
+                persist_directory=persist_dir,
+                embedding_function=embedding_model,
+                collection_name=collection_name
+            )
+        else:
+            import chromadb
+            store = Chroma(
+                client=chromadb.EphemeralClient(),
+                embedding_function=embedding_model,
+                collection_name=collection_name
+            )
+        
+        if reset and store._collection.count() > 0:
+            # EphemeralClient 在进程内共享状态，清空同名集合中的残留 chunks
+            store.delete_collection()
+            store = self._create_store(embedding_model, collection_name)
+        return store
+    
+    @staticmethod
+    def _collection_class() -> type:
+        """numpy / hnsw 后端的集合实现；hnswlib 未安装时退回精确检索（存储格式相同）"""
+        if VECTOR_BACKEND == "hnsw":
+            try:
+                from managers.hnsw_store import HnswCollection
+                return HnswCollection
+            except ImportError:
+                logger.error("hnswlib not installed, using exact search. Run: pip install hnswlib")
+        return NumpyCollection
+    
+    @staticmethod
+    def _storage_format(backend: str) -> str:
+        """后端的存储格式（numpy 与 hnsw 共用向量矩阵，相互切换无需重建）"""
+        return "numpy" if backend in ("numpy", "hnsw") else backend
+    
+    @staticmethod
+    def _new_collection_name() -> str:
+        return f"{DEFAULT_COLLECTION}-{uuid.uuid4().hex[:12]}"
+    
+    @classmethod
+    def _scan_collection(cls, collection: Any) -> Tuple[Dict[str, int], Dict[str, Set[str]]]:
+        """扫描集合中全部 chunk 的元数据（O(chunks)，仅在清单缺失或过期时使用）"""
+        results = collection.get(include=["metadatas"])
+        ids, metadatas = results["ids"], results.get("metadatas") or []
+        cls._backfill_filenames(collection, ids, metadatas)
+        return cls._index_chunks(ids, metadatas)
+    
+    @staticmethod
+    def _backfill_filenames(collection: Any, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """
+        为早期版本写入、缺少 filename 元数据的 chunk 按 source 补齐（原地修改 metadatas）
+        
+        按文件替换与删除都以 where={"filename": ...} 定位 chunks，缺少该字段的旧 chunk 否则永远不会被删除。
+        早期版本没有知识库清单，升级后首次加载必然经过扫描。
+        """
+        missing = [
+            (chunk_id, metadata) for chunk_id, metadata in zip(ids, metadatas)
+            if metadata and "source" in metadata and not metadata.get("filename") and os.path.basename(metadata["source"])
+        ]
+        if not missing:
+            return
+        for chunk_id, metadata in missing:
+            metadata["filename"] = os.path.basename(metadata["source"])
+        for start in range(0, len(missing), INGEST_BATCH_SIZE):
+            batch = missing[start:start + INGEST_BATCH_SIZE]
+            collection.update(ids=[chunk_id for chunk_id, _ in batch], metadatas=[metadata for _, metadata in batch])
+        logger.info(f"Backfilled filename metadata for {len(missing)} chunks")
+    
+    @staticmethod
+    def _index_chunks(ids: List[str], metadatas: List[Dict[str, Any]]) -> Tuple[Dict[str, int], Dict[str, Set[str]]]:
+        """
+        由 chunk 元数据统计各文件的 chunk 数与近重复别名引用
+        
+        Returns:
+            ({filename: chunk 数（只有别名的文件为 0）}, {filename: 以其为别名的其他文件中的代表 chunk ID})
+        """
+        document_chunks: Dict[str, int] = {}
+        alias_refs: Dict[str, Set[str]] = {}
+        for chunk_id, metadata in zip(ids, metadatas):
+            if metadata and "source" in metadata:
+                filename = metadata.get("filename") or os.path.basename(metadata["source"])
+                if filename:
+                    document_chunks[filename] = document_chunks.get(filename, 0) + 1
+                for alias in parse_aliases(metadata):
+                    document_chunks.setdefault(alias["filename"], 0)
+                    if alias["filename"] != filename:
+                        alias_refs.setdefault(alias["filename"], set()).add(chunk_id)
+        return document_chunks, alias_refs
+    
+    @staticmethod
+    def _read_manifest(persist_dir: str) -> Optional[Dict[str, Any]]:
+        """读取知识库清单；不存在、损坏或版本不受支持时返回 None"""
+        try:
+            with open(os.path.join(persist_dir, _MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable knowledge base manifest: {e}")
+            return None
+        if manifest.get("version", 0) > _MANIFEST_VERSION:
+            logger.warning(f"Ignoring knowledge base manifest with unsupported version {manifest.get('version')}")
+            return None
+        return manifest
+    
+    @staticmethod
+    def _read_legacy_active_collection(persist_dir: str) -> str:
+        """读取旧版本记录的激活集合名（没有记录时为默认集合）"""
+        try:
+            with open(os.path.join(persist_dir, _LEGACY_ACTIVE_COLLECTION_FILE)) as f:
+                return f.read().strip() or DEFAULT_COLLECTION
+        except OSError:
+            return DEFAULT_COLLECTION
+    
+    def _write_manifest(self):
+        """
+        原子写入知识库清单（先写临时文件再 rename），每次写入知识库后调用，调用方持有 self._lock
+        
+        写入失败只记录日志：内存中的状态仍然有效，下次写入时重试；重启时清单与集合不一致会触发重新扫描。
+        """
+        persist_dir = os.getenv("CHROMA_PERSIST_DIR", "")
+        if not persist_dir or self._vector_store is None:
+            return
+        manifest = {
+            "version": _MANIFEST_VERSION,
+            "collection": self._collection_name,
+            "embedding_model": EMBEDDING_MODEL,
+            "vector_backend": VECTOR_BACKEND,
+            "vector_quantization": VECTOR_QUANTIZATION if VECTOR_BACKEND == "numpy" else "none",
+            "generation": self._generation,
+            "total_chunks": self._total_chunks,
+            "updated_at": time.time(),
+            "files": {},
+        }
+        for filename, chunks in sorted(self._document_chunks.items()):
+            manifest["files"][filename] = {"chunks": chunks, "sha256": self._document_hashes.get(filename)}
+            if self._alias_refs.get(filename):
+                manifest["files"][filename]["aliased_in"] = sorted(self._alias_refs[filename])
+        path = os.path.join(persist_dir, _MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            
+            legacy_path = os.path.join(persist_dir, _LEGACY_ACTIVE_COLLECTION_FILE)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        except OSError as e:
+            logger.error(f"Failed to write knowledge base manifest: {e}")
+    
+    @staticmethod
+    def _content_hash(source: DocumentSource) -> Optional[str]:
+        """源文件内容的 SHA-256（磁盘路径按块读取）；读取失败时为 None"""
+        try:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                return hashlib.sha256(source).hexdigest()
+            digest = hashlib.sha256()
+            with open(source, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+        except OSError:
+            return None
+    
+    def _drop_collection(self, vector_store: Any, delay: float = 0.0):
+        """删除集合；delay > 0 时延迟删除，让切换前开始的查询读完旧集合"""
+        def _drop():
+            try:
+                vector_store.delete_collection()
+                logger.info("Dropped retired vector store collection")
             except Exception as e:
-                logger.error(f"Failed to build vector store: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.warning(f"Failed to drop retired collection: {e}")
+        
+        if delay > 0:
+            timer = threading.Timer(delay, _drop)
+            timer.daemon = True
+            timer.start()
+        else:
+            _drop()
+    
+    def _drop_stale_collections(self):
+        """删除上次进程中未完成清理的旧集合（只保留当前激活集合）"""
+        try:
+            client = self._vector_store._client
+            for collection in client.list_collections():
+                name = getattr(collection, "name", collection)
+                if name != self._collection_name and name.startswith(DEFAULT_COLLECTION):
+                    client.delete_collection(name)
+                    logger.info(f"Dropped stale collection: {name}")
+        except Exception as e:
+            logger.warning(f"Failed to drop stale collections: {e}")
+    
+    @staticmethod
+    def _assign_chunk_ids(chunks: List[Any]) -> List[str]:
+        """
+        为 chunks 分配稳定 ID（文件名哈希 + 内容哈希），并记录 filename / chunk_id 元数据，
+        使单个文件可以按 ID / 元数据被替换或删除，检索各阶段按 ID 识别 chunk
+        
+        同一文件内重复出现的文本以出现序号区分（而不是字符偏移），文档编辑后未改动的 chunk 保持原 ID。
+        """
+        ids = []
+        occurrences: Dict[str, int] = {}
+        for chunk in chunks:
+            filename = os.path.basename(chunk.metadata.get("source", "")) or "unknown"
+            content_key = hashlib.blake2b(chunk.page_content.encode("utf-8"), digest_size=8).hexdigest()
+            chunk_id = f"{ChromaVectorStoreManager._file_key(filename)}-{content_key}"
+            occurrence = occurrences.get(chunk_id, 0)
+            occurrences[chunk_id] = occurrence + 1
+            if occurrence:
+                chunk_id = f"{chunk_id}-{occurrence}"
+            
+            chunk.metadata["filename"] = filename
+            chunk.metadata["chunk_id"] = chunk_id
+            ids.append(chunk_id)
+        return ids
+    
+    @staticmethod
+    def _file_key(filename: str) -> str:
+        """chunk ID 的文件前缀"""
+        return hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16]
+    
+    def _build_vector_store_from_documents(self, documents: List[Any]) -> bool:
+        """
+        从已加载的文档列表构建向量存储（按文件分组后交给流式流水线）
+        
+        Args:
+            documents: 已加载的文档列表
+        
+        Returns:
+            构建是否成功
+        """
+        grouped: Dict[str, List[Any]] = {}
+        for doc in documents:
+            filename = os.path.basename(doc.metadata.get("source", "")) or "unknown"
+            grouped.setdefault(filename, []).append(doc)
+        return self._build_vector_store(
+            ParseResult(filename, docs, 0.0) for filename, docs in grouped.items()
+        )
+    
+    def _build_vector_store(
+        self,
+        parse_results: Iterable[Any],
+        progress: Optional[JobProgress] = None,
+        sources: Optional[Dict[str, DocumentSource]] = None
+    ) -> bool:
+        """
+        流式构建向量存储（blue/green）
+        
+        写入一个新集合，构建期间查询继续使用当前集合；构建完成后重放期间的增量变更，
+        原子切换到新集合，并延迟删除旧集合。解析、切分、嵌入与写入通过有界队列重叠执行，
+        峰值内存受 INGEST_MEMORY_LIMIT_MB 约束而与语料规模无关。
+        
+        Args:
+            parse_results: ParseResult 可迭代对象（逐个文件产出）
+            progress: 任务进度（可选）；请求取消时丢弃新集合，当前集合保持不变
+            sources: 文档来源（可选），用于在知识库清单中记录各文件的内容哈希
+        
+        Returns:
+            构建是否成功
+        """
+        if not self._build_lock.acquire(blocking=False):
+            logger.warning("A vector store rebuild is already running")
+            return False
+        
+        new_store = None
+        try:
+            logger.info("Starting vector store build...")
+            
+            # 1. 获取嵌入模型（经嵌入缓存包装，只为未命中的 chunk 调用模型）
+            embedding_model = self.embedding_interface.get_embeddings()
+            if not embedding_model:
+                logger.error("Embedding model not available")
                 return False
+            embedding_model = self._with_embedding_cache(embedding_model)
+            
+            # 2. 创建新集合（当前集合继续提供查询）
+            new_name = self._new_collection_name()
+            new_store = self._create_store(embedding_model, new_name, reset=True)
+            logger.info(f"Building into new collection '{new_name}' (serving '{self._collection_name}')")
+            
+            with self._lock:
+                self._building = True
+                self._build_changes = {}
+                self._build_discarded = False
+            
+            # 3. 流式写入：解析 → 切分 → 嵌入 → 写入
+            pipeline = IngestionPipeline(
+                split_documents=self._process_documents,
+                assign_ids=self._assign_chunk_ids,
+                embeddings=embedding_model,
+                collection=new_store._collection,
+                progress=progress,
+                deduplicator=self._new_deduplicator(),
+            )
+            stats = pipeline.run(parse_results)
+            
+            if stats["chunks"] == 0:
+                logger.warning("No chunks generated from documents")
+                self._drop_collection(new_store)
+                return False
+            
+            # 4. 重放构建期间的增量变更，原子切换，并延迟删除旧集合
+            document_hashes = {
+                filename: self._content_hash(sources[filename]) if sources and filename in sources else None
+                for filename in pipeline.document_chunks
+            }
+            if not self._swap_in(
+                new_store, new_name, dict(pipeline.document_chunks), embedding_model, progress, document_hashes, pipeline.alias_refs
+            ):
+                return False
+            
+            self._last_build_stats = {**stats, "files": pipeline.files}
+            
+            logger.info(f"Vector store built: {self._total_chunks} chunks, {len(self._vectorized_documents)} documents")
+            logger.info(f"Rebuild timings: {stats}")
+            
+            return True
+        
+        except JobCancelled:
+            logger.info("Vector store build cancelled, discarding new collection")
+            if new_store is not None:
+                self._drop_collection(new_store)
+            return False
+        except Exception as e:
+            logger.error(f"Failed to build vector store: {e}")
+            import traceback
+            traceback.print_exc()
+            if new_store is not None:
+                self._drop_collection(new_store)
+            return False
+        finally:
+            with self._lock:
+                self._building = False
+                self._build_changes = {}
+            self._build_lock.release()
     
-    def _load_documents_from_memory(self, in_memory_documents: Dict[str, bytes]) -> List[Any]:
-        """从内存文档加载文档"""
-        documents = []
+    def _swap_in(
+        self,
+        new_store: Any,
+        new_name: str,
+        document_chunks: Dict[str, int],
+        embedding_model: Any,
+        progress: Optional[JobProgress] = None,
+        document_hashes: Optional[Dict[str, Optional[str]]] = None,
+        alias_refs: Optional[Dict[str, Set[str]]] = None
+    ) -> bool:
+        """
+        重放构建期间的增量变更后原子切换到新集合，写入知识库清单，并延迟删除旧集合
         
-        # 创建临时目录用于处理文件
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for filename, file_content in in_memory_documents.items():
-                try:
-                    logger.info(f"Processing file from memory: {filename}")
-                    
-                    # 创建临时文件
-                    temp_file_path = os.path.join(temp_dir, filename)
-                    with open(temp_file_path, 'wb') as f:
-                        f.write(file_content)
-                    
-                    # 使用LangChain加载器加载文档
-                    if filename.lower().endswith('.pdf'):
-                        loader = PyPDFLoader(temp_file_path)
-                    elif filename.lower().endswith('.csv'):
-                        loader = CSVLoader(temp_file_path)
-                    elif filename.lower().endswith(('.txt', '.md')):
-                        loader = TextLoader(temp_file_path)
-                    elif filename.lower().endswith(('.docx', '.doc')):
-                        loader = WordDocumentLoader(temp_file_path)
-                    else:
-                        logger.warning(f"Unsupported file type: {filename}")
-                        continue
-                    
-                    docs = loader.load()
-                    documents.extend(docs)
-                    logger.info(f"Successfully loaded {len(docs)} pages from {filename}")
+        Returns:
+            是否已切换；构建期间知识库被清空时丢弃新集合并返回 False
+        """
+        document_hashes = dict(document_hashes or {})
+        alias_refs = {filename: set(refs) for filename, refs in (alias_refs or {}).items()}
+        while True:
+            with self._lock:
+                if self._build_discarded:
+                    logger.info("Knowledge base was cleared during rebuild, discarding new collection")
+                    self._drop_collection(new_store)
+                    return False
+                
+                changes, self._build_changes = self._build_changes, {}
+                if not changes:
+                    if progress is not None:
+                        progress.check_cancelled()
+                    old_store = self._vector_store
+                    self._vector_store = new_store
+                    self._collection_name = new_name
                     
-                except Exception as e:
-                    logger.error(f"Error loading {filename} from memory: {e}")
-                    import traceback
-                    logger.error(f"Traceback: {traceback.format_exc()}")
+                    self._document_chunks = document_chunks
+                    self._document_hashes = {filename: document_hashes.get(filename) for filename in document_chunks}
+                    self._alias_refs = alias_refs
+                    self._vectorized_documents = sorted(document_chunks)
+                    self._total_chunks = sum(document_chunks.values())
+                    self._last_build_time = time.time()
+                    self._generation += 1
+                    self._building = False
+                    self._write_manifest()
+                    break
+            
+            logger.info(f"Replaying {len(changes)} document changes made during rebuild")
+            for filename, source in changes.items():
+                if source is None:
+                    self._remove_file_chunks(new_store._collection, [filename], document_chunks, alias_refs)
+                    document_chunks.pop(filename, None)
+                    continue
+                prepared = self._prepare_document(filename, source, embedding_model)
+                if "error" in prepared:
+                    logger.warning(f"Failed to replay '{filename}': {prepared['error']}")
                     continue
+                self._write_document(new_store._collection, filename, prepared, document_chunks, alias_refs)
+                document_chunks[filename] = len(prepared["ids"])
+                document_hashes[filename] = self._content_hash(source)
         
-        return documents
+        # 切换前开始的查询可能仍在读取旧集合
+        if old_store is not None:
+            self._drop_collection(old_store, delay=_RETIRED_COLLECTION_GRACE_S)
+        return True
+    
+    # =========================================================================
+    # 快照
+    # =========================================================================
+    
+    def export_snapshot(self, writer: SnapshotWriter, progress: Optional[JobProgress] = None) -> Dict[str, Any]:
+        """
+        将当前集合的 chunks、元数据与向量分页写入快照（不重新计算嵌入）
+        
+        先取得 ID 列表再按页读取，导出期间的增量写入不会打乱行对应关系。
+        
+        Args:
+            writer: 快照写入器
+            progress: 任务进度（可选，阶段 "export"）
+        
+        Returns:
+            {"status", "generation", "embedding_model"}
+        """
+        with self._lock:
+            store = self._vector_store
+            generation = self._generation
+        if store is None:
+            return {"status": "error", "message": "Knowledge base is empty"}
+        
+        collection = store._collection
+        ids = collection.get(include=[])["ids"]
+        if progress is not None:
+            progress.set_total("export", len(ids))
+        for start in range(0, len(ids), INGEST_BATCH_SIZE):
+            if progress is not None:
+                progress.check_cancelled()
+            page = collection.get(ids=ids[start:start + INGEST_BATCH_SIZE], include=["documents", "metadatas", "embeddings"])
+            if len(page["ids"]):
+                writer.add(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+            if progress is not None:
+                progress.advance("export", len(page["ids"]))
+        if progress is not None:
+            progress.finish("export")
+        
+        logger.info(f"Exported {len(writer)} chunks from collection '{self._collection_name}' (generation {generation})")
+        return {
+            "status": "success",
+            "generation": generation,
+            "embedding_model": EMBEDDING_MODEL,
+        }
+    
+    def import_snapshot(self, snapshot: KnowledgeBaseSnapshot, progress: Optional[JobProgress] = None) -> Dict[str, Any]:
+        """
+        从快照恢复知识库（blue/green）：向量直接写入新集合，不解析、不嵌入，完成后原子切换
+        
+        Args:
+            snapshot: 已校验的快照
+            progress: 任务进度（可选，阶段 "insert"）；请求取消时丢弃新集合
+        
+        Returns:
+            {"status", "chunks", "documents"}
+        
+        Raises:
+            SnapshotError: 快照的嵌入模型与当前配置不一致
+        """
+        snapshot_model = snapshot.manifest.get("embedding_model")
+        if snapshot_model != EMBEDDING_MODEL:
+            raise SnapshotError(f"Snapshot was built with embedding model '{snapshot_model}', but '{EMBEDDING_MODEL}' is configured")
+        
+        if not self._build_lock.acquire(blocking=False):
+            return {"status": "error", "message": "A vector store rebuild is already running"}
+        
+        new_store = None
+        try:
+            embedding_model = self.embedding_interface.get_embeddings()
+            if not embedding_model:
+                return {"status": "error", "message": "Embedding model not available"}
+            
+            new_name = self._new_collection_name()
+            new_store = self._create_store(embedding_model, new_name, reset=True)
+            logger.info(f"Restoring snapshot {snapshot.path} into new collection '{new_name}' (serving '{self._collection_name}')")
+            
+            with self._lock:
+                self._building = True
+                self._build_changes = {}
+                self._build_discarded = False
+            
+            if progress is not None:
+                progress.set_total("insert", len(snapshot))
+            alias_refs: Dict[str, Set[str]] = {}
+            for ids, texts, metadatas, embeddings in snapshot.iter_batches(INGEST_BATCH_SIZE):
+                if progress is not None:
+                    progress.check_cancelled()
+                new_store._collection.upsert(ids=ids, embeddings=embeddings.tolist(), documents=texts, metadatas=metadatas)
+                for filename, canonical_ids in self._index_chunks(ids, metadatas)[1].items():
+                    alias_refs.setdefault(filename, set()).update(canonical_ids)
+                if progress is not None:
+                    progress.advance("insert", len(ids))
+            if progress is not None:
+                progress.finish("insert")
+            
+            files = snapshot.manifest.get("files", {})
+            document_chunks = {filename: info["chunks"] for filename, info in files.items()}
+            document_hashes = {filename: info.get("sha256") for filename, info in files.items()}
+            if not self._swap_in(new_store, new_name, document_chunks, embedding_model, progress, document_hashes, alias_refs):
+                return {"status": "error", "message": "Knowledge base was cleared during restore"}
+            
+            logger.info(f"Snapshot restored: {self._total_chunks} chunks, {len(self._vectorized_documents)} documents")
+            return {"status": "success", "chunks": self._total_chunks, "documents": len(self._vectorized_documents)}
+        
+        except JobCancelled:
+            logger.info("Snapshot restore cancelled, discarding new collection")
+            if new_store is not None:
+                self._drop_collection(new_store)
+            return {"status": "cancelled", "message": "Snapshot restore cancelled"}
+        except Exception as e:
+            logger.error(f"Failed to restore snapshot: {e}")
+            if new_store is not None:
+                self._drop_collection(new_store)
+            return {"status": "error", "message": str(e)}
+        finally:
+            with self._lock:
+                self._building = False
+                self._build_changes = {}
+            self._build_lock.release()
     
     def get_vectorized_documents(self) -> Dict[str, Any]:
         """获取已向量化的文档列表 - 内存模式"""
@@ -454,7 +1246,7 @@ class ChromaVectorStoreManager(VectorStoreInterface):
                 docs = loader.load()
                 documents.extend(docs)
                 logger.info(f"Successfully loaded {len(docs)} pages from {filename}")
-                
+            
             except Exception as e:
                 logger.error(f"Error loading {filename}: {e}")
                 continue
@@ -462,15 +1254,9 @@ class ChromaVectorStoreManager(VectorStoreInterface):
         return documents
     
     def _process_documents(self, documents: List[Any]) -> List[Any]:
-        """处理文档为chunks"""
+        """处理文档为chunks（切分策略见 CHUNKING_STRATEGY）"""
         try:
-            from langchain_text_splitters import RecursiveCharacterTextSplitter
-            
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=CHUNK_SIZE,
-                chunk_overlap=CHUNK_OVERLAP,
-                length_function=len,
-            )
+            text_splitter = create_text_splitter()
             
             chunks = text_splitter.split_documents(documents)
             logger.info(f"Generated {len(chunks)} chunks")
@@ -481,9 +1267,9 @@ class ChromaVectorStoreManager(VectorStoreInterface):
                 logger.debug(chunk.page_content[:200] + "..." if len(chunk.page_content) > 200 else chunk.page_content)
             
             return chunks
-            
+        
         except Exception as e:
             logger.error(f"Error processing documents: {e}")
             return []
-    
+
 
@@ -0,0 +1,157 @@
+"""
+Warmup Manager
+启动预热管理器
+
+在后台依次加载并预热各组件（对模型执行一次虚拟推理，完成 JIT 与内存分配），
+记录每个组件的就绪状态，供 /api/ready 使用。
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODES = ("background", "blocking", "off")
+
+_WARMUP_TEXT = "warmup"
+
+
+class WarmupManager:
+    """
+    启动预热管理器
+    
+    Usage:
+        warmup = WarmupManager(embedding_manager, llm_manager, vector_store_manager)
+        warmup.start_background()   # 或 warmup.run() 同步执行
+        warmup.is_ready()
+    """
+    
+    def __init__(self, embedding_manager: Any, llm_manager: Any, vector_store_manager: Any):
+        from config import RERANKING_ENABLED, QUERY_EXPANSION_ENABLED
+        
+        self.embedding_manager = embedding_manager
+        self.llm_manager = llm_manager
+        self.vector_store_manager = vector_store_manager
+        
+        # (组件名, 预热函数, 是否必需)；非必需组件失败不影响整体就绪
+        self._steps: List[Tuple[str, Callable[[], None], bool]] = [
+            ("embedding", self._warmup_embedding, True),
+            ("vector_store", self._warmup_vector_store, True),
+            ("llm", self._warmup_llm, True),
+        ]
+        if RERANKING_ENABLED:
+            self._steps.append(("reranker", self._warmup_reranker, False))
+        if QUERY_EXPANSION_ENABLED:
+            self._steps.append(("query_expansion_llm", self._warmup_query_expansion_llm, False))
+        
+        self._components: Dict[str, Dict[str, Any]] = {
+            name: {"state": "pending", "required": required, "duration_ms": None, "error": None}
+            for name, _, required in self._steps
+        }
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+    
+    # =========================================================================
+    # 执行
+    # =========================================================================
+    
+    def start_background(self):
+        """在后台线程中执行预热"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+        logger.info("Background warmup started")
+    
+    def run(self):
+        """依次预热所有组件"""
+        self._started_at = time.time()
+        
+        for name, step, _ in self._steps:
+            self._set_state(name, "loading")
+            start = time.perf_counter()
+            try:
+                step()
+                self._set_state(name, "ready", duration_ms=(time.perf_counter() - start) * 1000)
+                logger.info(f"Warmup: {name} ready ({(time.perf_counter() - start):.2f}s)")
+            except Exception as e:
+                self._set_state(name, "failed", duration_ms=(time.perf_counter() - start) * 1000, error=str(e))
+                logger.error(f"Warmup: {name} failed: {e}")
+        
+        self._finished_at = time.time()
+        logger.info(f"Warmup finished in {self._finished_at - self._started_at:.2f}s (ready={self.is_ready()})")
+    
+    def skip(self):
+        """跳过预热（模型在首次请求时懒加载），所有组件视为就绪"""
+        with self._lock:
+            for component in self._components.values():
+                component["state"] = "skipped"
+    
+    def _set_state(self, name: str, state: str, duration_ms: float = None, error: str = None):
+        with self._lock:
+            component = self._components[name]
+            component["state"] = state
+            if duration_ms is not None:
+                component["duration_ms"] = round(duration_ms, 1)
+            component["error"] = error
+    
+    # =========================================================================
+    # 各组件预热
+    # =========================================================================
+    
+    def _warmup_embedding(self):
+        model = self.embedding_manager.get_embeddings()
+        if model is None:
+            raise RuntimeError("embedding model not available")
+        model.embed_query(_WARMUP_TEXT)
+    
+    def _warmup_vector_store(self):
+        self.vector_store_manager.load_persistent_store()
+    
+    def _warmup_llm(self):
+        if self.llm_manager.get_llm() is None:
+            raise RuntimeError("LLM not available")
+    
+    def _warmup_reranker(self):
+        from managers.model_manager import RerankingModelManager
+        
+        model = RerankingModelManager().get_model()
+        if model is None:
+            raise RuntimeError("reranking model not available")
+        model.predict([(_WARMUP_TEXT, _WARMUP_TEXT)], batch_size=1, show_progress_bar=False)
+    
+    def _warmup_query_expansion_llm(self):
+        from managers.model_manager import QueryExpansionLLMManager
+        
+        # 只创建客户端，不发起网络请求
+        if QueryExpansionLLMManager().get_llm() is None:
+            raise RuntimeError("query expansion LLM not available")
+    
+    # =========================================================================
+    # 状态查询
+    # =========================================================================
+    
+    def is_ready(self) -> bool:
+        """所有必需组件就绪，且非必需组件已结束加载"""
+        with self._lock:
+            for component in self._components.values():
+                if component["required"] and component["state"] not in ("ready", "skipped"):
+                    return False
+                if not component["required"] and component["state"] in ("pending", "loading"):
+                    return False
+            return True
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取就绪状态（用于 /api/ready）"""
+        with self._lock:
+            components = {name: dict(info) for name, info in self._components.items()}
+        return {
+            "ready": self.is_ready(),
+            "started_at": self._started_at,
+            "finished_at": self._finished_at,
+            "components": components,
+        }
@@ -6,9 +6,11 @@ Routes Package
 from .query import create_query_blueprint
 from .documents import create_documents_blueprint
 from .system import create_system_blueprint
+from .snapshots import create_snapshots_blueprint
 
 __all__ = [
     "create_query_blueprint",
     "create_documents_blueprint",
     "create_system_blueprint",
+    "create_snapshots_blueprint",
 ]
@@ -94,14 +94,37 @@ def create_documents_blueprint(document_service: DocumentService) -> Blueprint:
             logger.error(f"Error in upload_document: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
     
+    @documents_bp.route("/api/documents/bulk-upload", methods=["POST"])
+    def bulk_upload_documents():
+        """批量上传文档（multipart：files 可多个，archive 为 zip/tar 压缩包），索引在后台执行"""
+        try:
+            files = request.files.getlist('files') + request.files.getlist('archive')
+            if not any(file.filename for file in files):
+                return jsonify({"status": "error", "message": "No file provided"}), 400
+            
+            result = document_service.bulk_upload(files)
+            
+            if result['status'] == 'error':
+                return jsonify(result), 400
+            
+            # 202：已存储，索引任务在后台执行（GET /api/jobs/<job_id> 查询逐文件索引结果）
+            return jsonify(result), 202 if result['status'] == 'accepted' else 200
+            
+        except Exception as e:
+            logger.error(f"Error in bulk_upload_documents: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
     @documents_bp.route("/api/documents/preview/<path:filename>", methods=["GET"])
     def preview_document(filename):
-        """获取文档预览"""
+        """获取文档预览（?max_length=&page=&paragraph=&offset=）"""
         try:
-            # 获取查询参数中的最大长度
+            # 获取查询参数：最大长度，以及可选的范围（第 N 页 / 第 N 段 / 起始偏移）
             max_length = request.args.get('max_length', default=1000, type=int)
+            page = request.args.get('page', type=int)
+            paragraph = request.args.get('paragraph', type=int)
+            offset = request.args.get('offset', default=0, type=int)
             
-            result = document_service.get_document_preview(filename, max_length)
+            result = document_service.get_document_preview(filename, max_length, page=page, paragraph=paragraph, offset=offset)
             
             if result['status'] == 'error':
                 return jsonify(result), 404
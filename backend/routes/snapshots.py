@@ -0,0 +1,103 @@
+"""
+Snapshot Routes
+知识库快照路由
+"""
+from flask import Blueprint, jsonify, request, send_file
+import logging
+
+from services.snapshot_service import SnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+def create_snapshots_blueprint(snapshot_service: SnapshotService) -> Blueprint:
+    """创建快照路由蓝图"""
+    
+    snapshots_bp = Blueprint('snapshots', __name__)
+    
+    @snapshots_bp.route("/api/snapshots", methods=["GET"])
+    def list_snapshots():
+        """列出快照"""
+        try:
+            return jsonify(snapshot_service.list_snapshots())
+        except Exception as e:
+            logger.error(f"Error in list_snapshots: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @snapshots_bp.route("/api/snapshots/export", methods=["POST"])
+    def export_snapshot():
+        """导出知识库快照（后台执行，立即返回任务 ID；body 可选 {"name": ...}）"""
+        try:
+            data = request.get_json(silent=True) or {}
+            result = snapshot_service.export_snapshot(data.get('name'))
+            
+            if result['status'] == 'error':
+                return jsonify(result), 400
+            
+            return jsonify(result), 202
+        
+        except Exception as e:
+            logger.error(f"Error in export_snapshot: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @snapshots_bp.route("/api/snapshots/import", methods=["POST"])
+    def import_snapshot():
+        """导入知识库快照（后台执行，立即返回任务 ID）
+        
+        - JSON {"name": ...}：导入快照目录中已有的快照
+        - multipart 字段 snapshot，或 ?name= 加原始请求体：先流式保存上传的快照再导入
+        """
+        try:
+            if 'snapshot' in request.files:
+                file = request.files['snapshot']
+                upload = snapshot_service.upload_snapshot(request.args.get('name') or file.filename, file.stream)
+            elif request.args.get('name') and request.mimetype == 'application/octet-stream':
+                upload = snapshot_service.upload_snapshot(request.args['name'], request.stream)
+            else:
+                upload = None
+            
+            if upload is not None:
+                if upload['status'] == 'error':
+                    return jsonify(upload), 400
+                name = upload['name']
+            else:
+                data = request.get_json(silent=True) or {}
+                name = data.get('name')
+                if not name:
+                    return jsonify({"status": "error", "message": "Snapshot name or file is required"}), 400
+            
+            result = snapshot_service.import_snapshot(name)
+            
+            if result['status'] == 'error':
+                return jsonify(result), 404
+            
+            return jsonify(result), 202
+        
+        except Exception as e:
+            logger.error(f"Error in import_snapshot: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @snapshots_bp.route("/api/snapshots/<name>", methods=["GET"])
+    def download_snapshot(name):
+        """下载快照文件"""
+        path = snapshot_service.get_snapshot_path(name)
+        if path is None:
+            return jsonify({"status": "error", "message": f"Snapshot '{name}' not found"}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True)
+    
+    @snapshots_bp.route("/api/snapshots/<name>", methods=["DELETE"])
+    def delete_snapshot(name):
+        """删除快照"""
+        try:
+            result = snapshot_service.delete_snapshot(name)
+            
+            if result['status'] == 'error':
+                return jsonify(result), 404
+            
+            return jsonify(result)
+        
+        except Exception as e:
+            logger.error(f"Error in delete_snapshot: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    return snapshots_bp
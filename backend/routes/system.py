@@ -2,7 +2,7 @@
 System Routes
 系统相关路由
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import logging
 
 from services.system_service import SystemService
@@ -21,6 +21,17 @@ def create_system_blueprint(system_service: SystemService, document_service: Doc
         """健康检查端点 - 用于 Docker 健康检查"""
         return jsonify({"status": "healthy", "service": "ragenius-backend"})
     
+    @system_bp.route("/api/ready", methods=["GET"])
+    def readiness_check():
+        """就绪检查端点 - 模型加载并预热完成后返回 200，否则返回 503"""
+        try:
+            result = system_service.get_readiness()
+            result["status"] = "ready" if result["ready"] else "warming_up"
+            return jsonify(result), 200 if result["ready"] else 503
+        except Exception as e:
+            logger.error(f"Error in readiness_check: {e}")
+            return jsonify({"status": "error", "ready": False, "message": str(e)}), 503
+    
     @system_bp.route("/api/info", methods=["GET"])
     def get_info():
         """获取系统信息"""
@@ -31,19 +42,88 @@ def create_system_blueprint(system_service: SystemService, document_service: Doc
             logger.error(f"Error in get_info: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
     
+    @system_bp.route("/api/models", methods=["GET"])
+    def get_models():
+        """获取模型加载状态"""
+        try:
+            return jsonify(system_service.get_model_stats())
+        except Exception as e:
+            logger.error(f"Error in get_models: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @system_bp.route("/api/models/<name>/refresh", methods=["POST"])
+    def refresh_model(name):
+        """刷新模型（?wait=true 同步等待加载完成）"""
+        try:
+            wait = request.args.get('wait', 'false').lower() in ('true', '1', 'yes')
+            result = system_service.refresh_model(name, background=not wait)
+            
+            if result['status'] == 'error':
+                status_code = {'unknown_model': 404, 'pinned': 409}.get(result.get('reason'), 500)
+                return jsonify(result), status_code
+            
+            return jsonify(result)
+        except Exception as e:
+            logger.error(f"Error in refresh_model: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
     @system_bp.route("/api/rebuild", methods=["POST"])
     def rebuild():
-        """重建知识库"""
+        """重建知识库（后台执行，立即返回任务 ID）"""
         try:
             result = document_service.rebuild_knowledge_base()
             
             if result['status'] == 'error':
                 return jsonify(result), 500
             
-            return jsonify(result)
+            return jsonify(result), 202
             
         except Exception as e:
             logger.error(f"Error in rebuild: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
     
+    @system_bp.route("/api/rebuild/<job_id>", methods=["GET"])
+    def get_rebuild_job(job_id):
+        """查询重建任务状态"""
+        try:
+            result = document_service.get_rebuild_job(job_id)
+            
+            if result['status'] == 'error':
+                return jsonify(result), 404
+            
+            return jsonify(result)
+            
+        except Exception as e:
+            logger.error(f"Error in get_rebuild_job: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @system_bp.route("/api/jobs", methods=["GET"])
+    def list_jobs():
+        """列出后台任务（进行中 + 最近 JOB_HISTORY_SIZE 个已结束任务）"""
+        try:
+            return jsonify(document_service.list_jobs())
+        except Exception as e:
+            logger.error(f"Error in list_jobs: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    @system_bp.route("/api/jobs/<job_id>", methods=["GET"])
+    def get_job(job_id):
+        """查询后台任务状态与分阶段进度"""
+        return get_rebuild_job(job_id)
+    
+    @system_bp.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+    def cancel_job(job_id):
+        """请求取消后台任务"""
+        try:
+            result = document_service.cancel_job(job_id)
+            
+            if result['status'] == 'error':
+                return jsonify(result), 404
+            
+            return jsonify(result), 202
+            
+        except Exception as e:
+            logger.error(f"Error in cancel_job: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
     return system_bp
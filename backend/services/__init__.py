@@ -6,12 +6,14 @@ Services Package
 from .query_service import QueryService
 from .document_service import DocumentService
 from .system_service import SystemService
+from .snapshot_service import SnapshotService
 from .retrieval import RetrievalOrchestrator, RetrievalContext
 
 __all__ = [
     "QueryService",
     "DocumentService",
     "SystemService",
+    "SnapshotService",
     "RetrievalOrchestrator",
     "RetrievalContext",
 ]
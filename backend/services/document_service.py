@@ -3,42 +3,70 @@ Document Service
 文档服务实现
 """
 import os
-import io
-from typing import Dict, Any
+import tarfile
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
 import logging
 import threading
 
 from interfaces.services import DocumentServiceInterface
 from interfaces.vector_store import VectorStoreInterface
+from managers.job_manager import Job, JobManager
+from managers.document_store import DocumentStore
+from managers.document_parser import ParseResult, document_parser
+from config import INCREMENTAL_INDEXING_ENABLED, DOCUMENT_STORE_DIR, BULK_UPLOAD_MAX_FILES
 
 logger = logging.getLogger(__name__)
 
+# 重建任务的进度阶段：(阶段名, 计数单位)
+REBUILD_PHASES = [
+    ("parse", "docs"),
+    ("chunk", "chunks"),
+    ("embed", "chunks"),
+    ("insert", "chunks"),
+    ("bm25", "chunks"),
+]
+
+# 批量上传索引任务的进度阶段（增量写入当前集合，不重建 BM25）
+BULK_UPLOAD_PHASES = REBUILD_PHASES[:4]
+
+ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.md', '.csv', '.docx', '.doc'}
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
 
 class DocumentService(DocumentServiceInterface):
-    """文档服务实现 - 内存模式"""
+    """文档服务实现 - 原始文件保存在磁盘文档存储中"""
     
-    def __init__(self, vector_store_manager: VectorStoreInterface):
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreInterface,
+        job_manager: JobManager = None,
+        retrieval_orchestrator: Any = None,
+        document_store: DocumentStore = None
+    ):
         """
         初始化文档服务
         
         Args:
             vector_store_manager: 向量存储管理器
+            job_manager: 后台任务管理器（重建知识库在后台执行）
+            retrieval_orchestrator: 检索编排器（可选）；提供时重建任务在切换后预建 BM25 索引
+            document_store: 文档存储（默认 DOCUMENT_STORE_DIR）
         """
         self.vector_store_manager = vector_store_manager
-        
-        # 内存中的文档存储：{filename: file_content_bytes}
-        self._in_memory_documents: Dict[str, bytes] = {}
+        self.job_manager = job_manager or JobManager()
+        self.retrieval_orchestrator = retrieval_orchestrator
+        self.document_store = document_store or DocumentStore(DOCUMENT_STORE_DIR)
         self._lock = threading.RLock()
         
-        logger.info("DocumentService initialized (memory mode)")
+        logger.info(f"DocumentService initialized ({len(self.document_store)} documents in {self.document_store.root_dir})")
     
     def get_documents(self) -> Dict[str, Any]:
-        """获取文档列表（从内存）"""
+        """获取文档列表"""
         try:
-            with self._lock:
-                documents = sorted(list(self._in_memory_documents.keys()))
-                logger.info(f"Found {len(documents)} documents in memory: {documents}")
-                return {"status": "success", "documents": documents}
+            documents = self.document_store.list()
+            logger.info(f"Found {len(documents)} documents: {documents}")
+            return {"status": "success", "documents": documents, "storage": self.document_store.get_stats()}
             
         except Exception as e:
             logger.error(f"Failed to get documents: {e}")
@@ -53,7 +81,7 @@ class DocumentService(DocumentServiceInterface):
             return {"status": "error", "message": str(e)}
     
     def upload_document(self, file) -> Dict[str, Any]:
-        """上传文档到内存
+        """上传文档（流式写入文档存储）
         
         Args:
             file: Flask上传的文件对象
@@ -70,47 +98,55 @@ class DocumentService(DocumentServiceInterface):
                 }
             
             # 检查文件类型
-            allowed_extensions = {'.pdf', '.txt', '.md', '.csv', '.docx', '.doc'}
             filename = file.filename
             file_ext = os.path.splitext(filename)[1].lower()
             
-            if file_ext not in allowed_extensions:
+            if file_ext not in ALLOWED_EXTENSIONS:
                 return {
                     "status": "error",
-                    "message": f"Unsupported file type. Allowed types: {', '.join(sorted(allowed_extensions))}"
+                    "message": f"Unsupported file type. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
                 }
             
-            # 读取文件内容到内存
-            # 重置文件指针到开头（以防之前被读取过）
+            # 按块流式写入磁盘（重置文件指针到开头，以防之前被读取过）
             file.seek(0)
-            file_content = file.read()
-            
-            # 验证文件内容不为空
-            if not file_content:
+            try:
+                entry = self.document_store.put_stream(filename, file.stream)
+            except FileExistsError:
                 return {
                     "status": "error",
-                    "message": "File is empty or could not be read"
+                    "message": f"File '{filename}' already exists"
                 }
+            except ValueError as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+            logger.info(f"File uploaded: {filename} ({entry['size']} bytes{', deduplicated' if entry['deduplicated'] else ''})")
+            logger.info(f"Total documents: {len(self.document_store)}")
             
-            with self._lock:
-                # 检查文件是否已存在
-                if filename in self._in_memory_documents:
-                    return {
-                        "status": "error",
-                        "message": f"File '{filename}' already exists"
-                    }
-                
-                # 保存到内存
-                self._in_memory_documents[filename] = file_content
-                logger.info(f"File uploaded to memory: {filename} ({len(file_content)} bytes)")
-                logger.info(f"Total documents in memory: {len(self._in_memory_documents)}")
-            
-            return {
+            result = {
                 "status": "success",
                 "message": f"File '{filename}' uploaded successfully",
-                "filename": filename
+                "filename": filename,
+                "size": entry["size"],
+                "deduplicated": entry["deduplicated"]
             }
             
+            # 入库时提取一次文本供预览；解析结果同时用于增量索引，不重复解析
+            path = self.document_store.path(filename)
+            documents = self._extract_text(filename, path)
+            
+            # 增量索引：只处理本次上传的文件（在锁外执行，不阻塞其他文档操作）
+            if INCREMENTAL_INDEXING_ENABLED:
+                index_result = self.vector_store_manager.upsert_document(filename, path, documents)
+                result["indexed"] = index_result.get("status") == "success"
+                result["chunks"] = index_result.get("chunks", 0)
+                if not result["indexed"]:
+                    logger.warning(f"Incremental indexing failed for '{filename}': {index_result.get('message')}")
+                    result["index_error"] = index_result.get("message")
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Failed to upload document: {e}")
             return {
@@ -118,91 +154,274 @@ class DocumentService(DocumentServiceInterface):
                 "message": f"Failed to upload document: {str(e)}"
             }
     
-    def get_in_memory_documents(self) -> Dict[str, bytes]:
-        """获取内存中的文档（供向量存储管理器使用）"""
-        with self._lock:
-            return self._in_memory_documents.copy()
+    def bulk_upload(self, files: List[Any]) -> Dict[str, Any]:
+        """批量上传文档（多个文件和/或 zip、tar 压缩包）
+        
+        文件与压缩包成员逐个流式写入文档存储（不整体读入内存），随后提交后台任务，
+        经入库流水线并行解析、批量嵌入并写入当前集合。
+        
+        Args:
+            files: Flask 上传的文件对象列表；按扩展名识别压缩包
+        
+        Returns:
+            存储结果（逐文件 stored / skipped / failed）；有文件写入时附带索引任务 ID，
+            任务结果中包含逐文件的索引状态
+        """
+        try:
+            report: List[Dict[str, Any]] = []
+            stored: List[str] = []
+            for file in files:
+                if not file or not file.filename:
+                    continue
+                if not file.filename.lower().endswith(ARCHIVE_EXTENSIONS):
+                    self._store_bulk_file(file.filename, file.stream, report, stored)
+                    continue
+                try:
+                    for member_name, stream in self._iter_archive(file):
+                        self._store_bulk_file(member_name, stream, report, stored, archive=file.filename)
+                except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+                    logger.warning(f"Failed to read archive '{file.filename}': {e}")
+                    report.append({"filename": file.filename, "status": "failed", "message": f"Invalid archive: {e}"})
+            
+            if not report:
+                return {
+                    "status": "error",
+                    "message": "No files provided"
+                }
+            
+            counts = {status: sum(1 for entry in report if entry["status"] == status) for status in ("stored", "skipped", "failed")}
+            logger.info(f"Bulk upload: {counts['stored']} stored, {counts['skipped']} skipped, {counts['failed']} failed")
+            result = {
+                "status": "success",
+                "message": f"{counts['stored']} of {len(report)} files stored",
+                **counts,
+                "files": report
+            }
+            if not stored:
+                return result
+            
+            job = self.job_manager.submit(
+                "bulk_upload", lambda job: self._bulk_index(job, stored), phases=BULK_UPLOAD_PHASES, exclusive=False
+            )
+            result.update({"status": "accepted", "job_id": job.id, "job": job.to_dict()})
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk upload documents: {e}")
+            return {
+                "status": "error",
+                "message": f"Failed to bulk upload documents: {str(e)}"
+            }
+    
+    def _store_bulk_file(
+        self,
+        filename: str,
+        stream: BinaryIO,
+        report: List[Dict[str, Any]],
+        stored: List[str],
+        archive: Optional[str] = None
+    ):
+        """将批量上传中的单个文件写入文档存储，并记录到逐文件报告"""
+        entry: Dict[str, Any] = {"filename": filename}
+        if archive:
+            entry["archive"] = archive
+        report.append(entry)
+        
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            entry.update({"status": "skipped", "message": f"Unsupported file type '{file_ext}'"})
+            return
+        if len(stored) >= BULK_UPLOAD_MAX_FILES:
+            entry.update({"status": "skipped", "message": f"File limit reached ({BULK_UPLOAD_MAX_FILES} per upload)"})
+            return
+        try:
+            stored_entry = self.document_store.put_stream(filename, stream)
+        except FileExistsError:
+            entry.update({"status": "skipped", "message": f"File '{filename}' already exists"})
+            return
+        except ValueError as e:
+            entry.update({"status": "failed", "message": str(e)})
+            return
+        except Exception as e:
+            logger.warning(f"Failed to store '{filename}': {e}")
+            entry.update({"status": "failed", "message": str(e)})
+            return
+        
+        stored.append(filename)
+        entry.update({"status": "stored", "size": stored_entry["size"], "deduplicated": stored_entry["deduplicated"]})
+    
+    @staticmethod
+    def _iter_archive(file) -> Iterator[Tuple[str, BinaryIO]]:
+        """逐个产出压缩包中的文档成员 (文件名, 流)；每个流须在取下一个成员前读完
+        
+        zip 通过中央目录随机访问成员；tar 以流模式顺序读取（不回退、不解压到磁盘）。
+        只取成员的文件名部分，跳过目录、隐藏文件与 macOS 元数据。
+        """
+        def usable(name: str) -> bool:
+            parts = name.replace("\\", "/").split("/")
+            return bool(parts[-1]) and not parts[-1].startswith(".") and "__MACOSX" not in parts
+        
+        file.stream.seek(0)
+        if file.filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not usable(info.filename):
+                        continue
+                    with archive.open(info) as stream:
+                        yield os.path.basename(info.filename.replace("\\", "/")), stream
+        else:
+            with tarfile.open(fileobj=file.stream, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile() or not usable(member.name):
+                        continue
+                    stream = archive.extractfile(member)
+                    if stream is not None:
+                        yield os.path.basename(member.name), stream
+    
+    def _bulk_index(self, job: Job, filenames: List[str]) -> Dict[str, Any]:
+        """批量上传的后台任务：缓存提取文本，并增量索引本次写入的文件"""
+        sources = {filename: self.document_store.path(filename) for filename in filenames if filename in self.document_store}
+        logger.info(f"Bulk indexing {len(sources)} uploaded documents...")
+        
+        if not INCREMENTAL_INDEXING_ENABLED:
+            # 未开启增量索引：只提取文本供预览，索引留给下一次重建
+            files: Dict[str, Any] = {}
+            job.progress.set_total("parse", len(sources))
+            for filename, path in sources.items():
+                job.progress.check_cancelled()
+                documents = self._extract_text(filename, path)
+                files[filename] = {"indexed": False, "text_extracted": documents is not None}
+                job.progress.advance("parse")
+            job.progress.finish("parse")
+            return {
+                "status": "success",
+                "message": f"Stored {len(sources)} documents; rebuild the knowledge base to index them",
+                "files": files
+            }
+        
+        job.progress.set_total("parse", len(sources))
+        index_result = self.vector_store_manager.upsert_documents(sources, job.progress, on_parsed=self._cache_text)
+        if index_result.get("status") != "success":
+            return index_result
+        
+        files = {
+            filename: {
+                "indexed": not report.get("error"),
+                "chunks": report.get("chunks", 0),
+                "error": report.get("error")
+            }
+            for filename, report in index_result["files"].items()
+        }
+        indexed = sum(1 for entry in files.values() if entry["indexed"])
+        return {
+            "status": "success",
+            "message": f"Indexed {indexed} of {len(sources)} documents",
+            "files": files,
+            "timings": index_result.get("stats")
+        }
     
-    def get_document_preview(self, filename: str, max_length: int = 1000) -> Dict[str, Any]:
+    def _cache_text(self, result: ParseResult):
+        """缓存流水线解析出的文本供预览（与索引共用一次解析）"""
+        if result.error:
+            return
+        try:
+            self.document_store.put_text(result.filename, [doc.page_content for doc in result.documents])
+        except Exception as e:
+            # 索引期间文档已被删除
+            logger.warning(f"Failed to cache extracted text for '{result.filename}': {e}")
+    
+    def _warm_bm25_index(self, job: Job):
+        """切换后预建 BM25 索引，避免首个查询承担建索引的耗时"""
+        if self.retrieval_orchestrator is None:
+            return
+        progress = job.progress
+        total_chunks = self.vector_store_manager.get_vectorized_documents().get("total_chunks", 0)
+        progress.set_total("bm25", total_chunks)
+        progress.start("bm25")
+        try:
+            self.retrieval_orchestrator.set_vector_store(
+                self.vector_store_manager.get_store(), self.vector_store_manager.get_generation()
+            )
+            progress.advance("bm25", total_chunks)
+        except Exception as e:
+            logger.warning(f"Failed to warm BM25 index after rebuild: {e}")
+        progress.finish("bm25")
+    
+    def get_document_sources(self) -> Dict[str, str]:
+        """获取文档来源 {filename: 磁盘路径}（供向量存储管理器按需读取）"""
+        return self.document_store.sources()
+    
+    def get_document_preview(
+        self,
+        filename: str,
+        max_length: int = 1000,
+        page: Optional[int] = None,
+        paragraph: Optional[int] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
         """获取文档预览内容
         
+        读取入库时提取并缓存的文本，不重新解析原始文件，也不占用服务锁。
+        
         Args:
             filename: 文件名
             max_length: 最大预览字符数，默认1000
+            page: 页号（从 1 开始；PDF 为页，CSV 为行），只返回该页内的内容
+            paragraph: 段号（从 1 开始），只返回该段内的内容
+            offset: 起始字符偏移（指定 page / paragraph 时相对于其起点）
         
         Returns:
             预览结果
         """
         try:
-            with self._lock:
-                if filename not in self._in_memory_documents:
-                    return {
-                        "status": "error",
-                        "message": f"Document '{filename}' not found"
-                    }
-                
-                file_content = self._in_memory_documents[filename]
-                file_ext = os.path.splitext(filename)[1].lower()
-                
-                # 根据文件类型处理预览
-                preview_text = ""
-                
-                if file_ext in ['.txt', '.md', '.csv']:
-                    # 文本文件直接解码
-                    try:
-                        preview_text = file_content.decode('utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            preview_text = file_content.decode('gbk')
-                        except:
-                            preview_text = file_content.decode('latin-1')
-                
-                elif file_ext == '.pdf':
-                    # PDF文件需要特殊处理
-                    try:
-                        import PyPDF2
-                        pdf_file = io.BytesIO(file_content)
-                        pdf_reader = PyPDF2.PdfReader(pdf_file)
-                        
-                        # 读取前几页
-                        pages_to_read = min(3, len(pdf_reader.pages))
-                        for page_num in range(pages_to_read):
-                            page = pdf_reader.pages[page_num]
-                            preview_text += page.extract_text() + "\n\n"
-                    except Exception as e:
-                        logger.warning(f"Failed to extract PDF text: {e}")
-                        preview_text = f"[PDF 文件，共 {len(file_content)} 字节]\n无法提取文本预览"
-                
-                elif file_ext in ['.docx', '.doc']:
-                    # Word文档需要特殊处理
-                    try:
-                        from docx import Document
-                        doc_file = io.BytesIO(file_content)
-                        doc = Document(doc_file)
-                        
-                        # 读取前几段
-                        paragraphs_to_read = min(10, len(doc.paragraphs))
-                        for i in range(paragraphs_to_read):
-                            preview_text += doc.paragraphs[i].text + "\n\n"
-                    except Exception as e:
-                        logger.warning(f"Failed to extract Word text: {e}")
-                        preview_text = f"[Word 文件，共 {len(file_content)} 字节]\n无法提取文本预览"
-                
-                else:
-                    preview_text = f"[不支持的文件格式: {file_ext}]"
-                
-                # 截断到指定长度
-                if len(preview_text) > max_length:
-                    preview_text = preview_text[:max_length] + "\n\n... (内容已截断)"
-                
+            entry = self.document_store.get(filename)
+            if entry is None:
                 return {
-                    "status": "success",
-                    "filename": filename,
-                    "preview": preview_text,
-                    "size": len(file_content),
-                    "type": file_ext
+                    "status": "error",
+                    "message": f"Document '{filename}' not found"
                 }
+            
+            file_ext = os.path.splitext(filename)[1].lower()
+            result = {
+                "status": "success",
+                "filename": filename,
+                "size": entry["size"],
+                "type": file_ext
+            }
+            
+            # 提取文本前上传的文档：首次预览时提取一次并缓存
+            if self.document_store.get_text_info(filename) is None:
+                if self._extract_text(filename, self.document_store.path(filename)) is None:
+                    result["preview"] = f"[{file_ext} 文件，共 {entry['size']} 字节]\n无法提取文本预览"
+                    return result
+            
+            try:
+                text_range = self.document_store.read_text(filename, offset, max_length, page, paragraph)
+            except IndexError as e:
+                return {
+                    "status": "error",
+                    "message": f"{'Page' if page is not None else 'Paragraph'} {page or paragraph} {e}"
+                }
+            
+            preview_text = text_range["text"]
+            if text_range["truncated"] and page is None and paragraph is None and offset == 0:
+                preview_text += "\n\n... (内容已截断)"
+            
+            result.update({
+                "preview": preview_text,
+                "start": text_range["start"],
+                "end": text_range["end"],
+                "truncated": text_range["truncated"],
+                **self.document_store.get_text_info(filename)
+            })
+            return result
         
+        except (KeyError, FileNotFoundError):
+            # 读取期间文档被删除
+            return {
+                "status": "error",
+                "message": f"Document '{filename}' not found"
+            }
         except Exception as e:
             logger.error(f"Failed to get document preview: {e}")
             return {
@@ -210,6 +429,17 @@ class DocumentService(DocumentServiceInterface):
                 "message": f"Failed to get document preview: {str(e)}"
             }
     
+    def _extract_text(self, filename: str, path: str) -> Optional[List[Any]]:
+        """解析文档并缓存提取文本（含页/段偏移）；返回解析出的页面，失败时返回 None"""
+        documents, report = document_parser.parse_all({filename: path})
+        error = report.get(filename, {}).get("error")
+        if error:
+            logger.warning(f"Failed to extract text from '{filename}': {error}")
+            return None
+        info = self.document_store.put_text(filename, [doc.page_content for doc in documents])
+        logger.info(f"Extracted text from '{filename}': {info['chars']} chars, {info['pages']} pages, {info['paragraphs']} paragraphs")
+        return documents
+    
     def delete_document(self, filename: str) -> Dict[str, Any]:
         """删除单个文档
         
@@ -221,21 +451,23 @@ class DocumentService(DocumentServiceInterface):
         """
         try:
             with self._lock:
-                if filename not in self._in_memory_documents:
+                if not self.document_store.delete(filename):
                     return {
                         "status": "error",
                         "message": f"Document '{filename}' not found"
                     }
                 
-                # 从内存中删除
-                del self._in_memory_documents[filename]
-                logger.info(f"Document deleted from memory: {filename}")
-                logger.info(f"Remaining documents: {len(self._in_memory_documents)}")
+                logger.info(f"Document deleted: {filename}")
+                logger.info(f"Remaining documents: {len(self.document_store)}")
+                
+                # 同步删除该文档的 chunks
+                if INCREMENTAL_INDEXING_ENABLED:
+                    self.vector_store_manager.delete_document(filename)
                 
                 return {
                     "status": "success",
                     "message": f"Document '{filename}' deleted successfully",
-                    "remaining_count": len(self._in_memory_documents)
+                    "remaining_count": len(self.document_store)
                 }
                 
         except Exception as e:
@@ -246,17 +478,16 @@ class DocumentService(DocumentServiceInterface):
             }
     
     def clear_all_documents(self) -> Dict[str, Any]:
-        """清空所有文档（包括内存和向量数据库）
+        """清空所有文档（包括文档存储和向量数据库）
         
         Returns:
             清空结果
         """
         try:
             with self._lock:
-                # 清空内存中的文档
-                doc_count = len(self._in_memory_documents)
-                self._in_memory_documents.clear()
-                logger.info(f"Cleared {doc_count} documents from memory")
+                # 清空文档存储
+                doc_count = self.document_store.clear()
+                logger.info(f"Cleared {doc_count} documents from the document store")
                 
                 # 清空向量数据库
                 self.vector_store_manager.clear_store()
@@ -276,35 +507,85 @@ class DocumentService(DocumentServiceInterface):
             }
     
     def rebuild_knowledge_base(self) -> Dict[str, Any]:
-        """重建知识库（从内存中的文档）
+        """提交后台重建任务，立即返回任务 ID
         
-        如果内存中没有文档，则清空向量库
+        重建写入新集合，完成后原子切换，期间查询继续使用当前知识库；
+        已有重建任务在运行时返回该任务。
         """
         try:
-            logger.info("Starting knowledge base rebuild from memory...")
+            job = self.job_manager.submit("rebuild", self._rebuild_knowledge_base, phases=REBUILD_PHASES)
+            return {
+                "status": "accepted",
+                "message": "Knowledge base rebuild started",
+                "job_id": job.id,
+                "job": job.to_dict()
+            }
+        except Exception as e:
+            logger.error(f"Failed to start knowledge base rebuild: {e}")
+            return {
+                "status": "error",
+                "message": f"Failed to start knowledge base rebuild: {str(e)}"
+            }
+    
+    def get_rebuild_job(self, job_id: str) -> Dict[str, Any]:
+        """获取重建任务状态"""
+        job = self.job_manager.get(job_id)
+        if job is None:
+            return {"status": "error", "message": f"Job '{job_id}' not found"}
+        return {"status": "success", "job": job.to_dict()}
+    
+    def list_jobs(self) -> Dict[str, Any]:
+        """列出进行中与最近结束的后台任务（新的在前）"""
+        jobs = self.job_manager.list()
+        return {"status": "success", "jobs": [job.to_dict() for job in jobs]}
+    
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """请求取消后台任务；重建任务取消后丢弃新集合，当前知识库保持不变"""
+        job = self.job_manager.cancel(job_id)
+        if job is None:
+            return {"status": "error", "message": f"Job '{job_id}' not found"}
+        return {"status": "success", "job": job.to_dict()}
+    
+    def _rebuild_knowledge_base(self, job: Job) -> Dict[str, Any]:
+        """重建知识库（从文档存储）
+        
+        如果没有文档，则清空向量库
+        """
+        progress = job.progress
+        try:
+            logger.info("Starting knowledge base rebuild from the document store...")
             
-            # 从内存获取文档
-            in_memory_docs = self.get_in_memory_documents()
+            # 只传递磁盘路径，解析进程按需读取文件内容
+            sources = self.get_document_sources()
             
-            logger.info(f"Found {len(in_memory_docs)} documents in memory: {list(in_memory_docs.keys())}")
+            logger.info(f"Found {len(sources)} documents: {list(sources.keys())}")
             
             # 如果没有文档，清空向量库
-            if not in_memory_docs:
-                logger.info("No documents in memory, clearing vector store")
+            if not sources:
+                logger.info("No documents, clearing vector store")
                 self.vector_store_manager.clear_store()
                 return {
                     "status": "success",
                     "message": "Knowledge base cleared (no documents to rebuild)"
                 }
             
-            # 使用内存文档重建向量存储
-            success = self.vector_store_manager.rebuild_store_from_memory(in_memory_docs)
+            # 使用文档存储中的文件重建向量存储
+            success = self.vector_store_manager.rebuild_store_from_sources(sources, progress)
+            
+            if not success and progress.cancel_requested:
+                logger.info("Knowledge base rebuild cancelled")
+                return {
+                    "status": "cancelled",
+                    "message": "Knowledge base rebuild cancelled"
+                }
             
             if success:
+                self._warm_bm25_index(job)
                 logger.info("Knowledge base rebuild completed successfully")
                 return {
                     "status": "success",
-                    "message": "Knowledge base rebuilt successfully"
+                    "message": "Knowledge base rebuilt successfully",
+                    "timings": self.vector_store_manager.get_last_build_stats()
                 }
             else:
                 logger.error("Knowledge base rebuild failed")
@@ -8,8 +8,9 @@ import logging
 
 from interfaces.services import QueryServiceInterface
 from interfaces.vector_store import VectorStoreInterface, LLMInterface
-from services.retrieval import RetrievalOrchestrator
+from services.retrieval import RetrievalOrchestrator, chunk_key
 from managers.timing import timed
+from managers.dedup import parse_aliases
 from config import SEARCH_K
 
 logger = logging.getLogger(__name__)
@@ -42,7 +43,9 @@ class QueryService(QueryServiceInterface):
         """确保编排器的依赖已绑定"""
         vector_store = self.vector_store_manager.get_store()
         if vector_store:
-            self.retrieval_orchestrator.set_vector_store(vector_store)
+            self.retrieval_orchestrator.set_vector_store(
+                vector_store, self.vector_store_manager.get_generation()
+            )
         
         # 设置 embedding function 给 MMR 阶段
         embedding_model = self.vector_store_manager.embedding_interface.get_embeddings()
@@ -197,7 +200,7 @@ class QueryService(QueryServiceInterface):
         """格式化源文档"""
         sources = []
         file_chunk_count = {}
-        seen_content = set()
+        seen_chunks = set()
         
         for doc in docs:
             source_path = doc.metadata.get('source', 'Unknown')
@@ -207,10 +210,8 @@ class QueryService(QueryServiceInterface):
             else:
                 source_filename = source_path
             
-            content_preview = doc.page_content[:100].strip()
-            content_hash = hash(content_preview)
-            
-            if content_hash in seen_content:
+            chunk_id = chunk_key(doc)
+            if chunk_id in seen_chunks:
                 continue
             
             current_count = file_chunk_count.get(source_filename, 0)
@@ -220,11 +221,16 @@ class QueryService(QueryServiceInterface):
             chunk_num = current_count + 1
             display_source = f"{source_filename}" if chunk_num == 1 else f"{source_filename} (片段{chunk_num})"
             
-            sources.append({
+            source = {
                 "content": doc.page_content,
                 "source": display_source
-            })
-            seen_content.add(content_hash)
+            }
+            # 入库时合并的近重复 chunk 所在的其他文件
+            also_in = sorted({alias["filename"] for alias in parse_aliases(doc.metadata)} - {source_filename})
+            if also_in:
+                source["also_in"] = also_in
+            sources.append(source)
+            seen_chunks.add(chunk_id)
             file_chunk_count[source_filename] = chunk_num
             
             if len(sources) >= 12:
@@ -14,6 +14,7 @@ from .stages import (
     RetrievalStage,
     RetrievalContext,
     ScoredDocument,
+    chunk_key,
     QueryExpansionStage,
     HybridRetrievalStage,
     RRFFusionStage,
@@ -27,6 +28,7 @@ __all__ = [
     "RetrievalStage",
     "RetrievalContext",
     "ScoredDocument",
+    "chunk_key",
     "QueryExpansionStage",
     "HybridRetrievalStage",
     "RRFFusionStage",
@@ -6,10 +6,12 @@ BM25 关键词检索器
 """
 import logging
 import threading
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 
 from langchain_core.documents import Document
 
+from managers.chunk_store import ChunkStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,16 +20,17 @@ class BM25Retriever:
     BM25 关键词检索器
     
     基于 rank_bm25 实现的关键词检索，支持中英文分词。
+    文档保存在 ChunkStore 中（与向量检索共用），检索结果为行号与分数。
     """
     
-    def __init__(self, documents: List[Document] = None):
+    def __init__(self, documents: Union[ChunkStore, List[Document], None] = None):
         """
         初始化 BM25 检索器
         
         Args:
-            documents: 初始文档列表
+            documents: 初始文档（ChunkStore 或 Document 列表）
         """
-        self._documents: List[Document] = documents or []
+        self._documents: ChunkStore = self._as_store(documents)
         self._bm25 = None
         self._tokenized_corpus = None
         self._lock = threading.Lock()
@@ -56,8 +59,8 @@ class BM25Retriever:
             from rank_bm25 import BM25Okapi
             
             self._tokenized_corpus = [
-                self._tokenize(doc.page_content) 
-                for doc in self._documents
+                self._tokenize(text)
+                for text in self._documents.iter_texts()
             ]
             self._bm25 = BM25Okapi(self._tokenized_corpus)
             logger.info(f"BM25 index built with {len(self._documents)} documents")
@@ -69,10 +72,10 @@ class BM25Retriever:
             logger.error(f"Failed to build BM25 index: {e}")
             self._bm25 = None
     
-    def update_documents(self, documents: List[Document]):
+    def update_documents(self, documents: Union[ChunkStore, List[Document]]):
         """更新文档并重建索引"""
         with self._lock:
-            self._documents = documents
+            self._documents = self._as_store(documents)
             self._bm25 = None
             self._tokenized_corpus = None
             self._build_index()
@@ -86,7 +89,7 @@ class BM25Retriever:
             top_k: 返回的文档数量
         
         Returns:
-            List[Dict]: 包含 document 和 score 的字典列表
+            List[Dict]: 包含 chunk_id、row（chunk_store 中的行号）和 score 的字典列表
         """
         with self._lock:
             if self._bm25 is None:
@@ -110,7 +113,8 @@ class BM25Retriever:
             for idx, score in scored_indices:
                 if score > 0:
                     results.append({
-                        "document": self._documents[idx],
+                        "chunk_id": self._documents.ids[idx],
+                        "row": idx,
                         "score": float(score)
                     })
             
@@ -120,8 +124,73 @@ class BM25Retriever:
             logger.error(f"BM25 retrieval failed: {e}")
             return []
     
+    def to_state(self) -> Optional[Dict[str, Any]]:
+        """
+        导出索引统计（逐文档词频、IDF、文档长度），用于知识库快照
+        
+        Returns:
+            可 JSON 序列化的状态；索引不可用时返回 None
+        """
+        with self._lock:
+            if self._bm25 is None:
+                self._build_index()
+            bm25 = self._bm25
+        if bm25 is None:
+            return None
+        return {
+            "k1": bm25.k1,
+            "b": bm25.b,
+            "epsilon": bm25.epsilon,
+            "corpus_size": bm25.corpus_size,
+            "avgdl": float(bm25.avgdl),
+            "doc_len": [int(length) for length in bm25.doc_len],
+            "doc_freqs": bm25.doc_freqs,
+            "idf": {token: float(idf) for token, idf in bm25.idf.items()},
+        }
+    
+    @classmethod
+    def from_state(cls, documents: Union[ChunkStore, List[Document]], state: Dict[str, Any]) -> "BM25Retriever":
+        """
+        从快照中的索引统计恢复（不重新分词与统计词频）
+        
+        Args:
+            documents: 与导出时顺序一致的文档（如 ChunkStore.from_snapshot）
+            state: to_state 的返回值
+        """
+        documents = cls._as_store(documents)
+        from rank_bm25 import BM25Okapi
+        
+        if state["corpus_size"] != len(documents):
+            raise ValueError(f"BM25 state covers {state['corpus_size']} documents, got {len(documents)}")
+        
+        bm25 = BM25Okapi.__new__(BM25Okapi)
+        bm25.k1, bm25.b, bm25.epsilon = state["k1"], state["b"], state["epsilon"]
+        bm25.corpus_size = state["corpus_size"]
+        bm25.avgdl = state["avgdl"]
+        bm25.doc_len = state["doc_len"]
+        bm25.doc_freqs = state["doc_freqs"]
+        bm25.idf = state["idf"]
+        bm25.tokenizer = None
+        
+        retriever = cls()
+        retriever._documents = documents
+        retriever._bm25 = bm25
+        logger.info(f"BM25 index restored with {len(documents)} documents")
+        return retriever
+    
     @property
     def document_count(self) -> int:
         """获取索引中的文档数量"""
         return len(self._documents)
+    
+    @property
+    def chunk_store(self) -> ChunkStore:
+        """索引对应的 chunk 存储（retrieve 返回的 row 为其中的行号）"""
+        return self._documents
+    
+    @staticmethod
+    def _as_store(documents: Union[ChunkStore, List[Document], None]) -> ChunkStore:
+        if isinstance(documents, ChunkStore):
+            return documents
+        return ChunkStore.from_documents(documents or [])
 
@@ -73,9 +73,10 @@ class RetrievalOrchestrator:
     # 依赖设置
     # =========================================================================
     
-    def set_vector_store(self, vector_store: Any):
-        """设置向量存储"""
-        self._hybrid_retrieval.set_vector_store(vector_store)
+    def set_vector_store(self, vector_store: Any, generation: Optional[int] = None, bm25_retriever: Any = None):
+        """设置向量存储（generation 为知识库版本号，用于判断 BM25 索引是否需要重建；
+        bm25_retriever 为已构建的 BM25 索引，如从快照恢复）"""
+        self._hybrid_retrieval.set_vector_store(vector_store, generation, bm25_retriever)
     
     def set_embedding_function(self, fn):
         """设置嵌入函数（用于 MMR）"""
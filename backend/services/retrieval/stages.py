@@ -5,6 +5,7 @@ Retrieval Pipeline Stages
 每个 Stage 是独立的、可插拔的处理单元，遵循统一接口。
 """
 import os
+import hashlib
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
@@ -12,6 +13,8 @@ from typing import Any, Dict, List, Optional
 
 from langchain_core.documents import Document
 
+from managers.chunk_store import ChunkStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,21 +22,89 @@ logger = logging.getLogger(__name__)
 # 数据结构
 # =============================================================================
 
-@dataclass
+def chunk_key(document: Document) -> str:
+    """
+    chunk 的稳定 ID（入库时写入元数据 chunk_id，Chroma 与 BM25 的文档都带有）
+    
+    旧版本入库、没有 chunk_id 的 chunk 以来源与内容的哈希代替。
+    """
+    chunk_id = document.metadata.get("chunk_id")
+    if chunk_id:
+        return chunk_id
+    digest = hashlib.blake2b(document.metadata.get("source", "").encode("utf-8"), digest_size=8)
+    digest.update(document.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+
 class ScoredDocument:
-    """带分数的文档"""
-    document: Document
-    score: float
-    source: str = "unknown"
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    """
+    带分数的检索结果（轻量记录：chunk_id、分数、来源，chunk_id 用于融合、去重等按 chunk 的查找）
+    
+    来自 ChunkStore 的结果只引用存储中的行，文本按需读取，Document 在首次访问 document 时才构造
+    （通常只有最终上下文与响应需要）；不在存储中的结果直接持有 Document。
+    """
+    
+    __slots__ = ("chunk_id", "score", "source", "metadata", "_document", "_store", "_row")
+    
+    def __init__(
+        self,
+        document: Document,
+        score: float,
+        source: str = "unknown",
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_id: str = ""
+    ):
+        self.chunk_id = chunk_id or chunk_key(document)
+        self.score = score
+        self.source = source
+        self.metadata = metadata if metadata is not None else {}
+        self._document: Optional[Document] = document
+        self._store: Optional[ChunkStore] = None
+        self._row = -1
+    
+    @classmethod
+    def from_store(cls, store: ChunkStore, row: int, score: float, source: str) -> "ScoredDocument":
+        """引用 ChunkStore 中的一行（不读取文本、不构造 Document）"""
+        record = cls.__new__(cls)
+        record.chunk_id = store.ids[row]
+        record.score = score
+        record.source = source
+        record.metadata = {}
+        record._document = None
+        record._store = store
+        record._row = row
+        return record
+    
+    def rescored(self, score: float, source: str, metadata: Optional[Dict[str, Any]] = None) -> "ScoredDocument":
+        """同一 chunk 的新分数记录（共享存储行或 Document，不复制）"""
+        record = ScoredDocument.__new__(ScoredDocument)
+        record.chunk_id = self.chunk_id
+        record.score = score
+        record.source = source
+        record.metadata = metadata if metadata is not None else {}
+        record._document = self._document
+        record._store = self._store
+        record._row = self._row
+        return record
+    
+    @property
+    def document(self) -> Document:
+        if self._document is None:
+            self._document = self._store.document(self._row)
+        return self._document
     
     @property
     def page_content(self) -> str:
-        return self.document.page_content
+        if self._document is None:
+            return self._store.text(self._row)
+        return self._document.page_content
     
     @property
     def doc_metadata(self) -> Dict[str, Any]:
         return self.document.metadata
+    
+    def __repr__(self) -> str:
+        return f"ScoredDocument(chunk_id={self.chunk_id!r}, score={self.score!r}, source={self.source!r})"
 
 
 @dataclass
@@ -228,20 +299,29 @@ class QueryExpansionStage(RetrievalStage):
 
 
 class HybridRetrievalStage(RetrievalStage):
-    """混合检索阶段 (Embedding + BM25)"""
+    """
+    混合检索阶段 (Embedding + BM25)
+    
+    BM25 索引与向量检索共用一个 ChunkStore：向量检索只向 Chroma 取 chunk ID 与距离，
+    文本与元数据从 ChunkStore 读取；ChunkStore 重建前新写入的 chunk 再向 Chroma 补取。
+    """
     
     def __init__(self, vector_store: Any = None):
         from config import HYBRID_TOP_K_PER_QUERY
         from concurrent.futures import ThreadPoolExecutor
+        from managers.cpu_budget import cpu_budget
         
         self._vector_store = vector_store
         self._bm25_retriever = None
+        self._chunk_store: Optional[ChunkStore] = None
         self._documents_hash = None
+        self._generation = None
         
         self.top_k_per_query = HYBRID_TOP_K_PER_QUERY
         
-        self._query_executor = ThreadPoolExecutor(max_workers=8)
-        self._retrieval_executor = ThreadPoolExecutor(max_workers=4)
+        # 线程池大小由 CPU 预算统一确定，避免与 torch 线程池叠加造成超额订阅
+        self._query_executor = ThreadPoolExecutor(max_workers=cpu_budget.executor_workers(8, "query"))
+        self._retrieval_executor = ThreadPoolExecutor(max_workers=cpu_budget.executor_workers(4, "retrieval"))
     
     @property
     def name(self) -> str:
@@ -250,8 +330,29 @@ class HybridRetrievalStage(RetrievalStage):
     def is_enabled(self) -> bool:
         return True  # 检索阶段始终启用
     
-    def set_vector_store(self, vector_store: Any):
+    def set_vector_store(self, vector_store: Any, generation: Optional[int] = None, bm25_retriever: Any = None):
+        """
+        设置向量存储
+        
+        Args:
+            vector_store: 向量存储实例
+            generation: 知识库版本号；与上次相同时跳过 BM25 索引检查，
+                        不同时强制重建（增量更新不一定改变前 100 个 chunks）
+            bm25_retriever: 已构建的 BM25 索引（如从知识库快照恢复），提供时直接使用，不再重建
+        """
+        if bm25_retriever is not None:
+            self._vector_store = vector_store
+            self._generation = generation
+            self._documents_hash = None
+            self._bm25_retriever = bm25_retriever
+            self._chunk_store = bm25_retriever.chunk_store
+            return
+        if generation is not None and generation == self._generation and vector_store is self._vector_store:
+            return
         self._vector_store = vector_store
+        if generation is not None:
+            self._documents_hash = None
+        self._generation = generation
         self._rebuild_bm25_index()
     
     def execute(self, context: RetrievalContext) -> RetrievalContext:
@@ -312,12 +413,36 @@ class HybridRetrievalStage(RetrievalStage):
     def _embedding_retrieve(self, query: str) -> List[ScoredDocument]:
         if self._vector_store is None:
             return []
+        store = self._chunk_store
         try:
-            results = self._vector_store.similarity_search_with_score(query, k=self.top_k_per_query)
-            return [
-                ScoredDocument(document=doc, score=1/(1+score), source="embedding")
-                for doc, score in results
-            ]
+            if store is None:
+                results = self._vector_store.similarity_search_with_score(query, k=self.top_k_per_query)
+                return [
+                    ScoredDocument(document=doc, score=1/(1+score), source="embedding")
+                    for doc, score in results
+                ]
+            
+            # 只取 ID 与距离，文本与元数据从 ChunkStore 读取
+            collection = self._vector_store._collection
+            query_embedding = self._vector_store.embeddings.embed_query(query)
+            results = collection.query(query_embeddings=[query_embedding], n_results=self.top_k_per_query, include=["distances"])
+            hits = list(zip(results["ids"][0], results["distances"][0]))
+            
+            missing = [chunk_id for chunk_id, _ in hits if chunk_id not in store]
+            fetched = {}
+            if missing:
+                page = collection.get(ids=missing, include=["documents", "metadatas"])
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    fetched[chunk_id] = Document(page_content=text, metadata=metadata or {})
+            
+            scored = []
+            for chunk_id, distance in hits:
+                row = store.row(chunk_id)
+                if row is not None:
+                    scored.append(ScoredDocument.from_store(store, row, 1/(1+distance), "embedding"))
+                elif chunk_id in fetched:
+                    scored.append(ScoredDocument(document=fetched[chunk_id], score=1/(1+distance), source="embedding", chunk_id=chunk_id))
+            return scored
         except Exception as e:
             logger.error(f"Embedding retrieval failed: {e}")
             return []
@@ -328,10 +453,11 @@ class HybridRetrievalStage(RetrievalStage):
         if self._bm25_retriever is None:
             return []
         
-        # BM25Retriever 返回 Dict 列表，需要转换为 ScoredDocument
-        results = self._bm25_retriever.retrieve(query, self.top_k_per_query)
+        # BM25Retriever 返回 ChunkStore 行号与分数，转换为 ScoredDocument（不构造 Document）
+        retriever = self._bm25_retriever
+        results = retriever.retrieve(query, self.top_k_per_query)
         return [
-            ScoredDocument(document=r["document"], score=r["score"], source="bm25")
+            ScoredDocument.from_store(retriever.chunk_store, r["row"], r["score"], "bm25")
             for r in results
         ]
     
@@ -343,22 +469,18 @@ class HybridRetrievalStage(RetrievalStage):
             from .bm25 import BM25Retriever
             
             collection = self._vector_store._collection
-            results = collection.get(include=["documents", "metadatas"])
-            
-            if not results or not results.get("documents"):
+            ids = collection.get(include=[])["ids"]
+            if not ids:
                 return
             
-            documents = []
-            for i, doc_content in enumerate(results["documents"]):
-                metadata = results["metadatas"][i] if results.get("metadatas") else {}
-                documents.append(Document(page_content=doc_content, metadata=metadata))
-            
-            new_hash = hash(tuple(d.page_content[:100] for d in documents[:100]))
+            new_hash = hash(tuple(ids))
             if new_hash == self._documents_hash:
                 return
             
+            store = ChunkStore.from_collection(collection, ids)
             self._documents_hash = new_hash
-            self._bm25_retriever = BM25Retriever(documents)
+            self._bm25_retriever = BM25Retriever(store)
+            self._chunk_store = store
             
         except Exception as e:
             logger.error(f"Failed to rebuild BM25 index: {e}")
@@ -400,29 +522,22 @@ class RRFFusionStage(RetrievalStage):
                     key = f"{query[:30]}_{strategy}"
                     flattened[key] = docs
             
-            # RRF 计算
+            # RRF 计算（按 chunk ID 合并各列表中的同一 chunk）
             doc_scores = defaultdict(lambda: {"score": 0.0, "doc": None, "sources": []})
             
             for source_name, doc_list in flattened.items():
                 for rank, scored_doc in enumerate(doc_list, start=1):
-                    doc_key = (scored_doc.page_content[:400], scored_doc.doc_metadata.get('source', ''))
-                    rrf_score = 1.0 / (self.k + rank)
-                    
-                    doc_scores[doc_key]["score"] += rrf_score
-                    doc_scores[doc_key]["sources"].append(source_name)
-                    if doc_scores[doc_key]["doc"] is None:
-                        doc_scores[doc_key]["doc"] = scored_doc.document
+                    entry = doc_scores[scored_doc.chunk_id]
+                    entry["score"] += 1.0 / (self.k + rank)
+                    entry["sources"].append(source_name)
+                    if entry["doc"] is None:
+                        entry["doc"] = scored_doc
             
             # 排序
             sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1]["score"], reverse=True)
             
             return [
-                ScoredDocument(
-                    document=doc_info["doc"],
-                    score=doc_info["score"],
-                    source="rrf_fusion",
-                    metadata={"original_sources": doc_info["sources"]}
-                )
+                doc_info["doc"].rescored(doc_info["score"], "rrf_fusion", {"original_sources": doc_info["sources"]})
                 for _, doc_info in sorted_docs[:self.top_k]
             ]
         
@@ -496,12 +611,7 @@ class RerankingStage(RetrievalStage):
                 scores = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
                 
                 scored_docs = [
-                    ScoredDocument(
-                        document=doc.document,
-                        score=float(score),
-                        source="reranker",
-                        metadata={**doc.metadata, "original_score": doc.score}
-                    )
+                    doc.rescored(float(score), "reranker", {**doc.metadata, "original_score": doc.score})
                     for doc, score in zip(documents, scores)
                 ]
                 scored_docs.sort(key=lambda x: x.score, reverse=True)
@@ -709,9 +819,10 @@ class MMRStage(RetrievalStage):
             
             should_apply = self.mode == "always"
             avg_sim = 0.0
+            embeddings: Dict[str, Any] = {}  # {chunk_id: 嵌入}，自动判断与 MMR 共用
             
             if self.mode == "auto":
-                avg_sim = self._compute_avg_similarity(documents, embedding_fn)
+                avg_sim = self._compute_avg_similarity(documents, embedding_fn, embeddings)
                 should_apply = avg_sim > self.similarity_threshold
                 logger.info(f"[MMR] Auto-check: avg_similarity={avg_sim:.4f}, threshold={self.similarity_threshold}")
                 if should_apply:
@@ -720,7 +831,7 @@ class MMRStage(RetrievalStage):
                     logger.info(f"[MMR] → Similarity {avg_sim:.4f} ≤ {self.similarity_threshold}, skipping MMR")
             
             if should_apply:
-                return self._apply_mmr(documents, embedding_fn)
+                return self._apply_mmr(documents, embedding_fn, embeddings)
             else:
                 return documents[:self.final_k]
         
@@ -748,12 +859,21 @@ class MMRStage(RetrievalStage):
             logger.warning("Embedding function not set, MMR will use simple truncation")
         return self._embedding_function
     
-    def _compute_avg_similarity(self, documents, embedding_fn) -> float:
+    @staticmethod
+    def _embed(documents, embedding_fn, cache: Dict[str, Any]) -> List[Any]:
+        """按 chunk ID 查找嵌入，同一次执行中每个 chunk 只嵌入一次"""
+        import numpy as np
+        for doc in documents:
+            if doc.chunk_id not in cache:
+                cache[doc.chunk_id] = np.array(embedding_fn(doc.page_content))
+        return [cache[doc.chunk_id] for doc in documents]
+    
+    def _compute_avg_similarity(self, documents, embedding_fn, cache: Optional[Dict[str, Any]] = None) -> float:
         import numpy as np
         if len(documents) < 2:
             return 0.0
         try:
-            embeddings = [np.array(embedding_fn(doc.page_content)) for doc in documents[:10]]
+            embeddings = self._embed(documents[:10], embedding_fn, {} if cache is None else cache)
             similarities = []
             for i in range(len(embeddings)):
                 for j in range(i + 1, len(embeddings)):
@@ -765,14 +885,14 @@ class MMRStage(RetrievalStage):
         except:
             return 0.0
     
-    def _apply_mmr(self, documents, embedding_fn) -> List[ScoredDocument]:
+    def _apply_mmr(self, documents, embedding_fn, cache: Optional[Dict[str, Any]] = None) -> List[ScoredDocument]:
         import numpy as np
         
         if len(documents) <= self.final_k:
             return documents
         
         try:
-            doc_embeddings = [np.array(embedding_fn(doc.page_content)) for doc in documents]
+            doc_embeddings = self._embed(documents, embedding_fn, {} if cache is None else cache)
             
             selected = [0]
             remaining = list(range(1, len(documents)))
@@ -800,12 +920,7 @@ class MMRStage(RetrievalStage):
                     break
             
             return [
-                ScoredDocument(
-                    document=documents[i].document,
-                    score=documents[i].score,
-                    source="mmr",
-                    metadata={**documents[i].metadata, "mmr_selected": True}
-                )
+                documents[i].rescored(documents[i].score, "mmr", {**documents[i].metadata, "mmr_selected": True})
                 for i in selected
             ]
         except Exception as e:
@@ -0,0 +1,315 @@
+"""
+Snapshot Service
+知识库快照服务实现 - 导出 / 导入 / 启动时恢复
+"""
+import os
+import re
+import time
+import uuid
+import logging
+from typing import Any, BinaryIO, Dict, Optional
+
+from interfaces.services import SnapshotServiceInterface
+from interfaces.vector_store import VectorStoreInterface
+from managers.job_manager import Job, JobManager
+from managers.document_store import DocumentStore
+from managers.dedup import parse_aliases
+from managers.chunk_store import ChunkStore
+from managers.snapshot import (
+    KnowledgeBaseSnapshot, SnapshotError, SnapshotWriter, SNAPSHOT_EXTENSION, read_manifest
+)
+from services.retrieval.bm25 import BM25Retriever
+from config import SNAPSHOT_DIR, SNAPSHOT_RESTORE_PATH, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_STRATEGY
+
+logger = logging.getLogger(__name__)
+
+# 快照任务的进度阶段：(阶段名, 计数单位)
+SNAPSHOT_EXPORT_PHASES = [
+    ("export", "chunks"),
+    ("bm25", "chunks"),
+]
+SNAPSHOT_IMPORT_PHASES = [
+    ("verify", "files"),
+    ("insert", "chunks"),
+    ("bm25", "chunks"),
+]
+
+_SNAPSHOT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotService(SnapshotServiceInterface):
+    """知识库快照服务实现 - 快照文件保存在 SNAPSHOT_DIR 中"""
+    
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreInterface,
+        job_manager: JobManager,
+        retrieval_orchestrator: Any = None,
+        document_store: Optional[DocumentStore] = None,
+        snapshot_dir: str = SNAPSHOT_DIR
+    ):
+        """
+        初始化快照服务
+        
+        Args:
+            vector_store_manager: 向量存储管理器
+            job_manager: 后台任务管理器（导出 / 导入在后台执行）
+            retrieval_orchestrator: 检索编排器（可选）；提供时导入后直接装载快照中的 BM25 索引
+            document_store: 文档存储（可选）；提供时源文档清单包含内容哈希与大小
+            snapshot_dir: 快照目录
+        """
+        self.vector_store_manager = vector_store_manager
+        self.job_manager = job_manager
+        self.retrieval_orchestrator = retrieval_orchestrator
+        self.document_store = document_store
+        self.snapshot_dir = snapshot_dir
+        os.makedirs(snapshot_dir, exist_ok=True)
+        
+        logger.info(f"SnapshotService initialized ({snapshot_dir})")
+    
+    # =========================================================================
+    # 查询
+    # =========================================================================
+    
+    def list_snapshots(self) -> Dict[str, Any]:
+        """列出快照目录中的快照（只读取清单，新的在前）"""
+        snapshots = []
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(SNAPSHOT_EXTENSION):
+                continue
+            path = os.path.join(self.snapshot_dir, name)
+            try:
+                manifest = read_manifest(path)
+            except SnapshotError as e:
+                logger.warning(f"Skipping invalid snapshot '{name}': {e}")
+                continue
+            snapshots.append({
+                "name": name,
+                "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+                "version": manifest.get("version"),
+                "created_at": manifest.get("created_at"),
+                "embedding_model": manifest.get("embedding_model"),
+                "chunks": manifest.get("chunks"),
+                "documents": len(manifest.get("files", {})),
+            })
+        snapshots.sort(key=lambda snapshot: snapshot["created_at"] or 0, reverse=True)
+        return {"status": "success", "snapshots": snapshots}
+    
+    def get_snapshot_path(self, name: str) -> Optional[str]:
+        """获取快照文件路径（名称无效或不存在时返回 None）"""
+        try:
+            path = self._snapshot_path(name)
+        except ValueError:
+            return None
+        return path if os.path.isfile(path) else None
+    
+    def delete_snapshot(self, name: str) -> Dict[str, Any]:
+        """删除快照文件"""
+        path = self.get_snapshot_path(name)
+        if path is None:
+            return {"status": "error", "message": f"Snapshot '{name}' not found"}
+        os.remove(path)
+        logger.info(f"Snapshot deleted: {name}")
+        return {"status": "success", "message": f"Snapshot '{name}' deleted"}
+    
+    # =========================================================================
+    # 导出
+    # =========================================================================
+    
+    def export_snapshot(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """提交后台导出任务，立即返回任务 ID
+        
+        Args:
+            name: 快照名（默认按时间生成）；已存在时覆盖
+        """
+        try:
+            path = self._snapshot_path(name or time.strftime("kb-%Y%m%d-%H%M%S"))
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        
+        job = self.job_manager.submit("snapshot_export", lambda job: self._export(job, path), phases=SNAPSHOT_EXPORT_PHASES)
+        return {
+            "status": "accepted",
+            "message": "Knowledge base snapshot export started",
+            "job_id": job.id,
+            "job": job.to_dict()
+        }
+    
+    def _export(self, job: Job, path: str) -> Dict[str, Any]:
+        """导出任务：写入 chunks 与向量，构建 BM25 索引统计与源文档清单，最后打包"""
+        progress = job.progress
+        with SnapshotWriter(path) as writer:
+            result = self.vector_store_manager.export_snapshot(writer, progress)
+            if result.get("status") != "success":
+                return result
+            
+            file_chunks: Dict[str, int] = {}
+            for metadata in writer.metadatas:
+                filename = metadata.get("filename", "unknown")
+                file_chunks[filename] = file_chunks.get(filename, 0) + 1
+                # 全部 chunk 都作为近重复别名合并到其他文件的文档也要登记
+                for alias in parse_aliases(metadata):
+                    file_chunks.setdefault(alias["filename"], 0)
+            
+            # 按快照中的行顺序构建 BM25 索引（文本直接读取写入器的临时文件），恢复时与 chunk 顺序一一对应
+            chunk_store = ChunkStore.from_snapshot(writer)
+            progress.set_total("bm25", len(chunk_store))
+            progress.start("bm25")
+            writer.set_bm25(BM25Retriever(chunk_store).to_state())
+            progress.advance("bm25", len(chunk_store))
+            progress.finish("bm25")
+            del chunk_store
+            
+            files = {}
+            for filename, chunks in sorted(file_chunks.items()):
+                entry = self.document_store.get(filename) if self.document_store is not None else None
+                files[filename] = {
+                    "chunks": chunks,
+                    "sha256": entry["sha256"] if entry else None,
+                    "size": entry["size"] if entry else None,
+                }
+            
+            progress.check_cancelled()
+            manifest = writer.commit({
+                "embedding_model": result["embedding_model"],
+                "generation": result["generation"],
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+                "chunking_strategy": CHUNKING_STRATEGY,
+                "files": files,
+            })
+        
+        return {
+            "status": "success",
+            "message": f"Exported {manifest['chunks']} chunks from {len(files)} documents",
+            "snapshot": {
+                "name": os.path.basename(path),
+                "chunks": manifest["chunks"],
+                "documents": len(files),
+                "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+            }
+        }
+    
+    # =========================================================================
+    # 导入
+    # =========================================================================
+    
+    def upload_snapshot(self, name: str, stream: BinaryIO) -> Dict[str, Any]:
+        """按块将上传的快照写入快照目录（先写临时文件再 rename）；校验在导入时进行"""
+        try:
+            path = self._snapshot_path(name)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        
+        tmp_path = os.path.join(self.snapshot_dir, f".upload-{uuid.uuid4().hex}")
+        try:
+            size = 0
+            with open(tmp_path, "wb") as f:
+                while True:
+                    block = stream.read(_READ_CHUNK_SIZE)
+                    if not block:
+                        break
+                    f.write(block)
+                    size += len(block)
+            if size == 0:
+                return {"status": "error", "message": "Snapshot upload is empty"}
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        logger.info(f"Snapshot uploaded: {os.path.basename(path)} ({size} bytes)")
+        return {"status": "success", "name": os.path.basename(path), "size": size}
+    
+    def import_snapshot(self, name: str) -> Dict[str, Any]:
+        """提交后台导入任务（校验后写入新集合并原子切换），立即返回任务 ID"""
+        path = self.get_snapshot_path(name)
+        if path is None:
+            return {"status": "error", "message": f"Snapshot '{name}' not found"}
+        return self._submit_import(path)
+    
+    def restore_on_startup(self) -> Optional[Job]:
+        """SNAPSHOT_RESTORE_PATH 已配置且知识库为空时，在后台从快照恢复（新副本启动）"""
+        if not SNAPSHOT_RESTORE_PATH:
+            return None
+        if not os.path.isfile(SNAPSHOT_RESTORE_PATH):
+            logger.warning(f"Startup snapshot not found: {SNAPSHOT_RESTORE_PATH}")
+            return None
+        logger.info(f"Restoring knowledge base from startup snapshot: {SNAPSHOT_RESTORE_PATH}")
+        return self.job_manager.submit(
+            "snapshot_import", lambda job: self._import(job, SNAPSHOT_RESTORE_PATH, only_if_empty=True), phases=SNAPSHOT_IMPORT_PHASES
+        )
+    
+    def _submit_import(self, path: str) -> Dict[str, Any]:
+        job = self.job_manager.submit("snapshot_import", lambda job: self._import(job, path), phases=SNAPSHOT_IMPORT_PHASES)
+        return {
+            "status": "accepted",
+            "message": "Knowledge base snapshot import started",
+            "job_id": job.id,
+            "job": job.to_dict()
+        }
+    
+    def _import(self, job: Job, path: str, only_if_empty: bool = False) -> Dict[str, Any]:
+        """导入任务：校验快照，写入向量（不重新嵌入），切换后装载快照中的 BM25 索引"""
+        progress = job.progress
+        if only_if_empty:
+            # 已有持久化数据时以其为准，快照只用于空副本
+            self.vector_store_manager.load_persistent_store()
+            if self.vector_store_manager.is_available():
+                logger.info("Knowledge base already loaded, skipping startup snapshot restore")
+                return {"status": "success", "message": "Knowledge base already loaded, snapshot restore skipped"}
+        
+        progress.set_total("verify", 1)
+        progress.start("verify")
+        try:
+            snapshot = KnowledgeBaseSnapshot(path)
+        except SnapshotError as e:
+            logger.error(f"Invalid snapshot {path}: {e}")
+            return {"status": "error", "message": str(e)}
+        progress.advance("verify")
+        progress.finish("verify")
+        
+        result = self.vector_store_manager.import_snapshot(snapshot, progress)
+        if result.get("status") != "success":
+            return result
+        
+        self._restore_bm25_index(snapshot, progress)
+        return {
+            "status": "success",
+            "message": f"Restored {result['chunks']} chunks from {result['documents']} documents",
+            "snapshot": snapshot.get_info()
+        }
+    
+    def _restore_bm25_index(self, snapshot: KnowledgeBaseSnapshot, progress: Any):
+        """装载快照中的 BM25 索引统计；恢复期间有增量变更（知识库与快照不一致）时改为重建"""
+        if self.retrieval_orchestrator is None:
+            return
+        store = self.vector_store_manager.get_store()
+        generation = self.vector_store_manager.get_generation()
+        progress.set_total("bm25", len(snapshot))
+        progress.start("bm25")
+        try:
+            retriever = None
+            state = snapshot.bm25_state()
+            total_chunks = self.vector_store_manager.get_vectorized_documents().get("total_chunks")
+            if state is not None and total_chunks == len(snapshot):
+                # 检索直接引用快照中的文本缓冲（mmap），不逐个构造 Document
+                retriever = BM25Retriever.from_state(ChunkStore.from_snapshot(snapshot), state)
+            self.retrieval_orchestrator.set_vector_store(store, generation, retriever)
+            progress.advance("bm25", len(snapshot))
+        except Exception as e:
+            logger.warning(f"Failed to restore BM25 index from snapshot: {e}")
+        progress.finish("bm25")
+    
+    # =========================================================================
+    # 辅助
+    # =========================================================================
+    
+    def _snapshot_path(self, name: str) -> str:
+        """快照名 → 快照目录中的路径（只允许文件名，不允许路径分隔符）"""
+        if not name or not _SNAPSHOT_NAME.match(name):
+            raise ValueError(f"Invalid snapshot name: '{name}'")
+        if not name.endswith(SNAPSHOT_EXTENSION):
+            name += SNAPSHOT_EXTENSION
+        return os.path.join(self.snapshot_dir, name)
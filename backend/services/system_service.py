@@ -2,11 +2,14 @@
 System Service
 系统服务实现
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
 from interfaces.services import SystemServiceInterface
 from interfaces.vector_store import VectorStoreInterface, LLMInterface
+from managers.inference_pool import get_inference_pool_stats
+from managers.model_registry import model_registry
+from managers.cpu_budget import cpu_budget
 from config import (
     LLM_LOCAL_MODEL,
     EMBEDDING_MODEL,
@@ -22,16 +25,23 @@ logger = logging.getLogger(__name__)
 class SystemService(SystemServiceInterface):
     """系统服务实现"""
     
-    def __init__(self, vector_store_manager: VectorStoreInterface, llm_manager: LLMInterface):
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreInterface,
+        llm_manager: LLMInterface,
+        warmup_manager: Optional[Any] = None
+    ):
         """
         初始化系统服务
         
         Args:
             vector_store_manager: 向量存储管理器
             llm_manager: LLM管理器
+            warmup_manager: 预热管理器（可选，用于就绪检查）
         """
         self.vector_store_manager = vector_store_manager
         self.llm_manager = llm_manager
+        self.warmup_manager = warmup_manager
         logger.info("SystemService initialized")
     
     def get_system_info(self) -> Dict[str, Any]:
@@ -73,9 +83,14 @@ class SystemService(SystemServiceInterface):
                     },
                     "embedding": {
                         "available": vector_store_available,  # 嵌入模型与向量存储相关
-                        "model_name": EMBEDDING_MODEL
-                    }
+                        "model_name": EMBEDDING_MODEL,
+                        "cache": self.vector_store_manager.get_embedding_cache_stats()
+                    },
+                    "inference_pool": get_inference_pool_stats()
                 },
+                "models": model_registry.get_stats(),
+                "model_memory": model_registry.get_memory_stats(),
+                "cpu_budget": cpu_budget.get_settings(),
                 "version": "1.0.0"
             }
             
@@ -93,6 +108,48 @@ class SystemService(SystemServiceInterface):
                 "threads": 0
             }
     
+    def get_readiness(self) -> Dict[str, Any]:
+        """获取各组件就绪状态（用于 /api/ready）"""
+        if self.warmup_manager is None:
+            return {"ready": True, "components": {}}
+        return self.warmup_manager.get_status()
+    
+    def get_model_stats(self) -> Dict[str, Any]:
+        """获取已注册模型的加载状态、耗时与内存"""
+        return {"status": "success", "models": model_registry.get_stats()}
+    
+    def refresh_model(self, name: str, background: bool = True) -> Dict[str, Any]:
+        """
+        刷新指定模型（默认后台刷新，刷新期间继续使用旧实例）
+        
+        失败时返回的 reason：unknown_model（未注册）、pinned（固定的模型，如嵌入模型，被向量存储持有，
+        刷新不会生效，需重启服务）、refresh_failed（同步刷新加载失败）
+        """
+        stats = model_registry.get_stats().get(name)
+        if stats is None:
+            return {"status": "error", "reason": "unknown_model", "message": f"Model '{name}' not found"}
+        if stats.get("pinned"):
+            return {
+                "status": "error",
+                "reason": "pinned",
+                "message": f"Model '{name}' is pinned by long-lived components and cannot be refreshed; restart the service to reload it",
+                "model": stats
+            }
+        
+        if not model_registry.refresh(name, background=background):
+            stats = model_registry.get_stats().get(name) or {}
+            return {
+                "status": "error",
+                "reason": "refresh_failed",
+                "message": f"Model '{name}' refresh failed: {stats.get('last_error')}",
+                "model": stats
+            }
+        return {
+            "status": "success",
+            "message": f"Model '{name}' refresh {'started' if background else 'completed'}",
+            "model": model_registry.get_stats().get(name)
+        }
+    
     def is_initialized(self) -> bool:
         """检查系统是否已初始化"""
         try:
@@ -0,0 +1,140 @@
+"""
+Knowledge Base Snapshot CLI
+知识库快照命令行工具
+
+Usage:
+    python snapshot_cli.py list
+    python snapshot_cli.py export [--name NAME] [-o kb.kbsnap]    # 导出并（可选）下载到本地
+    python snapshot_cli.py import kb.kbsnap                       # 上传并导入到运行中的服务
+    python snapshot_cli.py verify kb.kbsnap                       # 离线校验版本与校验和
+
+服务地址默认 http://localhost:8000，可用 --url 或环境变量 BACKEND_URL 指定。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import urllib.parse
+import urllib.request
+import urllib.error
+from typing import Any, Dict
+
+_POLL_INTERVAL_S = 1.0
+
+
+def _request(method: str, url: str, body: Any = None, headers: Dict[str, str] = None) -> Dict[str, Any]:
+    request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e).get("message", e.reason)
+        except ValueError:
+            message = e.reason
+        raise SystemExit(f"HTTP {e.code}: {message}")
+
+
+def _wait_for_job(base_url: str, job_id: str) -> Dict[str, Any]:
+    """轮询任务直到结束，打印进行中的阶段"""
+    while True:
+        job = _request("GET", f"{base_url}/api/jobs/{job_id}")["job"]
+        if job["state"] not in ("queued", "running"):
+            print()
+            return job
+        running = [
+            f"{name} {phase['count']}/{phase['total'] or '?'}"
+            for name, phase in job["progress"].items() if phase["state"] == "running"
+        ]
+        print(f"\r  {job['state']}: {', '.join(running) or '...'}".ljust(60), end="", flush=True)
+        time.sleep(_POLL_INTERVAL_S)
+
+
+def _finish(job: Dict[str, Any]) -> int:
+    if job["state"] != "succeeded":
+        print(f"Job {job['state']}: {job.get('error') or (job.get('result') or {}).get('message')}")
+        return 1
+    print(f"{job['result']['message']} ({job['elapsed_s']:.1f}s)")
+    return 0
+
+
+def cmd_list(args) -> int:
+    for snapshot in _request("GET", f"{args.url}/api/snapshots")["snapshots"]:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["created_at"] or 0))
+        print(f"{snapshot['name']:<40} {created}  {snapshot['chunks']:>8} chunks  {snapshot['documents']:>5} docs  {snapshot['size_mb']:>8.1f} MB")
+    return 0
+
+
+def cmd_export(args) -> int:
+    body = json.dumps({"name": args.name} if args.name else {}).encode("utf-8")
+    result = _request("POST", f"{args.url}/api/snapshots/export", body, {"Content-Type": "application/json"})
+    print(f"Export job {result['job_id']} started")
+    job = _wait_for_job(args.url, result["job_id"])
+    status = _finish(job)
+    if status != 0 or not args.output:
+        return status
+    
+    name = job["result"]["snapshot"]["name"]
+    with urllib.request.urlopen(f"{args.url}/api/snapshots/{urllib.parse.quote(name)}") as response, open(args.output, "wb") as f:
+        shutil.copyfileobj(response, f, 1024 * 1024)
+    print(f"Downloaded {name} → {args.output}")
+    return 0
+
+
+def cmd_import(args) -> int:
+    name = args.name or os.path.basename(args.file)
+    size = os.path.getsize(args.file)
+    with open(args.file, "rb") as f:
+        # 以原始请求体流式上传（urllib 按块发送文件对象）
+        result = _request(
+            "POST",
+            f"{args.url}/api/snapshots/import?name={urllib.parse.quote(name)}",
+            f,
+            {"Content-Type": "application/octet-stream", "Content-Length": str(size)},
+        )
+    print(f"Import job {result['job_id']} started")
+    return _finish(_wait_for_job(args.url, result["job_id"]))
+
+
+def cmd_verify(args) -> int:
+    from managers.snapshot import KnowledgeBaseSnapshot, SnapshotError
+    
+    try:
+        snapshot = KnowledgeBaseSnapshot(args.file)
+    except SnapshotError as e:
+        print(f"Invalid snapshot: {e}")
+        return 1
+    print(json.dumps(snapshot.get_info(), ensure_ascii=False, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Knowledge base snapshot export / import")
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://localhost:8000"), help="backend URL")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("list", help="list snapshots on the server").set_defaults(func=cmd_list)
+    
+    export_parser = commands.add_parser("export", help="export the knowledge base to a snapshot")
+    export_parser.add_argument("--name", help="snapshot name (default: timestamp)")
+    export_parser.add_argument("-o", "--output", help="download the snapshot to this file")
+    export_parser.set_defaults(func=cmd_export)
+    
+    import_parser = commands.add_parser("import", help="upload a snapshot and restore the knowledge base from it")
+    import_parser.add_argument("file", help="snapshot file")
+    import_parser.add_argument("--name", help="name to store the snapshot under (default: file name)")
+    import_parser.set_defaults(func=cmd_import)
+    
+    verify_parser = commands.add_parser("verify", help="verify a local snapshot file (offline)")
+    verify_parser.add_argument("file", help="snapshot file")
+    verify_parser.set_defaults(func=cmd_verify)
+    
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
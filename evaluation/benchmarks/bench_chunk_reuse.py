@@ -0,0 +1,143 @@
+"""
+Chunk Reuse Benchmark
+对比切分策略在文档编辑后的 chunk 复用率
+
+对每个文档随机施加若干处编辑（插入 / 删除 / 改写一句，默认包含一处开头附近的插入），
+分别用 recursive（RecursiveCharacterTextSplitter）与 content_defined 切分编辑前后的文本，
+复用率 = 编辑后的 chunk 中文本与编辑前某个 chunk 完全相同的比例（即重新入库时命中嵌入缓存、无需重新嵌入的比例）。
+同时输出 chunk 数、平均 / P10 / P90 / 最大长度与切分耗时。
+content_defined 的 chunk 长度（含重叠）超过 CDC_MAX_CHUNK_SIZE + CHUNK_OVERLAP 时报错退出。
+
+没有现成语料时用 --synthetic 生成中英文混合语料（--paragraph-sentences 控制段落长度）。
+
+Usage:
+    python evaluation/benchmarks/bench_chunk_reuse.py --docs /path/to/corpus
+    python evaluation/benchmarks/bench_chunk_reuse.py --synthetic 200 --edits 3
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+WORDS_EN = "retrieval augmented generation vector index chunk embedding rerank fusion query document model score".split()
+WORDS_ZH = "检索 增强 生成 向量 索引 文档 嵌入 重排 融合 知识库 查询 模型 分数 切分".split()
+
+
+def synthetic_corpus(n_docs: int, seed: int, max_sentences: int) -> dict:
+    rng = random.Random(seed)
+    corpus = {}
+    for d in range(n_docs):
+        paragraphs = []
+        for _ in range(rng.randint(5, 20)):
+            sentences = []
+            for _ in range(rng.randint(2, max_sentences)):
+                if rng.random() < 0.5:
+                    sentences.append(" ".join(rng.choices(WORDS_EN, k=rng.randint(6, 25))).capitalize() + ".")
+                else:
+                    sentences.append("".join(rng.choices(WORDS_ZH, k=rng.randint(5, 20))) + "。")
+            paragraphs.append(" ".join(sentences))
+        corpus[f"doc{d}.txt"] = "\n\n".join(paragraphs)
+    return corpus
+
+
+def load_corpus(docs_dir: str) -> dict:
+    from managers.document_parser import DocumentParser, SUPPORTED_EXTENSIONS
+    
+    sources = {
+        path.name: str(path) for path in sorted(Path(docs_dir).rglob("*"))
+        if path.is_file() and path.name.lower().endswith(SUPPORTED_EXTENSIONS)
+    }
+    doc_parser = DocumentParser()
+    documents, _ = doc_parser.parse_all(sources)
+    doc_parser.shutdown()
+    corpus = {}
+    for document in documents:
+        filename = document.metadata.get("filename") or Path(document.metadata.get("source", "unknown")).name
+        corpus[filename] = corpus.get(filename, "") + document.page_content + "\n\n"
+    return corpus
+
+
+def edit_text(text: str, n_edits: int, rng: random.Random, edit_start: bool) -> str:
+    """在随机句子处插入 / 删除 / 改写；edit_start 时第一处编辑为开头附近插入一句"""
+    sentences = text.split("。")
+    for i in range(n_edits):
+        position = rng.randrange(min(3, len(sentences))) if edit_start and i == 0 else rng.randrange(len(sentences))
+        kind = "insert" if edit_start and i == 0 else rng.choice(["insert", "delete", "replace"])
+        new_sentence = "".join(rng.choices(WORDS_ZH, k=rng.randint(5, 15)))
+        if kind == "insert":
+            sentences.insert(position, new_sentence)
+        elif kind == "delete" and len(sentences) > 1:
+            del sentences[position]
+        else:
+            sentences[position] = new_sentence
+    return "。".join(sentences)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk reuse after document edits")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--docs", help="文档目录")
+    source.add_argument("--synthetic", type=int, help="生成的文档数")
+    parser.add_argument("--paragraph-sentences", type=int, default=30, help="生成语料每段的最大句数（长段落时固定长度切分的边界随编辑整体偏移）")
+    parser.add_argument("--edits", type=int, default=3, help="每个文档的编辑处数")
+    parser.add_argument("--no-edit-start", action="store_true", help="不强制在开头附近编辑")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    from managers.chunking import create_text_splitter
+    
+    corpus = synthetic_corpus(args.synthetic, args.seed, args.paragraph_sentences) if args.synthetic else load_corpus(args.docs)
+    if not corpus:
+        print(f"❌ No supported documents found in {args.docs}")
+        return
+    rng = random.Random(args.seed)
+    edited = {filename: edit_text(text, args.edits, rng, not args.no_edit_start) for filename, text in corpus.items()}
+    total_mb = sum(len(text.encode("utf-8")) for text in corpus.values()) / (1024 * 1024)
+    print(f"📚 {len(corpus)} documents, {total_mb:.1f} MB, {args.edits} edits per document")
+    
+    print(f"\n{'strategy':<16} {'chunks':>8} {'avg_len':>8} {'p10':>6} {'p90':>6} {'max':>6} {'split_s':>8} {'reused':>8}")
+    oversized = 0
+    for strategy in ("recursive", "content_defined"):
+        try:
+            splitter = create_text_splitter(strategy)
+        except ImportError as e:
+            print(f"{strategy:<16} skipped ({e})")
+            continue
+        
+        start = time.perf_counter()
+        before = {filename: splitter.split_text(text) for filename, text in corpus.items()}
+        elapsed = time.perf_counter() - start
+        after = {filename: splitter.split_text(text) for filename, text in edited.items()}
+        
+        lengths = [len(chunk) for chunks in before.values() for chunk in chunks]
+        total_after = sum(len(chunks) for chunks in after.values())
+        reused = 0
+        for filename, chunks in after.items():
+            previous = set(before[filename])
+            reused += sum(1 for chunk in chunks if chunk in previous)
+        print(
+            f"{strategy:<16} {len(lengths):>8} {sum(lengths) / max(1, len(lengths)):>8.0f} "
+            f"{percentile(lengths, 0.1):>6} {percentile(lengths, 0.9):>6} {max(lengths, default=0):>6} "
+            f"{elapsed:>8.2f} {reused / max(1, total_after):>7.1%}"
+        )
+        
+        if strategy == "content_defined":
+            limit = splitter.max_chunk_size + splitter.chunk_overlap
+            oversized += sum(1 for chunks in (*before.values(), *after.values()) for chunk in chunks if len(chunk) > limit)
+    
+    if oversized:
+        print(f"\n❌ {oversized} content_defined chunks exceed max_chunk_size + chunk_overlap")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+CPU Budget Benchmark
+对比启用 / 不启用 CPU 预算时，并发检索负载下的吞吐曲线
+
+每个 (模式, 并发数) 组合在独立子进程中运行，因为 torch 线程数在进程内只能设置一次。
+单个请求模拟 HybridRetrievalStage + RerankingStage 的 CPU 负载：
+对扩展后的每个查询做 embedding（提交到检索线程池），再对候选文档做 Cross-Encoder 打分。
+
+Usage:
+    python evaluation/benchmarks/bench_cpu_budget.py
+    python evaluation/benchmarks/bench_cpu_budget.py --concurrency 1 2 4 8 --duration 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+QUERIES = [
+    "什么是检索增强生成？",
+    "How does reciprocal rank fusion combine rankings?",
+    "向量数据库如何做近似最近邻搜索",
+]
+PASSAGE = (
+    "Retrieval-augmented generation combines a retriever with a generator. "
+    "检索增强生成先从知识库检索相关文档，再把文档作为上下文交给大语言模型生成回答。"
+) * 4
+
+
+def run_worker(mode: str, concurrency: int, duration: float) -> dict:
+    """子进程：在给定模式下运行负载并返回统计"""
+    from managers.cpu_budget import CPUBudget
+    
+    budget = CPUBudget(concurrency=concurrency, enabled=(mode == "budget"))
+    budget.apply()  # 必须在导入 torch 之前
+    
+    from sentence_transformers import SentenceTransformer, CrossEncoder
+    from config import EMBEDDING_MODEL, RERANKING_MODEL, RERANKING_BATCH_SIZE, RRF_TOP_K
+    
+    embedder = SentenceTransformer(EMBEDDING_MODEL, cache_folder=str(BACKEND_DIR / "models_cache"))
+    reranker = CrossEncoder(RERANKING_MODEL, max_length=512)
+    
+    query_executor = ThreadPoolExecutor(max_workers=budget.executor_workers(8, "query"))
+    retrieval_executor = ThreadPoolExecutor(max_workers=budget.executor_workers(4, "retrieval"))
+    
+    def embed(text):
+        return embedder.encode([text], normalize_embeddings=True)
+    
+    def retrieve_single(query):
+        return retrieval_executor.submit(embed, query).result()
+    
+    def one_request():
+        futures = [query_executor.submit(retrieve_single, q) for q in QUERIES]
+        for f in futures:
+            f.result()
+        pairs = [(QUERIES[0], PASSAGE)] * RRF_TOP_K
+        reranker.predict(pairs, batch_size=RERANKING_BATCH_SIZE, show_progress_bar=False)
+    
+    one_request()  # 预热
+    
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            one_request()
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+    
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    
+    latencies.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] if latencies else None,
+        "settings": budget.get_settings(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU budget throughput benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=15.0, help="每个组合的运行时长（秒）")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["default", "budget"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps(run_worker(args.mode, args.concurrency[0], args.duration)))
+        return
+    
+    results = []
+    for concurrency in args.concurrency:
+        for mode in ("default", "budget"):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", "--mode", mode,
+                 "--concurrency", str(concurrency), "--duration", str(args.duration)],
+                capture_output=True, text=True, env={**os.environ, "TIMING_SHOW_IN_TERMINAL": "false"}
+            )
+            if proc.returncode != 0:
+                print(f"❌ mode={mode} concurrency={concurrency} failed:\n{proc.stderr[-2000:]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f"  {mode:<8} c={concurrency:<3} "
+                f"{result['throughput_rps']:7.2f} req/s  "
+                f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms"
+            )
+    
+    print("\n📈 Throughput curve (req/s)")
+    print(f"{'concurrency':>12} {'default':>10} {'budget':>10} {'speedup':>9}")
+    by_key = {(r["mode"], r["concurrency"]): r for r in results}
+    for concurrency in args.concurrency:
+        default = by_key.get(("default", concurrency))
+        budget = by_key.get(("budget", concurrency))
+        if not default or not budget:
+            continue
+        speedup = budget["throughput_rps"] / default["throughput_rps"] if default["throughput_rps"] else 0
+        print(f"{concurrency:>12} {default['throughput_rps']:>10.2f} {budget['throughput_rps']:>10.2f} {speedup:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
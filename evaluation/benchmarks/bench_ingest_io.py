@@ -0,0 +1,205 @@
+"""
+Ingest I/O Benchmark
+对比几种解析上传文件的方式的耗时、磁盘写入量与峰值内存（RSS）
+
+- tempfile: 上传保存在内存 —— 每个文件写入 TemporaryDirectory，再由 LangChain 加载器从磁盘读回
+- bytes:    上传保存在内存 —— DocumentParser 直接从 BytesIO 解析
+- store:    上传流式写入 DocumentStore —— DocumentParser 按路径按需读取 / mmap，语料不常驻内存
+
+每种方式在独立子进程中运行，峰值 RSS 取 getrusage(RUSAGE_SELF).ru_maxrss 减去解析前的 RSS；
+tempfile / bytes 的 resident_MB 为常驻内存的语料大小，store 方式为 0（只有磁盘上的 blob）。
+没有现成语料时可用 --synthetic-mb 生成 CSV + TXT 语料。
+
+Usage:
+    python evaluation/benchmarks/bench_ingest_io.py --docs /path/to/corpus
+    python evaluation/benchmarks/bench_ingest_io.py --synthetic-mb 300
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+WORDS = (
+    "retrieval augmented generation vector index chunk embedding rerank fusion "
+    "检索 增强 生成 向量 索引 文档 嵌入 重排 融合 知识库"
+).split()
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def generate_corpus(target_dir: Path, size_mb: int):
+    """生成约 size_mb 的语料：一半 CSV（多列行记录），一半纯文本"""
+    rng = random.Random(42)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    per_file = 16 * 1024 * 1024
+    written, index = 0, 0
+    while written < size_mb * 1024 * 1024:
+        if index % 2 == 0:
+            path = target_dir / f"synthetic_{index:03d}.csv"
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("id,title,body\n")
+                row = 0
+                while f.tell() < per_file:
+                    body = " ".join(rng.choice(WORDS) for _ in range(40))
+                    f.write(f"{row},title {row},\"{body}\"\n")
+                    row += 1
+        else:
+            path = target_dir / f"synthetic_{index:03d}.txt"
+            with open(path, "w", encoding="utf-8") as f:
+                while f.tell() < per_file:
+                    f.write(" ".join(rng.choice(WORDS) for _ in range(60)) + "\n\n")
+        written += path.stat().st_size
+        index += 1
+
+
+def parse_with_tempfiles(corpus: dict) -> tuple:
+    """旧路径：写临时文件 + LangChain 加载器"""
+    from langchain_community.document_loaders import PyPDFLoader, CSVLoader, TextLoader
+    from managers.document_parser import WordDocumentLoader
+    
+    documents, bytes_written = [], 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for filename, content in corpus.items():
+            path = os.path.join(temp_dir, filename)
+            with open(path, "wb") as f:
+                f.write(content)
+            bytes_written += len(content)
+            
+            lower = filename.lower()
+            if lower.endswith(".pdf"):
+                loader = PyPDFLoader(path)
+            elif lower.endswith(".csv"):
+                loader = CSVLoader(path)
+            elif lower.endswith((".txt", ".md")):
+                loader = TextLoader(path)
+            else:
+                loader = WordDocumentLoader(path)
+            documents.extend(loader.load())
+    return documents, bytes_written
+
+
+def parse_from_bytes(corpus: dict) -> tuple:
+    """新路径：DocumentParser 在当前进程直接解析 bytes（与 tempfile 路径同为单进程，便于对比）"""
+    from managers.document_parser import DocumentParser
+    
+    documents, _ = DocumentParser(max_workers=1).parse_all(corpus)
+    return documents, 0
+
+
+def parse_from_store(store) -> tuple:
+    """磁盘存储路径：只传递 blob 路径，解析时按需读取（上传时的一次写盘不计入）"""
+    from managers.document_parser import DocumentParser
+    
+    documents, _ = DocumentParser(max_workers=1).parse_all(store.sources())
+    return documents, 0
+
+
+def run_worker(mode: str, docs_dir: str) -> dict:
+    from managers.document_parser import SUPPORTED_EXTENSIONS
+    from managers.document_store import DocumentStore
+    
+    paths = [
+        path for path in sorted(Path(docs_dir).rglob("*"))
+        if path.is_file() and path.name.lower().endswith(SUPPORTED_EXTENSIONS)
+    ]
+    corpus_bytes = sum(path.stat().st_size for path in paths)
+    # 预先导入依赖，避免把模块导入计入峰值
+    import langchain_community.document_loaders  # noqa: F401
+    
+    with tempfile.TemporaryDirectory() as store_dir:
+        if mode == "store":
+            # 模拟上传：按块流式写入存储，语料不进入进程内存
+            store = DocumentStore(store_dir)
+            for path in paths:
+                with open(path, "rb") as f:
+                    store.put_stream(path.name, f)
+            corpus, resident = store, 0
+        else:
+            corpus = {path.name: path.read_bytes() for path in paths}
+            resident = corpus_bytes
+        
+        rss_before = _rss_kb()
+        start = time.perf_counter()
+        parse = {"tempfile": parse_with_tempfiles, "bytes": parse_from_bytes, "store": parse_from_store}[mode]
+        documents, bytes_written = parse(corpus)
+        elapsed = time.perf_counter() - start
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    return {
+        "mode": mode,
+        "files": len(paths),
+        "corpus_mb": corpus_bytes / (1024 * 1024),
+        "resident_mb": resident / (1024 * 1024),
+        "documents": len(documents),
+        "chars": sum(len(d.page_content) for d in documents),
+        "wall_s": elapsed,
+        "disk_written_mb": bytes_written / (1024 * 1024),
+        "peak_rss_delta_mb": max(0, peak_kb - rss_before) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest I/O and peak-RSS benchmark")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--docs", help="语料目录")
+    source.add_argument("--synthetic-mb", type=int, help="生成指定大小（MB）的合成语料")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["tempfile", "bytes", "store"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps(run_worker(args.mode, args.docs)))
+        return
+    
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        docs_dir = args.docs
+        if args.synthetic_mb:
+            docs_dir = synthetic_dir
+            print(f"🛠  Generating ~{args.synthetic_mb} MB synthetic corpus...")
+            generate_corpus(Path(docs_dir), args.synthetic_mb)
+        
+        results = {}
+        for mode in ("tempfile", "bytes", "store"):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", "--mode", mode, "--docs", docs_dir],
+                capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"❌ mode={mode} failed:\n{proc.stderr[-2000:]}")
+                continue
+            results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+    
+    if not results:
+        return
+    first = next(iter(results.values()))
+    print(f"\n📚 {first['files']} files, {first['corpus_mb']:.1f} MB")
+    print(f"{'mode':>9} {'wall_s':>8} {'docs':>8} {'disk_MB':>9} {'resident_MB':>12} {'peak_RSS_MB':>12}")
+    for mode, r in results.items():
+        print(
+            f"{mode:>9} {r['wall_s']:>8.2f} {r['documents']:>8} {r['disk_written_mb']:>9.1f} "
+            f"{r['resident_mb']:>12.1f} {r['peak_rss_delta_mb']:>12.1f}"
+        )
+    
+    if "tempfile" in results and "bytes" in results:
+        old, new = results["tempfile"], results["bytes"]
+        print(
+            f"\nbytes vs tempfile: {old['wall_s'] / new['wall_s']:.2f}x faster, "
+            f"{old['disk_written_mb'] - new['disk_written_mb']:.1f} MB less disk I/O, "
+            f"{old['peak_rss_delta_mb'] - new['peak_rss_delta_mb']:+.1f} MB peak RSS saved"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Document Parsing Benchmark
+测量文档解析（进程池并行）在不同工作进程数下的墙钟时间
+
+读取目录中支持的文档（PDF / DOCX / CSV / TXT / MD）到内存，
+用 DocumentParser 分别以 1、2、4 ... 个工作进程解析，输出耗时与相对单进程的加速比。
+
+Usage:
+    python evaluation/benchmarks/bench_parsing.py --docs /path/to/corpus
+    python evaluation/benchmarks/bench_parsing.py --docs /path/to/corpus --workers 1 2 4 8 --pages-per-task 16
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def load_corpus(docs_dir: str) -> dict:
+    from managers.document_parser import SUPPORTED_EXTENSIONS
+    
+    corpus = {}
+    for path in sorted(Path(docs_dir).rglob("*")):
+        if path.is_file() and path.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            corpus[path.name] = path.read_bytes()
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel document parsing benchmark")
+    parser.add_argument("--docs", required=True, help="文档目录")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=32, help="每个 PDF 任务的页数")
+    parser.add_argument("--repeat", type=int, default=2, help="每个配置重复次数（取最小值，排除进程池启动开销）")
+    args = parser.parse_args()
+    
+    from managers.document_parser import DocumentParser
+    
+    corpus = load_corpus(args.docs)
+    if not corpus:
+        print(f"❌ No supported documents found in {args.docs}")
+        return
+    total_mb = sum(len(c) for c in corpus.values()) / (1024 * 1024)
+    print(f"📚 {len(corpus)} files, {total_mb:.1f} MB")
+    
+    baseline = None
+    print(f"\n{'workers':>8} {'wall_s':>9} {'pages':>7} {'errors':>7} {'speedup':>8}")
+    for workers in sorted(set(args.workers)):
+        doc_parser = DocumentParser(max_workers=workers, pdf_pages_per_task=args.pages_per_task)
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            documents, report = doc_parser.parse_all(corpus)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        doc_parser.shutdown()
+        
+        errors = sum(1 for info in report.values() if info["error"])
+        baseline = baseline or best
+        print(f"{workers:>8} {best:>9.2f} {len(documents):>7} {errors:>7} {baseline / best:>7.2f}x")
+    
+    slowest = sorted(report.items(), key=lambda item: item[1]["duration_s"], reverse=True)[:5]
+    print("\n🐢 Slowest files (parse time summed over page ranges)")
+    for filename, info in slowest:
+        print(f"  {filename}: {info['duration_s']:.2f}s, {info['documents']} pages" + (f", error: {info['error']}" if info["error"] else ""))
+
+
+if __name__ == "__main__":
+    main()
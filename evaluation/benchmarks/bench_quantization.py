@@ -0,0 +1,95 @@
+"""
+Vector Quantization Benchmark
+对比 numpy 后端各量化模式（VECTOR_QUANTIZATION）的内存、延迟与召回率损失
+
+每个模式与重排倍数（VECTOR_RESCORE_FACTOR）输出：
+- MB/1M:    每百万 chunk 检索时扫描的常驻向量数据（编码 + 范数；none 为整个 float32 矩阵）
+- p50/p99:  单条查询延迟（ms，粗排 + 从 mmap 读取候选精确重排）
+- recall@k: 与精确 top-k 的重合比例；loss 为相对未量化（recall = 1）的损失
+
+float32 矩阵保存在临时目录的 mmap 文件中，与服务运行时一致。查询为从语料中留出的向量。
+高维均匀随机向量之间的距离几乎相同，粗排（尤其 binary）难以区分，召回率损失远高于真实嵌入；
+用 --snapshot 读取知识库快照中的真实向量可得到有代表性的结果。
+
+Usage:
+    python evaluation/benchmarks/bench_quantization.py --snapshot snapshots/kb.kbsnap --rescore 4 10 32
+    python evaluation/benchmarks/bench_quantization.py --n 100000 --dim 768
+    python evaluation/benchmarks/bench_quantization.py --n 1000000 --modes int8 binary --rescore 4 10 32 --clusters 1024
+"""
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench_vector_backend import build, exact_top_k, make_vectors, percentile_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vector storage: memory, latency and recall loss")
+    parser.add_argument("--snapshot", help="知识库快照（使用其中的向量，忽略 --n / --dim / --clusters）")
+    parser.add_argument("--n", type=int, default=100000, help="向量数")
+    parser.add_argument("--dim", type=int, default=768, help="向量维度（bge-base 为 768）")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--k", type=int, default=15, help="top-k（默认与 HYBRID_TOP_K_PER_QUERY 一致）")
+    parser.add_argument("--modes", nargs="+", default=["none", "float16", "int8", "binary"], choices=["none", "float16", "int8", "binary"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[10], help="重排倍数（候选数 = k × 倍数）")
+    parser.add_argument("--clusters", type=int, default=0, help="聚类数（0 = 均匀随机向量）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    from managers.numpy_store import NumpyCollection
+    
+    rng = np.random.default_rng(args.seed)
+    if args.snapshot:
+        from managers.snapshot import KnowledgeBaseSnapshot
+        
+        corpus = np.asarray(KnowledgeBaseSnapshot(args.snapshot, verify=False).embeddings, dtype=np.float32)
+    else:
+        corpus = make_vectors(args.n + args.queries, args.dim, args.clusters, rng)
+    order = rng.permutation(len(corpus))
+    queries, vectors = corpus[order[:args.queries]], corpus[order[args.queries:]]
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"📐 {len(vectors)} vectors × {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    
+    workdir = tempfile.mkdtemp(prefix="bench-quantization-")
+    try:
+        # 向量矩阵只写入一次，各模式打开同一目录时由矩阵生成编码
+        collection = NumpyCollection("bench", f"{workdir}/bench", quantization="none")
+        build_s = build(collection, vectors)
+        collection.close()
+        print(f"build {build_s:.1f}s\n")
+        
+        print(f"{'mode':<8} {'rescore':>7} {'MB/1M':>8} {'open_s':>7} {'p50_ms':>8} {'p99_ms':>8} {'recall@k':>9} {'loss':>7}")
+        for mode in args.modes:
+            for rescore in (args.rescore if mode != "none" else [1]):
+                start = time.perf_counter()
+                collection = NumpyCollection("bench", f"{workdir}/bench", quantization=mode, rescore_factor=rescore)
+                open_s = time.perf_counter() - start
+                
+                collection.query(query_embeddings=queries[:1].tolist(), n_results=args.k, include=["distances"])  # 预热
+                latencies, found = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    result = collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=["distances"])
+                    latencies.append(time.perf_counter() - start)
+                    found.append([int(chunk_id) for chunk_id in result["ids"][0]])
+                recall = np.mean([len(set(hits) & set(expected)) / args.k for hits, expected in zip(found, truth.tolist())])
+                mb_per_million = collection.memory_bytes / len(vectors) * 1_000_000 / (1024 * 1024)
+                print(
+                    f"{mode:<8} {rescore if mode != 'none' else '-':>7} {mb_per_million:>8.0f} {open_s:>7.2f} "
+                    f"{percentile_ms(latencies, 50):>8.2f} {percentile_ms(latencies, 99):>8.2f} {recall:>9.3f} {1 - recall:>7.1%}"
+                )
+                collection.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Text Splitter Benchmark
+对比 RecursiveCharacterTextSplitter 与 TokenAwareSplitter（按模型 token 数，单遍）
+
+- recursive(Nc):  当前的切分方式，按字符数
+- recursive(Nt):  RecursiveCharacterTextSplitter 以 tokenizer 计算长度（递归过程中对各片段反复分词）
+- token(Nt):      TokenAwareSplitter，整段只分词一次
+
+输出切分耗时与吞吐（MB/s）、chunk 数，以及按嵌入模型 tokenizer 计算的 chunk token 数分布：
+P50 / P99 / 最大值、超过模型上限（默认 510 = 512 减去 [CLS] / [SEP]）而被截断的 chunk 比例，
+以及被截断部分占全部 token 的比例（这部分在嵌入与重排时被丢弃）。
+
+没有现成语料时用 --synthetic-mb 生成中英文混合语料。
+
+Usage:
+    python evaluation/benchmarks/bench_splitter.py --docs /path/to/corpus
+    python evaluation/benchmarks/bench_splitter.py --synthetic-mb 50 --tokenizer BAAI/bge-base-zh-v1.5
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+WORDS_EN = "retrieval augmented generation vector index chunk embedding rerank fusion query document model score".split()
+WORDS_ZH = "检索 增强 生成 向量 索引 文档 嵌入 重排 融合 知识库 查询 模型 分数 切分".split()
+
+
+def synthetic_corpus(size_mb: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    corpus = {}
+    target = size_mb * 1024 * 1024
+    total = 0
+    while total < target:
+        paragraphs = []
+        for _ in range(rng.randint(5, 40)):
+            sentences = []
+            for _ in range(rng.randint(2, 20)):
+                if rng.random() < 0.5:
+                    sentences.append(" ".join(rng.choices(WORDS_EN, k=rng.randint(6, 25))).capitalize() + ".")
+                else:
+                    sentences.append("".join(rng.choices(WORDS_ZH, k=rng.randint(5, 20))) + "。")
+            paragraphs.append(" ".join(sentences))
+        text = "\n\n".join(paragraphs)
+        corpus[f"doc{len(corpus)}.txt"] = text
+        total += len(text.encode("utf-8"))
+    return corpus
+
+
+def load_corpus(docs_dir: str) -> dict:
+    from managers.document_parser import DocumentParser, SUPPORTED_EXTENSIONS
+    
+    sources = {
+        path.name: str(path) for path in sorted(Path(docs_dir).rglob("*"))
+        if path.is_file() and path.name.lower().endswith(SUPPORTED_EXTENSIONS)
+    }
+    doc_parser = DocumentParser()
+    documents, _ = doc_parser.parse_all(sources)
+    doc_parser.shutdown()
+    corpus = {}
+    for i, document in enumerate(documents):
+        corpus[f"{document.metadata.get('filename', 'doc')}#{i}"] = document.page_content
+    return corpus
+
+
+def percentile(values: list, q: float) -> int:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Character vs token-aware text splitter")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--docs", help="文档目录")
+    source.add_argument("--synthetic-mb", type=float, help="生成的语料大小（MB）")
+    parser.add_argument("--tokenizer", help="计算 token 数的模型（默认 CHUNK_TOKENIZER）")
+    parser.add_argument("--chunk-size", type=int, default=600, help="recursive 的 chunk 字符数")
+    parser.add_argument("--chunk-overlap", type=int, default=150, help="recursive 的重叠字符数")
+    parser.add_argument("--token-size", type=int, help="token 策略的 chunk token 数（默认 CHUNK_TOKEN_SIZE）")
+    parser.add_argument("--token-overlap", type=int, help="token 策略的重叠 token 数（默认 CHUNK_TOKEN_OVERLAP）")
+    parser.add_argument("--model-max-tokens", type=int, default=510, help="模型截断长度（不含特殊 token）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    from config import CHUNK_TOKENIZER, CHUNK_TOKEN_SIZE, CHUNK_TOKEN_OVERLAP
+    from managers.chunking import TokenAwareSplitter, get_tokenizer
+    
+    corpus = load_corpus(args.docs) if args.docs else synthetic_corpus(args.synthetic_mb, args.seed)
+    if not corpus:
+        print(f"❌ No supported documents found in {args.docs}")
+        return
+    total_mb = sum(len(text.encode("utf-8")) for text in corpus.values()) / (1024 * 1024)
+    tokenizer_name = args.tokenizer or CHUNK_TOKENIZER
+    tokenizer = get_tokenizer(tokenizer_name)
+    print(f"📚 {len(corpus)} texts, {total_mb:.1f} MB, tokenizer {tokenizer_name} ({type(tokenizer).__name__})")
+    
+    splitters = {}
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        
+        splitters[f"recursive({args.chunk_size}c)"] = RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, length_function=len
+        )
+    except ImportError as e:
+        print(f"recursive skipped ({e})")
+    token_size = args.token_size or CHUNK_TOKEN_SIZE
+    token_overlap = CHUNK_TOKEN_OVERLAP if args.token_overlap is None else args.token_overlap
+    if splitters:
+        splitters[f"recursive({token_size}t)"] = RecursiveCharacterTextSplitter(
+            chunk_size=token_size, chunk_overlap=token_overlap, length_function=lambda text: len(tokenizer.token_spans(text)[0])
+        )
+    splitters[f"token({token_size}t)"] = TokenAwareSplitter(token_size, token_overlap, tokenizer_name)
+    
+    print(f"\n{'splitter':<18} {'split_s':>8} {'MB/s':>7} {'chunks':>8} {'tok_p50':>8} {'tok_p99':>8} {'tok_max':>8} {'truncated':>10} {'lost_tok':>9}")
+    for name, splitter in splitters.items():
+        start = time.perf_counter()
+        chunks = [chunk for text in corpus.values() for chunk in splitter.split_text(text)]
+        elapsed = time.perf_counter() - start
+        
+        tokens = [len(tokenizer.token_spans(chunk)[0]) for chunk in chunks]
+        truncated = sum(1 for count in tokens if count > args.model_max_tokens)
+        lost = sum(max(0, count - args.model_max_tokens) for count in tokens)
+        print(
+            f"{name:<18} {elapsed:>8.2f} {total_mb / elapsed:>7.1f} {len(chunks):>8} "
+            f"{percentile(tokens, 0.5):>8} {percentile(tokens, 0.99):>8} {max(tokens, default=0):>8} "
+            f"{truncated / max(1, len(chunks)):>9.1%} {lost / max(1, sum(tokens)):>8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
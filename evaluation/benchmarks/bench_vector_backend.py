@@ -0,0 +1,157 @@
+"""
+Vector Backend Benchmark
+对比 Chroma（HNSW）、NumPy 精确暴力检索后端（VECTOR_BACKEND=numpy）与 hnswlib 后端（VECTOR_BACKEND=hnsw）
+
+使用归一化的随机向量（与嵌入模型输出一致），每个后端输出：
+- build_s:  写入全部向量的耗时（hnsw 含建图）
+- p50/p99:  单条查询延迟（ms）
+- batch:    批量查询吞吐（查询/秒，NumPy 后端一次矩阵乘法处理整批）
+- recall@k: 与精确 top-k（float64 暴力计算）的重合比例
+
+hnsw 后端只构建一次，按 --ef-search 的每个取值各输出一行（召回率与延迟的权衡曲线）。
+随机向量没有聚类结构，是近似索引最不利的情形；真实嵌入的召回率通常更高，可用 --clusters 生成聚类数据。
+1M × 768 维约需 3 GB 向量内存（每个后端另有各自的存储）。
+
+Usage:
+    python evaluation/benchmarks/bench_vector_backend.py --n 10000 100000 --dim 768
+    python evaluation/benchmarks/bench_vector_backend.py --n 200000 --queries 500 --k 20 --batch 32 --clusters 256
+    python evaluation/benchmarks/bench_vector_backend.py --n 1000000 --backends numpy hnsw --ef-search 32 64 128 256
+"""
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+WRITE_BATCH = 5000
+TRUTH_BLOCK = 100000  # 计算精确 top-k 时每块的向量数（控制 float64 中间结果的内存）
+
+
+def make_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    if clusters:
+        centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    else:
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """精确 top-k（float64 分块计算，作为召回率基准）"""
+    queries = queries.astype(np.float64)
+    best_scores = np.full((len(queries), 0), -np.inf)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), TRUTH_BLOCK):
+        block = vectors[start:start + TRUTH_BLOCK].astype(np.float64)
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+        top = np.argsort(-scores, axis=1)[:, :k]
+        best_scores, best_rows = np.take_along_axis(scores, top, axis=1), np.take_along_axis(rows, top, axis=1)
+    return best_rows
+
+
+def percentile_ms(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def build(collection, vectors: np.ndarray) -> float:
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), WRITE_BATCH):
+        collection.upsert(ids=ids[offset:offset + WRITE_BATCH], embeddings=vectors[offset:offset + WRITE_BATCH].tolist())
+    return time.perf_counter() - start
+
+
+def measure(collection, queries: np.ndarray, truth: np.ndarray, k: int, batch: int) -> dict:
+    collection.query(query_embeddings=queries[:1].tolist(), n_results=k, include=["distances"])  # 预热
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - start)
+        found.append([int(chunk_id) for chunk_id in result["ids"][0]])
+    
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch):
+        collection.query(query_embeddings=queries[offset:offset + batch].tolist(), n_results=k, include=["distances"])
+    batch_qps = len(queries) / (time.perf_counter() - start)
+    
+    recall = np.mean([len(set(hits) & set(expected)) / k for hits, expected in zip(found, truth.tolist())])
+    return {"p50": percentile_ms(latencies, 50), "p99": percentile_ms(latencies, 99), "batch_qps": batch_qps, "recall": recall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs exact NumPy vs hnswlib vector backends")
+    parser.add_argument("--n", type=int, nargs="+", default=[10000, 100000], help="向量数")
+    parser.add_argument("--dim", type=int, default=768, help="向量维度（bge-base 为 768）")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--k", type=int, default=15, help="top-k（默认与 HYBRID_TOP_K_PER_QUERY 一致）")
+    parser.add_argument("--batch", type=int, default=16, help="批量查询的批大小")
+    parser.add_argument("--clusters", type=int, default=0, help="聚类数（0 = 均匀随机向量）")
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy", "hnsw"], choices=["chroma", "numpy", "hnsw"])
+    parser.add_argument("--m", type=int, help="hnsw 的 M（默认 HNSW_M）")
+    parser.add_argument("--ef-construction", type=int, help="hnsw 的 ef_construction（默认 HNSW_EF_CONSTRUCTION）")
+    parser.add_argument("--ef-search", type=int, nargs="+", help="hnsw 的 ef_search 取值（默认 HNSW_EF_SEARCH）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    from config import HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH
+    from managers.numpy_store import NumpyCollection
+    backends = list(args.backends)
+    if "chroma" in backends:
+        try:
+            import chromadb
+        except ImportError as e:
+            backends.remove("chroma")
+            print(f"chroma skipped ({e})")
+    if "hnsw" in backends:
+        try:
+            from managers.hnsw_store import HnswCollection
+        except ImportError as e:
+            backends.remove("hnsw")
+            print(f"hnsw skipped ({e})")
+    m = args.m or HNSW_M
+    ef_construction = args.ef_construction or HNSW_EF_CONSTRUCTION
+    ef_values = args.ef_search or [HNSW_EF_SEARCH]
+    
+    rng = np.random.default_rng(args.seed)
+    print(f"\n{'n':>8} {'backend':<14} {'build_s':>8} {'p50_ms':>8} {'p99_ms':>8} {'batch_qps':>10} {'recall@k':>9}")
+    for n in args.n:
+        vectors = make_vectors(n, args.dim, args.clusters, rng)
+        queries = make_vectors(args.queries, args.dim, args.clusters, rng)
+        truth = exact_top_k(vectors, queries, args.k)
+        
+        workdir = tempfile.mkdtemp(prefix="bench-vector-")
+        try:
+            for backend in backends:
+                if backend == "chroma":
+                    collection = chromadb.PersistentClient(path=f"{workdir}/chroma").get_or_create_collection("bench")
+                elif backend == "numpy":
+                    collection = NumpyCollection("bench", f"{workdir}/numpy")
+                else:
+                    collection = HnswCollection("bench", f"{workdir}/hnsw", m=m, ef_construction=ef_construction)
+                build_s = build(collection, vectors)
+                
+                settings = [(f"hnsw(ef={ef})", ef) for ef in ef_values] if backend == "hnsw" else [(backend, None)]
+                for name, ef in settings:
+                    if ef is not None:
+                        collection.ef_search = ef
+                    stats = measure(collection, queries, truth, args.k, args.batch)
+                    print(
+                        f"{n:>8} {name:<14} {build_s:>8.2f} {stats['p50']:>8.2f} {stats['p99']:>8.2f} "
+                        f"{stats['batch_qps']:>10.0f} {stats['recall']:>9.3f}"
+                    )
+                if backend != "chroma":
+                    collection.close(persist=False)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -122,30 +122,31 @@ class RAGEvaluator:
             print(f"⚠️  未找到文档: {docs_dir}")
             return False
         
+        # 一次请求批量上传（服务端流式存储，逐文件返回状态）
         uploaded_count = 0
-        for doc_file in doc_files:
-            try:
-                with open(doc_file, 'rb') as f:
-                    files = {'file': (doc_file.name, f)}
-                    response = requests.post(
-                        f"{self.backend_url}/api/documents/upload",
-                        files=files,
-                        timeout=30
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get('status') == 'success':
-                            print(f"  ✅ {doc_file.name}")
-                            uploaded_count += 1
-                        else:
-                            # 可能是文件已存在
-                            print(f"  ⚠️  {doc_file.name}: {data.get('message', 'Unknown')}")
+        handles = [open(doc_file, 'rb') for doc_file in doc_files]
+        try:
+            files = [('files', (doc_file.name, f)) for doc_file, f in zip(doc_files, handles)]
+            response = requests.post(
+                f"{self.backend_url}/api/documents/bulk-upload",
+                files=files,
+                timeout=300
+            )
+            if response.status_code in (200, 202):
+                for entry in response.json().get('files', []):
+                    if entry['status'] == 'stored':
+                        print(f"  ✅ {entry['filename']}")
+                        uploaded_count += 1
                     else:
-                        print(f"  ❌ {doc_file.name}: HTTP {response.status_code}")
-                        
-            except Exception as e:
-                print(f"  ❌ {doc_file.name}: {e}")
+                        # 可能是文件已存在
+                        print(f"  ⚠️  {entry['filename']}: {entry.get('message', entry['status'])}")
+            else:
+                print(f"  ❌ HTTP {response.status_code}: {response.text}")
+        except Exception as e:
+            print(f"  ❌ 批量上传失败: {e}")
+        finally:
+            for f in handles:
+                f.close()
         
         print(f"📦 成功上传 {uploaded_count}/{len(doc_files)} 个文档")
         return uploaded_count > 0
@@ -157,22 +158,32 @@ class RAGEvaluator:
         print("\n🔨 重建知识库...")
         
         try:
-            response = requests.post(
-                f"{self.backend_url}/api/rebuild",
-                timeout=120  # 重建可能需要较长时间
-            )
+            response = requests.post(f"{self.backend_url}/api/rebuild", timeout=30)
+            if response.status_code != 202:
+                print(f"❌ HTTP {response.status_code}: {response.text}")
+                return False
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'success':
-                    print("✅ 知识库重建成功")
+            # 重建在后台执行，轮询任务状态
+            job_id = response.json()["job_id"]
+            deadline = time.time() + 1800
+            while time.time() < deadline:
+                job = requests.get(f"{self.backend_url}/api/rebuild/{job_id}", timeout=30).json()["job"]
+                if job["state"] == "succeeded":
+                    print(f"✅ 知识库重建成功 ({job['elapsed_s']:.1f}s)")
                     return True
-                else:
-                    print(f"❌ 重建失败: {data.get('message', 'Unknown error')}")
+                if job["state"] in ("failed", "cancelled"):
+                    print(f"❌ 重建{'已取消' if job['state'] == 'cancelled' else '失败'}: {job.get('error') or job['state']}")
                     return False
-            else:
-                print(f"❌ HTTP {response.status_code}: {response.text}")
-                return False
+                running = [
+                    f"{name} {phase['count']}/{phase['total'] or '?'}"
+                    for name, phase in job.get("progress", {}).items() if phase["state"] == "running"
+                ]
+                if running:
+                    print(f"  ⏳ {', '.join(running)}")
+                time.sleep(2)
+            
+            print(f"❌ 重建超时: job {job_id}")
+            return False
                 
         except Exception as e:
             print(f"❌ 重建出错: {e}")
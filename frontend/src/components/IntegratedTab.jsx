@@ -170,15 +170,34 @@ const IntegratedTab = ({ isInitialized, refreshSystemInfo }) => {
 			const response = await fetch('/api/rebuild', { method: 'POST' });
 			const data = await response.json();
 
+			if (data.status !== 'accepted') {
+				setErrorMessage(data.message);
+				return;
+			}
+
+			// 重建在后台执行，轮询任务状态直到结束
+			let job = data.job;
+			while (job.state === 'queued' || job.state === 'running') {
+				await new Promise((resolve) => setTimeout(resolve, 1000));
+				const jobResponse = await fetch(`/api/rebuild/${data.job_id}`);
+				const jobData = await jobResponse.json();
+				if (jobData.status !== 'success') {
+					throw new Error(jobData.message);
+				}
+				job = jobData.job;
+			}
+
 			fetchDocuments();
 			fetchVectorizedDocuments();
 			
-			if (data.status === 'success') {
+			if (job.state === 'succeeded') {
 				setSuccessMessage('🚀 Knowledge base rebuilt successfully');
 				refreshSystemInfo();
 				window.dispatchEvent(new CustomEvent('knowledgeBaseRebuilt'));
+			} else if (job.state === 'cancelled') {
+				setErrorMessage('Rebuild cancelled');
 			} else {
-				setErrorMessage(data.message);
+				setErrorMessage(job.error || 'Rebuild failed');
 			}
 		} catch (error) {
 			setErrorMessage('Rebuild failed');